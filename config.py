@@ -1,11 +1,81 @@
 import os
 import json
+import time
+import threading
+from functools import lru_cache
+from typing import Any, Callable, Dict, IO
 
 
-class DatabaseConfig:
+class SchemaFileCache:
+    def __init__(self, check_interval: float = 5.0) -> None:
+        """
+        Caches parsed schema files and re-reads a file only when its mtime changes.
+
+        Args:
+            check_interval (float): Minimum seconds between two mtime checks of the same file.
+        """
+        self.check_interval = check_interval
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, path: str, loader: Callable[[IO], Any]) -> Any:
+        """
+        Returns the parsed content of the file, reloading it if it changed on disk.
+
+        Args:
+            path (str): Path of the file to read.
+            loader (Callable[[IO], Any]): Parses the opened file, e.g. json.load.
+
+        Returns:
+            Any: The cached (or freshly loaded) file content.
+        """
+        now = time.monotonic()
+        entry = self._entries.get(path)
+        if entry is not None and now - entry["checked_at"] < self.check_interval:
+            return entry["value"]
+
+        with self._lock:
+            entry = self._entries.get(path)
+            mtime = os.stat(path).st_mtime_ns
+            if entry is None or entry["mtime"] != mtime:
+                with open(path, "r") as file:
+                    entry = {"mtime": mtime, "value": loader(file)}
+            entry["checked_at"] = now
+            self._entries[path] = entry
+            return entry["value"]
+
+
+class Settings:
+    """
+    Base of the settings classes. Once `freeze` is called, setting or deleting an
+    attribute of the instance raises AttributeError. The objects returned by the
+    get_*_config accessors are frozen; adapters subclassing a settings class are not.
+    """
+
+    _frozen = False
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        if self._frozen:
+            raise AttributeError(f"{type(self).__name__} is read-only: {name}")
+        super().__setattr__(name, value)
+
+    def __delattr__(self, name: str) -> None:
+        if self._frozen:
+            raise AttributeError(f"{type(self).__name__} is read-only: {name}")
+        super().__delattr__(name)
+
+    def freeze(self) -> "Settings":
+        object.__setattr__(self, "_frozen", True)
+        return self
+
+
+class DatabaseConfig(Settings):
     def __init__(self) -> None:
         """
         Contains all the configurations related to the database
+
+        The schema files are not read here; they are served through a
+        SchemaFileCache and reloaded only when their mtime changes.
         """
         self.DIALECT = {"postgresql": "PostgreSQL"}
         self.TEXT_TO_SQL_PROMPT_TEMPLATE = """PostgreSQL is a powerful, standards-compliant relational database that adds many modern extensions. Keep these quick tips in mind when crafting SQL:
@@ -46,18 +116,36 @@ Following these conventions will help you write clear, efficient, and secure Pos
 
         # 6. Quote the table in double-quotes and give everything an alias—the join works and the query is easy to read.
 
-        self.DATABASE_INFORMATION_PROMPT_TEMPLATE = ""
-        with open("data/5DayDatabaseInformation.txt", "r") as file:
-            self.DATABASE_INFORMATION_PROMPT_TEMPLATE = file.read()
+        self.DATABASE_INFORMATION_PATH = "data/5DayDatabaseInformation.txt"
+        self.TABLE_RELATIONSHIPS_PATH = "data/tableRelationships.json"
+        self.DATABASE_RELATIONSHIPS_DESCRIPTION_PATH = (
+            "data/databaseRelationshipsDescription.json"
+        )
+        self.SCHEMA_RELOAD_CHECK_INTERVAL = float(
+            os.getenv("SCHEMA_RELOAD_CHECK_INTERVAL", 5)
+        )
+        self._schema_file_cache = SchemaFileCache(
+            check_interval=self.SCHEMA_RELOAD_CHECK_INTERVAL
+        )
 
-        with open("data/tableRelationships.json", "r") as file:
-            self.TABLE_RELATIONSHIPS = json.load(file)
+    @property
+    def DATABASE_INFORMATION_PROMPT_TEMPLATE(self) -> str:
+        return self._schema_file_cache.get(
+            self.DATABASE_INFORMATION_PATH, lambda file: file.read()
+        )
 
-        with open("data/databaseRelationshipsDescription.json", "r") as file:
-            self.DATABASE_RELATIONSHIPS_DESCRIPTION = json.load(file)
+    @property
+    def TABLE_RELATIONSHIPS(self) -> Dict[str, Dict[str, str]]:
+        return self._schema_file_cache.get(self.TABLE_RELATIONSHIPS_PATH, json.load)
 
+    @property
+    def DATABASE_RELATIONSHIPS_DESCRIPTION(self) -> Dict[str, str]:
+        return self._schema_file_cache.get(
+            self.DATABASE_RELATIONSHIPS_DESCRIPTION_PATH, json.load
+        )
 
-class OpenAIConfig:
+
+class OpenAIConfig(Settings):
     def __init__(self) -> None:
         """
         Contains:
@@ -70,12 +158,127 @@ class OpenAIConfig:
 
         self.CHATCOMPLETION_MODEL = os.getenv("CHATCOMPLETION_MODEL")
         self.EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL")
+        # Provider of the query and vector store embeddings: openai (EMBEDDING_MODEL)
+        # or ollama (OLLAMA_EMBEDDING_MODEL). Changing it needs a re-embedding of the
+        # collections: python -m src.migrations reembed
+        self.EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "openai").lower()
+        # Dimension reduction of every embedding: none, truncate (first
+        # EMBEDDING_REDUCED_DIM dimensions, Matryoshka-style) or pca (projection saved at
+        # EMBEDDING_PCA_PATH by python -m src.migrations fit-pca). Needs a re-embedding
+        # of the collections and MILVUS_VECTOR_DIM set to the reduced dimension
+        self.EMBEDDING_REDUCTION = os.getenv("EMBEDDING_REDUCTION", "none").lower()
+        self.EMBEDDING_REDUCED_DIM = int(os.getenv("EMBEDDING_REDUCED_DIM", 512))
+        self.EMBEDDING_PCA_PATH = os.getenv(
+            "EMBEDDING_PCA_PATH", "data/embedding_pca.npz"
+        )
         self.MAX_RETRIES = int(os.getenv("MAX_RETRIES"))
+        # Batched embeddings
+        self.EMBEDDING_MAX_BATCH_SIZE = int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", 2048))
+        self.EMBEDDING_MAX_BATCH_TOKENS = int(
+            os.getenv("EMBEDDING_MAX_BATCH_TOKENS", 300000)
+        )
+        self.EMBEDDING_MAX_CONCURRENCY = int(os.getenv("EMBEDDING_MAX_CONCURRENCY", 4))
+        self.EMBEDDING_CHUNK_RETRIES = int(os.getenv("EMBEDDING_CHUNK_RETRIES", 3))
+        # Client-side rate limiting per deployment (0 disables the limit)
+        self.OPENAI_RPM_LIMIT = int(os.getenv("OPENAI_RPM_LIMIT", 0))
+        self.OPENAI_TPM_LIMIT = int(os.getenv("OPENAI_TPM_LIMIT", 0))
+        self.OPENAI_DEPLOYMENT_RATE_LIMITS = os.getenv(
+            "OPENAI_DEPLOYMENT_RATE_LIMITS", "{}"
+        )
+        self.COMPLETION_TOKENS_ESTIMATE = int(
+            os.getenv("COMPLETION_TOKENS_ESTIMATE", 500)
+        )
+        self.RATE_LIMIT_ENABLED = bool(
+            self.OPENAI_RPM_LIMIT
+            or self.OPENAI_TPM_LIMIT
+            or json.loads(self.OPENAI_DEPLOYMENT_RATE_LIMITS)
+        )
+        # Hedged chat completions
+        self.HEDGING_ENABLED = os.getenv("HEDGING_ENABLED", "false").lower() == "true"
+        self.HEDGE_LATENCY_PERCENTILE = float(os.getenv("HEDGE_LATENCY_PERCENTILE", 95))
+        self.HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", 20))
+        self.HEDGE_LATENCY_WINDOW = int(os.getenv("HEDGE_LATENCY_WINDOW", 200))
+        self.HEDGE_MAX_PER_MINUTE = int(os.getenv("HEDGE_MAX_PER_MINUTE", 10))
+        self.HEDGE_DEPLOYMENT = os.getenv("HEDGE_DEPLOYMENT", "")
+        # Backend pool: JSON list of Azure OpenAI resources, e.g.
+        # [{"name": "eastus", "endpoint": "https://...", "api_key": "...", "weight": 2,
+        #   "models": {"gpt-4o": "gpt-4o-eastus"}, "rpm": 300, "tpm": 50000}]
+        # api_key / api_version default to the values above. When unset, the pool
+        # has the single OPENAI_ENDPOINT backend.
+        self.OPENAI_DEPLOYMENTS = json.loads(os.getenv("OPENAI_DEPLOYMENTS", "[]")) or [
+            {"name": "default", "endpoint": self.OPENAI_ENDPOINT}
+        ]
+
+        # Per-stage fallback chains of chat models, comma separated, each "<deployment>"
+        # or "<provider>:<model>" with provider openai or ollama (e.g.
+        # "gpt-4o,openai:gpt-4o-secondary,ollama:llama3.1:8b"); unset means
+        # CHATCOMPLETION_MODEL. FALLBACK_MODELS is appended to every chain.
+        self.FALLBACK_MODELS = [
+            model.strip()
+            for model in os.getenv("FALLBACK_MODELS", "").split(",")
+            if model.strip()
+        ]
+        self.STAGE_MODELS = {}
+        for stage in ("rephrase", "cluster", "sql", "answer", "graph"):
+            chain = [
+                model.strip()
+                for model in (
+                    os.getenv(f"{stage.upper()}_MODEL") or self.CHATCOMPLETION_MODEL
+                ).split(",")
+                if model.strip()
+            ]
+            self.STAGE_MODELS[stage] = list(dict.fromkeys(chain + self.FALLBACK_MODELS))
+
+        # Circuit breaker of each provider:model of the chains: it opens when, over
+        # the last CIRCUIT_BREAKER_WINDOW calls (at least CIRCUIT_BREAKER_MIN_REQUESTS),
+        # the error rate or the share of calls slower than
+        # CIRCUIT_BREAKER_SLOW_CALL_SECONDS reaches its limit, and the model is then
+        # skipped for CIRCUIT_BREAKER_OPEN_SECONDS before a single probe call
+        self.CIRCUIT_BREAKER_WINDOW = int(os.getenv("CIRCUIT_BREAKER_WINDOW", 20))
+        self.CIRCUIT_BREAKER_MIN_REQUESTS = int(
+            os.getenv("CIRCUIT_BREAKER_MIN_REQUESTS", 5)
+        )
+        self.CIRCUIT_BREAKER_ERROR_RATE = float(
+            os.getenv("CIRCUIT_BREAKER_ERROR_RATE", 0.5)
+        )
+        self.CIRCUIT_BREAKER_SLOW_CALL_SECONDS = float(
+            os.getenv("CIRCUIT_BREAKER_SLOW_CALL_SECONDS", 30)
+        )
+        self.CIRCUIT_BREAKER_SLOW_CALL_RATE = float(
+            os.getenv("CIRCUIT_BREAKER_SLOW_CALL_RATE", 0.5)
+        )
+        self.CIRCUIT_BREAKER_OPEN_SECONDS = float(
+            os.getenv("CIRCUIT_BREAKER_OPEN_SECONDS", 30)
+        )
+
+        # Local token counting (tiktoken encoding, heuristic fallback) and the token
+        # budget the text-to-SQL prompt is trimmed to (0 disables trimming)
+        self.TOKENIZER_ENCODING = os.getenv("TOKENIZER_ENCODING", "o200k_base")
+        self.PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", 16000))
 
         self.TEMPERATURE = float(os.getenv("TEMPERATURE"))
 
 
-class SqlConfig:
+class HttpConfig(Settings):
+    def __init__(self) -> None:
+        """
+        Contains the settings of the shared HTTP connection pools and backend pools used by
+        the LLM clients
+        """
+        self.HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", 100))
+        self.HTTP_MAX_KEEPALIVE_CONNECTIONS = int(
+            os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", 20)
+        )
+        self.HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", 60))
+        self.HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "true").lower() == "true"
+        self.HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", 120))
+        self.HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", 10))
+        # Passive health check of the OpenAI and Ollama backend pools
+        self.BACKEND_FAILURE_THRESHOLD = int(os.getenv("BACKEND_FAILURE_THRESHOLD", 3))
+        self.BACKEND_COOLDOWN_SECONDS = float(os.getenv("BACKEND_COOLDOWN_SECONDS", 30))
+
+
+class SqlConfig(Settings):
     def __init__(self) -> None:
         """
         Contains all the configurations related to the SQL server
@@ -86,13 +289,35 @@ class SqlConfig:
         self.SQL_PASSWORD = ""
         self.SQL_DATABASE = ""
         self.SQL_PORT = 5432
+        # Backend the generated queries run on (postgres or pinot)
+        self.SQL_BACKEND = os.getenv("SQL_BACKEND", "postgres").lower()
+        # Connection pool
+        self.SQL_POOL_SIZE = int(os.getenv("SQL_POOL_SIZE", 5))
+        self.SQL_POOL_RECYCLE = int(os.getenv("SQL_POOL_RECYCLE", 1500))
+        # Query results: rows per fetch (and per SSE frame when SQL_STREAM_RESULTS),
+        # and the caps after which the rest of the result is dropped (0 = no cap)
+        self.SQL_STREAM_RESULTS = (
+            os.getenv("SQL_STREAM_RESULTS", "false").lower() == "true"
+        )
+        self.SQL_FETCH_SIZE = int(os.getenv("SQL_FETCH_SIZE", 1000))
+        self.SQL_MAX_ROWS = int(os.getenv("SQL_MAX_ROWS", 100000))
+        self.SQL_MAX_BYTES = int(os.getenv("SQL_MAX_BYTES", 50 * 1024 * 1024))
+        # With SQL_STREAM_RESULTS, rows kept after streaming for the answer sample,
+        # the chart and the analytics record; the other chunks are released once sent
+        self.SQL_STREAM_KEEP_ROWS = int(os.getenv("SQL_STREAM_KEEP_ROWS", 1000))
+        # Outer LIMIT added to generated queries (or lowered when larger), 0 = none;
+        # SQL_TENANT_ROW_LIMITS overrides it per tenant, e.g. {"<tenantId>": 5000}
+        self.SQL_ROW_LIMIT = int(os.getenv("SQL_ROW_LIMIT", 1000))
+        self.SQL_TENANT_ROW_LIMITS = json.loads(
+            os.getenv("SQL_TENANT_ROW_LIMITS", "{}")
+        )
 
         self.DB_PATH = os.getenv("DB_PATH")
         self.CONVERSATION_ANALYTICS_TABLE = os.getenv("CONVERSATION_ANALYTICS_TABLE")
         self.RETRIEVAL_HISTORY_TABLE = os.getenv("RETREIVAL_HISTORY_TABLE")
 
 
-class MilvusConfig:
+class MilvusConfig(Settings):
     def __init__(self) -> None:
         """
         Contains all the configurations related to the Milvus server
@@ -106,25 +331,52 @@ class MilvusConfig:
         self.MILVUS_TIMEOUT = int(os.getenv("MILVUS_TIMEOUT"))
         # Index parameters
         self.MILVUS_VECTOR_DIM = int(os.getenv("MILVUS_VECTOR_DIM"))
+        # HNSW, or IVF_SQ8 (int8 scalar quantization) / IVF_PQ (product quantization,
+        # m sub-vectors of nbits each) for a smaller index; only the parameters of the
+        # index type are sent
         self.MILVUS_INDEX_TYPE = os.getenv("MILVUS_INDEX_TYPE")
         self.MILVUS_INDEX_PARAMS = {
             "M": os.getenv("MILVUS_INDEX_PARAM_M"),
-            "EFConstruction": os.getenv("MILVUS_INDEX_PARAM_EFCONSTRUCTION"),
+            "efConstruction": os.getenv("MILVUS_INDEX_PARAM_EFCONSTRUCTION"),
+            "nlist": os.getenv("MILVUS_INDEX_PARAM_NLIST", 128),
+            "m": os.getenv("MILVUS_INDEX_PARAM_PQ_M", 64),
+            "nbits": os.getenv("MILVUS_INDEX_PARAM_PQ_NBITS", 8),
         }
         self.MILVUS_DISTANCE_METRIC = os.getenv("MILVUS_DISTANCE_METRIC")
+        # Search parameters: HNSW candidate list size (ef, at least top_k) and IVF
+        # clusters probed (nprobe); 0 keeps the Milvus default
+        self.MILVUS_SEARCH_PARAMS = {
+            "ef": int(os.getenv("MILVUS_SEARCH_PARAM_EF", 0)),
+            "nprobe": int(os.getenv("MILVUS_SEARCH_PARAM_NPROBE", 0)),
+        }
+        # Seconds a verified collection is trusted to exist before has_collection is
+        # called again (0 checks before every search / insert)
+        self.MILVUS_COLLECTION_CACHE_TTL = float(
+            os.getenv("MILVUS_COLLECTION_CACHE_TTL", 300)
+        )
 
         self.MILVUS_TABLE_COLLECTION_NAME = os.getenv("MILVUS_TABLE_COLLECTION_NAME")
         self.MILVUS_COLUMN_COLLECTION_NAME = os.getenv("MILVUS_COLUMN_COLLECTION_NAME")
-        self.MILVUS_SQL_EXAMPLE_COLLECTION_NAME = os.getenv("MILVUS_SQL_EXAMPLE_COLLECTION_NAME")
+        self.MILVUS_SQL_EXAMPLE_COLLECTION_NAME = os.getenv(
+            "MILVUS_SQL_EXAMPLE_COLLECTION_NAME"
+        )
 
-        self.MILVUS_TABLE_RETURN_FIELDS = ["tableName"]
-        self.MILVUS_COLUMN_RETURN_FIELDS = [
-            "tableName",
-            "columnName",
+        # Heavy column fields kept out of Milvus in a local SQLite side store
+        # (COLUMN_STORE_PATH) when COLUMN_SIDE_STORE is true; the column search then
+        # only returns the names and the fields are read for the columns kept
+        self.COLUMN_SIDE_STORE = (
+            os.getenv("COLUMN_SIDE_STORE", "false").lower() == "true"
+        )
+        self.COLUMN_STORE_PATH = os.getenv("COLUMN_STORE_PATH", "data/column_store.db")
+        self.COLUMN_SIDE_STORE_FIELDS = [
             "columnDescription",
             "columnDataType",
             "columnSampleValue",
         ]
+        self.MILVUS_TABLE_RETURN_FIELDS = ["tableName"]
+        self.MILVUS_COLUMN_RETURN_FIELDS = ["tableName", "columnName"] + (
+            [] if self.COLUMN_SIDE_STORE else self.COLUMN_SIDE_STORE_FIELDS
+        )
         self.MILVUS_SQL_EXAMPLE_RETURN_FIELDS = [
             "question",
             "sqlQuery",
@@ -133,9 +385,45 @@ class MilvusConfig:
         self.MILVUS_TOP_TABLES_K = os.getenv("MILVUS_TOP_TABLES_K")
         self.MILVUS_TOP_COLUMNS_K = os.getenv("MILVUS_TOP_COLUMNS_K")
         self.MILVUS_TOP_SQL_EXAMPLES_K = os.getenv("MILVUS_TOP_SQL_EXAMPLES_K")
+        # Minimum cosine similarity of a retrieved column to be put in the prompt
+        self.MILVUS_COLUMN_DISTANCE_THRESHOLD = float(
+            os.getenv("MILVUS_COLUMN_DISTANCE_THRESHOLD", 0.7)
+        )
+        # SQL examples are partitioned by tenantID (Milvus partition key); a search
+        # only reads the tenant's partition and the one of this shared tenant
+        self.MILVUS_SQL_EXAMPLE_GLOBAL_TENANT = os.getenv(
+            "MILVUS_SQL_EXAMPLE_GLOBAL_TENANT", "global"
+        )
+        self.MILVUS_SQL_EXAMPLE_NUM_PARTITIONS = int(
+            os.getenv("MILVUS_SQL_EXAMPLE_NUM_PARTITIONS", 64)
+        )
+        # Threads of the pool running independent searches concurrently (search_many)
+        self.MILVUS_SEARCH_MAX_WORKERS = int(os.getenv("MILVUS_SEARCH_MAX_WORKERS", 4))
 
+        # Retrieval backend of the table and column collections: milvus, or local for
+        # an in-process NumPy index kept in LOCAL_VECTOR_DIR and synced from
+        # LOCAL_VECTOR_SYNC_SOURCE (milvus, or schema = embed SCHEMA_CATALOG_PATH)
+        self.RETRIEVAL_BACKEND = os.getenv("RETRIEVAL_BACKEND", "milvus").lower()
+        self.LOCAL_VECTOR_DIR = os.getenv("LOCAL_VECTOR_DIR", "data/local_vectors")
+        # none (float32) or int8 (per-vector scalar quantization, 4x smaller)
+        self.LOCAL_VECTOR_QUANTIZATION = os.getenv(
+            "LOCAL_VECTOR_QUANTIZATION", "none"
+        ).lower()
+        self.LOCAL_VECTOR_SYNC_SOURCE = os.getenv(
+            "LOCAL_VECTOR_SYNC_SOURCE", "milvus"
+        ).lower()
+        self.SCHEMA_CATALOG_PATH = os.getenv(
+            "SCHEMA_CATALOG_PATH", "data/sample_data/OLAP_fiveDayData.json"
+        )
+        # Dated schema snapshots (<dir>/<YYYY-MM-DD>/<file>) diffed by
+        # `python -m src.ingestion reindex`
+        self.SCHEMA_SNAPSHOT_DIR = os.getenv("SCHEMA_SNAPSHOT_DIR", "data_schemas")
+        self.SCHEMA_SNAPSHOT_FILE = os.getenv(
+            "SCHEMA_SNAPSHOT_FILE", "schema_info.json"
+        )
 
-class PinotConfig:
+
+class PinotConfig(Settings):
     def __init__(self) -> None:
         """
         Contains all the configurations related to the Pinot server
@@ -145,9 +433,19 @@ class PinotConfig:
         self.PINOT_DATABASE = os.getenv("PINOT_DATABASE")
         self.PINOT_BROKER_PORT = os.getenv("PINOT_BROKER_PORT")
         self.PINOT_CONTROLLER_PORT = os.getenv("PINOT_CONTROLLER_PORT")
+        # Broker and controller hosts, both on PINOT_SERVER unless set
+        self.PINOT_BROKER_URL = os.getenv("PINOT_BROKER_URL") or self.PINOT_SERVER
+        self.PINOT_CONTROLLER_URL = (
+            os.getenv("PINOT_CONTROLLER_URL") or self.PINOT_SERVER
+        )
+        # Multi-stage query engine: auto (probed once on the first connection),
+        # true or false
+        self.PINOT_MULTISTAGE_ENGINE = os.getenv(
+            "PINOT_MULTISTAGE_ENGINE", "auto"
+        ).lower()
 
 
-class OllamaConfig:
+class OllamaConfig(Settings):
     def __init__(self) -> None:
         """
         Contains all the configurations related to the Ollama server
@@ -157,3 +455,72 @@ class OllamaConfig:
         self.OLLAMA_API_KEY = os.getenv("OLLAMA_API_KEY")
         self.OLLAMA_MODEL = os.getenv("OLLAMA_MODEL")
         self.TEMPERATURE = float(os.getenv("OLLAMA_TEMPERATURE"))
+        # Embeddings (EMBEDDING_PROVIDER=ollama), sent in batches of this many inputs
+        self.OLLAMA_EMBEDDING_MODEL = os.getenv(
+            "OLLAMA_EMBEDDING_MODEL", "nomic-embed-text"
+        )
+        self.OLLAMA_EMBEDDING_MAX_BATCH_SIZE = int(
+            os.getenv("OLLAMA_EMBEDDING_MAX_BATCH_SIZE", 64)
+        )
+        # Backend pool: JSON list of Ollama hosts, e.g.
+        # [{"name": "gpu-1", "server": "http://gpu-1:11434/v1", "weight": 2}]
+        # When unset, the pool has the single OLLAMA_SERVER backend.
+        self.OLLAMA_SERVERS = json.loads(os.getenv("OLLAMA_SERVERS", "[]")) or [
+            {"name": "default", "server": self.OLLAMA_SERVER}
+        ]
+
+
+class AppConfig(Settings):
+    def __init__(self) -> None:
+        """
+        Contains all the configurations related to the API process itself
+        """
+        # Warm-up and readiness
+        self.WARMUP_ON_STARTUP = (
+            os.getenv("WARMUP_ON_STARTUP", "true").lower() == "true"
+        )
+        self.READINESS_RECHECK_INTERVAL = float(
+            os.getenv("READINESS_RECHECK_INTERVAL", 10)
+        )
+
+
+# Process-wide settings objects, built once through these accessors and frozen;
+# adapters keep subclassing the classes above.
+@lru_cache(maxsize=None)
+def get_database_config() -> DatabaseConfig:
+    return DatabaseConfig().freeze()
+
+
+@lru_cache(maxsize=None)
+def get_openai_config() -> OpenAIConfig:
+    return OpenAIConfig().freeze()
+
+
+@lru_cache(maxsize=None)
+def get_http_config() -> HttpConfig:
+    return HttpConfig().freeze()
+
+
+@lru_cache(maxsize=None)
+def get_sql_config() -> SqlConfig:
+    return SqlConfig().freeze()
+
+
+@lru_cache(maxsize=None)
+def get_milvus_config() -> MilvusConfig:
+    return MilvusConfig().freeze()
+
+
+@lru_cache(maxsize=None)
+def get_pinot_config() -> PinotConfig:
+    return PinotConfig().freeze()
+
+
+@lru_cache(maxsize=None)
+def get_ollama_config() -> OllamaConfig:
+    return OllamaConfig().freeze()
+
+
+@lru_cache(maxsize=None)
+def get_app_config() -> AppConfig:
+    return AppConfig().freeze()
@@ -5,7 +5,13 @@ from fastapi import FastAPI
 from fastapi.responses import StreamingResponse, JSONResponse
 from src.custom_exception import CustomException
 from src.types import GetAnswerModel, GetFixSqlModel
-from src.utils import api_response_builder, insert_into_vector_db
+from src.utils import (
+    api_response_builder,
+    insert_into_vector_db,
+    warm_up_dependencies,
+    check_readiness,
+)
+from config import get_app_config
 import json
 
 app = FastAPI(
@@ -23,6 +29,16 @@ app.add_middleware(
 )
 
 
+@app.on_event("startup")
+def warm_up():
+    """
+    Pre-warms the adapters (SQL pool, Milvus collections, OpenAI connection, plotly
+    templates) so the first real request does not pay for it.
+    """
+    if get_app_config().WARMUP_ON_STARTUP:
+        warm_up_dependencies()
+
+
 @app.get("/", tags=["Root"])
 async def read_root():
     """
@@ -31,6 +47,19 @@ async def read_root():
     return {"message": "BI Assistant API is running"}
 
 
+@app.get("/health/ready", tags=["Health"])
+def health_ready():
+    """
+    Readiness endpoint for the load balancer. Returns 200 with per-dependency
+    readiness and warm-up latency once every dependency is warm, 503 otherwise.
+    """
+    readiness = check_readiness()
+    return JSONResponse(
+        status_code=200 if readiness.ready else 503,
+        content=readiness.model_dump(),
+    )
+
+
 # @app.post("/get_answer", response_model=dict, tags=["BI Assistant"])
 # async def get_answer(data: GetAnswerModel):
 #     """
@@ -0,0 +1,181 @@
+import os
+import sqlite3
+import threading
+from config import MilvusConfig
+from src.custom_exception import CustomException
+from src.adapters.loggingmanager import logger
+from src.adapters.lazymanager import LazyManager
+from src.decorators import measure_time
+from typing import Any, Dict, Iterable, List
+
+# SQLite limits the number of bound parameters of a statement
+_MAX_PARAMS = 500
+
+
+class ColumnStoreManager(MilvusConfig):
+    def __init__(self) -> None:
+        """
+        Side store of the heavy column fields (COLUMN_SIDE_STORE=true): the description,
+        data type and sample values of each column live in a local SQLite table keyed
+        by "<tableName>.<columnName>", so the column search only returns names and
+        scores and the fields are read for the columns kept after filtering.
+
+        Each thread reads through its own connection; the database runs in WAL mode
+        so the ingestion can write while requests read.
+        """
+        super().__init__()
+        self.column_store_error = "Column Store Failed"
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(self.COLUMN_STORE_PATH) or ".", exist_ok=True)
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS column_details ("
+                "id TEXT PRIMARY KEY, "
+                + ", ".join(f"{field} TEXT" for field in self.COLUMN_SIDE_STORE_FIELDS)
+                + ")"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.COLUMN_STORE_PATH, timeout=30)
+
+    @property
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._connect()
+            self._local.connection = connection
+        return connection
+
+    @staticmethod
+    def column_id(table_name: str, column_name: str) -> str:
+        return f"{table_name}.{column_name}"
+
+    def upsert(self, transaction_id: str, records: Iterable[Dict[str, Any]]) -> int:
+        """
+        Writes the side store fields of column records (with an "id", or a tableName
+        and columnName), replacing existing ones.
+
+        Returns:
+            int: The number of records written.
+        """
+        rows = [
+            (
+                record.get("id")
+                or self.column_id(record["tableName"], record["columnName"]),
+                *(
+                    str(record.get(field) or "")
+                    for field in self.COLUMN_SIDE_STORE_FIELDS
+                ),
+            )
+            for record in records
+        ]
+        if not rows:
+            return 0
+        try:
+            with self._connection as connection:
+                connection.executemany(
+                    f"INSERT OR REPLACE INTO column_details "
+                    f"(id, {', '.join(self.COLUMN_SIDE_STORE_FIELDS)}) "
+                    f"VALUES ({', '.join('?' * (len(self.COLUMN_SIDE_STORE_FIELDS) + 1))})",
+                    rows,
+                )
+            logger.info(
+                f"[ColumnStoreManager][upsert] [{transaction_id}] - {len(rows)} columns written"
+            )
+            return len(rows)
+        except sqlite3.Error as exc:
+            logger.exception(
+                f"[ColumnStoreManager][upsert] [{transaction_id}] - Failed to write columns: {exc}"
+            )
+            raise CustomException(error=self.column_store_error, message=str(exc))
+
+    def delete(self, transaction_id: str, ids: List[str]) -> int:
+        """
+        Deletes columns by id.
+
+        Returns:
+            int: The number of columns deleted.
+        """
+        deleted = 0
+        try:
+            with self._connection as connection:
+                for start in range(0, len(ids), _MAX_PARAMS):
+                    chunk = ids[start : start + _MAX_PARAMS]
+                    deleted += connection.execute(
+                        f"DELETE FROM column_details WHERE id IN ({', '.join('?' * len(chunk))})",
+                        chunk,
+                    ).rowcount
+            return deleted
+        except sqlite3.Error as exc:
+            logger.exception(
+                f"[ColumnStoreManager][delete] [{transaction_id}] - Failed to delete columns: {exc}"
+            )
+            raise CustomException(error=self.column_store_error, message=str(exc))
+
+    def get_many(
+        self, transaction_id: str, ids: List[str]
+    ) -> Dict[str, Dict[str, str]]:
+        """
+        Reads the side store fields of columns by id.
+
+        Returns:
+            Dict[str, Dict[str, str]]: The fields of the columns found, keyed by id.
+        """
+        found = {}
+        try:
+            for start in range(0, len(ids), _MAX_PARAMS):
+                chunk = ids[start : start + _MAX_PARAMS]
+                rows = self._connection.execute(
+                    f"SELECT id, {', '.join(self.COLUMN_SIDE_STORE_FIELDS)} "
+                    f"FROM column_details WHERE id IN ({', '.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall()
+                for row in rows:
+                    found[row[0]] = dict(zip(self.COLUMN_SIDE_STORE_FIELDS, row[1:]))
+            return found
+        except sqlite3.Error as exc:
+            logger.exception(
+                f"[ColumnStoreManager][get_many] [{transaction_id}] - Failed to read columns: {exc}"
+            )
+            raise CustomException(error=self.column_store_error, message=str(exc))
+
+    def hydrate(
+        self, transaction_id: str, columns: List[Dict[str, str]]
+    ) -> List[Dict[str, str]]:
+        """
+        Fills the side store fields of the given columns (dicts with tableName and
+        columnName) in place, with one read for all of them.
+
+        Returns:
+            List[Dict[str, str]]: The same columns.
+        """
+        ids = [
+            self.column_id(column["tableName"], column["columnName"])
+            for column in columns
+        ]
+        details = self.get_many(transaction_id, ids)
+        for column_id, column in zip(ids, columns):
+            for field, value in details.get(column_id, {}).items():
+                if not column.get(field):
+                    column[field] = value
+        return columns
+
+    @measure_time
+    def warm_up(self, transaction_id: str = "root") -> int:
+        """
+        Opens the store of this thread and counts the columns it holds.
+
+        Returns:
+            int: The number of columns in the store.
+        """
+        count = self._connection.execute(
+            "SELECT COUNT(*) FROM column_details"
+        ).fetchone()[0]
+        logger.info(
+            f"[ColumnStoreManager][warm_up] [{transaction_id}] - {count} columns in {self.COLUMN_STORE_PATH}"
+        )
+        return count
+
+
+column_store_manager = LazyManager(ColumnStoreManager)
@@ -0,0 +1,76 @@
+import asyncio
+import threading
+import importlib.util
+from typing import Any, Coroutine, TypeVar
+from config import HttpConfig
+from src.adapters.loggingmanager import logger
+from src.adapters.lazymanager import LazyManager
+
+T = TypeVar("T")
+
+
+class HttpClientManager(HttpConfig):
+    """
+    A class that owns the process-wide httpx connection pools shared by the LLM adapters.
+
+    Inherits from the HttpConfig class.
+
+    An httpx.AsyncClient is bound to the event loop that opened its connections, so the
+    async pool lives on a dedicated background event loop. Synchronous code (e.g. the
+    streaming generator running in a worker thread) submits coroutines to that loop
+    with `run`.
+
+    Methods:
+        - run(coro: Coroutine, timeout: float = None) -> Any:
+            Runs a coroutine on the shared loop and blocks until it finishes.
+    """
+
+    def __init__(self) -> None:
+        """
+        Initializes an instance of the HttpClientManager class.
+        """
+        import httpx
+
+        super().__init__()
+        http2 = self.HTTP2_ENABLED
+        if http2 and importlib.util.find_spec("h2") is None:
+            logger.warning(
+                "[HttpClientManager] - h2 package not installed, falling back to HTTP/1.1"
+            )
+            http2 = False
+        limits = httpx.Limits(
+            max_connections=self.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=self.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=self.HTTP_KEEPALIVE_EXPIRY,
+        )
+        timeout = httpx.Timeout(self.HTTP_TIMEOUT, connect=self.HTTP_CONNECT_TIMEOUT)
+        self.sync_client = httpx.Client(
+            limits=limits, timeout=timeout, http2=http2, follow_redirects=True
+        )
+        self.async_client = httpx.AsyncClient(
+            limits=limits, timeout=timeout, http2=http2, follow_redirects=True
+        )
+        self.loop = asyncio.new_event_loop()
+        self._loop_thread = threading.Thread(
+            target=self.loop.run_forever, name="http-client-loop", daemon=True
+        )
+        self._loop_thread.start()
+        logger.info(
+            f"[HttpClientManager] - HTTP clients initialized (http2={http2}, max_connections={self.HTTP_MAX_CONNECTIONS})"
+        )
+
+    def run(self, coro: Coroutine[Any, Any, T], timeout: float = None) -> T:
+        """
+        Runs a coroutine on the shared event loop and blocks until it finishes.
+
+        Args:
+            coro (Coroutine): The coroutine to run, e.g. a hedged chat completion.
+            timeout (float, optional): Seconds to wait for the result. Defaults to no limit.
+
+        Returns:
+            Any: The result of the coroutine.
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+
+http_client_manager = LazyManager(HttpClientManager)
@@ -0,0 +1,57 @@
+import threading
+from typing import Any, Callable, Generic, TypeVar
+
+T = TypeVar("T")
+
+
+class LazyManager(Generic[T]):
+    """
+    A proxy that builds an adapter on first use instead of at import time.
+
+    Module level singletons such as `milvus_manager` are wrapped in a LazyManager so
+    importing an adapter does not connect to its backend. The wrapped instance is
+    created (once, thread-safely) the first time any attribute is accessed.
+
+    Methods:
+        - get_instance() -> T:
+            Returns the wrapped adapter, building it if needed.
+
+        - is_initialized -> bool:
+            True once the wrapped adapter has been built.
+    """
+
+    def __init__(self, factory: Callable[[], T]) -> None:
+        """
+        Initializes the proxy.
+
+        Args:
+            factory (Callable[[], T]): Builds the adapter, usually the adapter class itself.
+        """
+        object.__setattr__(self, "_factory", factory)
+        object.__setattr__(self, "_instance", None)
+        object.__setattr__(self, "_lock", threading.Lock())
+
+    def get_instance(self) -> T:
+        """
+        Returns the wrapped adapter, building it on the first call.
+
+        Returns:
+            T: The adapter instance.
+        """
+        instance = self._instance
+        if instance is None:
+            with self._lock:
+                if self._instance is None:
+                    object.__setattr__(self, "_instance", self._factory())
+                instance = self._instance
+        return instance
+
+    @property
+    def is_initialized(self) -> bool:
+        return self._instance is not None
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.get_instance(), name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(self.get_instance(), name, value)
@@ -0,0 +1,477 @@
+import os
+import ast
+import json
+import threading
+import numpy as np
+from config import MilvusConfig
+from src.custom_exception import CustomException
+from src.adapters.loggingmanager import logger
+from src.adapters.lazymanager import LazyManager
+from src.decorators import measure_time
+from src.vector_compression import normalize, quantize_int8, int8_scores
+from typing import Any, Dict, List, Tuple, Union
+
+
+def _to_python(value: Any) -> Any:
+    return value.item() if isinstance(value, np.generic) else value
+
+
+class LocalCollection:
+    """
+    A collection held in process: a read-only memory-mapped matrix of unit vectors
+    (one row per record, float32, or int8 codes with a float32 scale per row) and one
+    NumPy array per metadata field, the primary keys being the "id" field.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        vectors: np.ndarray,
+        fields: Dict[str, np.ndarray],
+        scales: np.ndarray = None,
+    ) -> None:
+        self.name = name
+        self.vectors = vectors
+        self.fields = fields
+        self.scales = scales
+
+    def _scores(self, query: np.ndarray, row_ids: np.ndarray = None) -> np.ndarray:
+        vectors = self.vectors if row_ids is None else self.vectors[row_ids]
+        if self.scales is None:
+            return vectors @ query
+        scales = self.scales if row_ids is None else self.scales[row_ids]
+        return int8_scores(vectors, scales, query)
+
+    def search(
+        self,
+        text_embedding: Union[List[float], np.ndarray],
+        return_fields: List[str],
+        filters: List[Tuple[str, List[Any]]],
+        top_k: int,
+    ) -> List[Dict[str, Any]]:
+        """
+        Cosine top-k over the rows matching every (field, allowed values) filter.
+        """
+        query = np.asarray(text_embedding, dtype=np.float32)
+        if query.shape[0] != self.vectors.shape[1]:
+            raise ValueError(
+                f"Query dimension {query.shape[0]} does not match collection {self.name} dimension {self.vectors.shape[1]}"
+            )
+        query = query / (np.linalg.norm(query) or 1.0)
+        candidates = None
+        for field, values in filters:
+            mask = np.isin(self.fields[field], values)
+            candidates = mask if candidates is None else candidates & mask
+        if candidates is None:
+            row_ids = np.arange(self.vectors.shape[0])
+            scores = self._scores(query)
+        else:
+            row_ids = np.flatnonzero(candidates)
+            scores = self._scores(query, row_ids)
+        top_k = min(int(top_k), scores.shape[0])
+        if top_k <= 0:
+            return []
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        best = best[np.argsort(-scores[best])]
+        return [
+            {
+                "id": _to_python(self.fields["id"][row_ids[idx]]),
+                "distance": float(scores[idx]),
+                "entity": {
+                    field: _to_python(self.fields[field][row_ids[idx]])
+                    for field in return_fields
+                },
+            }
+            for idx in best
+        ]
+
+
+class LocalVectorManager(MilvusConfig):
+    def __init__(self) -> None:
+        """
+        In-process retrieval for the small table and column collections
+        (RETRIEVAL_BACKEND=local), searched with NumPy instead of a Milvus round-trip.
+
+        Each collection is stored in LOCAL_VECTOR_DIR as "<name>.f32" (a float32 matrix of
+        unit vectors, memory-mapped read-only) and "<name>.json" (dimension, row count and
+        the metadata fields as arrays, the primary keys as "id"). With LOCAL_VECTOR_QUANTIZATION=int8 the vectors
+        are stored as "<name>.i8" int8 codes and "<name>.scales.f32", a quarter of the
+        size. The files are built by `sync_from_milvus` or
+        `sync_from_schema_file` (python -m src.migrations sync-local); a collection
+        without files is synced from LOCAL_VECTOR_SYNC_SOURCE on first use.
+
+        search_index has the signature and result format of MilvusManager.search_index.
+        Filter expressions are limited to `field in [...]` and `field == value` terms
+        joined by `and`.
+        """
+        super().__init__()
+        self.local_vector_error = "Local Vector Search Failed"
+        self._collections: Dict[str, LocalCollection] = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.LOCAL_VECTOR_DIR, exist_ok=True)
+
+    def _paths(self, collection_name: str) -> Tuple[str, str]:
+        base = os.path.join(self.LOCAL_VECTOR_DIR, collection_name)
+        return base, f"{base}.json"
+
+    @staticmethod
+    def _memmap(path: str, dtype: type, shape: Tuple[int, ...]) -> np.ndarray:
+        if not shape[0]:
+            return np.empty(shape, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode="r", shape=shape)
+
+    def _load(self, collection_name: str) -> LocalCollection:
+        base, metadata_path = self._paths(collection_name)
+        with open(metadata_path, "r", encoding="utf-8") as f:
+            metadata = json.load(f)
+        shape = (metadata["count"], metadata["dim"])
+        scales = None
+        if metadata.get("quantization") == "int8":
+            vectors = self._memmap(f"{base}.i8", np.int8, shape)
+            scales = self._memmap(f"{base}.scales.f32", np.float32, shape[:1])
+        else:
+            vectors = self._memmap(f"{base}.f32", np.float32, shape)
+        # Unicode arrays keep the filters vectorized; fields holding other values
+        # (numbers, nulls) stay object arrays
+        fields = {
+            field: np.array(
+                values,
+                dtype=str if all(isinstance(v, str) for v in values) else object,
+            )
+            for field, values in metadata["fields"].items()
+        }
+        return LocalCollection(collection_name, vectors, fields, scales=scales)
+
+    def _has_files(self, collection_name: str) -> bool:
+        # Files written before the primary keys were stored are synced again
+        metadata_path = self._paths(collection_name)[1]
+        if not os.path.exists(metadata_path):
+            return False
+        with open(metadata_path, "r", encoding="utf-8") as f:
+            return "id" in json.load(f)["fields"]
+
+    def get_collection(
+        self, transaction_id: str, collection_name: str
+    ) -> LocalCollection:
+        """
+        Returns a loaded collection, syncing it from LOCAL_VECTOR_SYNC_SOURCE first when
+        it has no local files yet.
+        """
+        collection = self._collections.get(collection_name)
+        if collection is not None:
+            return collection
+        with self._lock:
+            collection = self._collections.get(collection_name)
+            if collection is None:
+                if not self._has_files(collection_name):
+                    if self.LOCAL_VECTOR_SYNC_SOURCE == "schema":
+                        self.sync_from_schema_file(
+                            transaction_id, reload=False, collections=[collection_name]
+                        )
+                    else:
+                        self.sync_from_milvus(
+                            transaction_id, collection_name, reload=False
+                        )
+                collection = self._load(collection_name)
+                self._collections[collection_name] = collection
+                logger.info(
+                    f"[LocalVectorManager][get_collection] [{transaction_id}] - Collection {collection_name} loaded ({collection.vectors.shape[0]} records)"
+                )
+        return collection
+
+    def write_collection(
+        self,
+        transaction_id: str,
+        collection_name: str,
+        vectors: np.ndarray,
+        fields: Dict[str, List[Any]],
+        reload: bool = True,
+    ) -> int:
+        """
+        Normalizes the vectors (and quantizes them with LOCAL_VECTOR_QUANTIZATION=int8)
+        and writes the files of a collection, replacing the previous version atomically.
+
+        Args:
+            transaction_id (str): The transaction ID
+            collection_name (str): The collection name
+            vectors (np.ndarray): One row per record.
+            fields (Dict[str, List[Any]]): Metadata values per field, one per record,
+                with the primary keys as "id".
+            reload (bool): Swap the in-memory collection for the new files.
+
+        Returns:
+            int: The number of records written.
+        """
+        vectors = normalize(vectors)
+        base, metadata_path = self._paths(collection_name)
+        if self.LOCAL_VECTOR_QUANTIZATION == "int8" and vectors.size:
+            codes, scales = quantize_int8(vectors)
+            arrays = {f"{base}.i8": codes, f"{base}.scales.f32": scales}
+        else:
+            arrays = {f"{base}.f32": vectors}
+        for path, array in arrays.items():
+            with open(f"{path}.tmp", "wb") as f:
+                f.write(np.ascontiguousarray(array).tobytes())
+        with open(f"{metadata_path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "dim": int(vectors.shape[1]) if vectors.ndim == 2 else 0,
+                    "count": int(vectors.shape[0]),
+                    "quantization": "int8" if len(arrays) == 2 else "none",
+                    "fields": fields,
+                },
+                f,
+                ensure_ascii=False,
+            )
+        for path in arrays:
+            os.replace(f"{path}.tmp", path)
+        os.replace(f"{metadata_path}.tmp", metadata_path)
+        if reload:
+            collection = self._load(collection_name)
+            with self._lock:
+                self._collections[collection_name] = collection
+        logger.info(
+            f"[LocalVectorManager][write_collection] [{transaction_id}] - {vectors.shape[0]} records written to {collection_name}"
+        )
+        return int(vectors.shape[0])
+
+    def sync_from_milvus(
+        self, transaction_id: str, collection_name: str, reload: bool = True
+    ) -> int:
+        """
+        Copies every record of a Milvus collection (its vector and scalar fields) to the
+        local files.
+
+        Returns:
+            int: The number of records copied.
+        """
+        from pymilvus import DataType
+        from src.adapters.milvusmanager import milvus_manager
+
+        client = milvus_manager.milvus_client
+        schema = client.describe_collection(collection_name=collection_name)
+        vector_field = next(
+            field["name"]
+            for field in schema["fields"]
+            if field["type"] == DataType.FLOAT_VECTOR
+        )
+        primary_field = next(
+            field["name"] for field in schema["fields"] if field.get("is_primary")
+        )
+        scalar_fields = [
+            field["name"]
+            for field in schema["fields"]
+            if field["name"] != vector_field
+            and field["type"] not in (DataType.JSON, DataType.ARRAY)
+            and not field.get("is_primary")
+        ]
+        client.load_collection(collection_name=collection_name)
+        iterator = client.query_iterator(
+            collection_name=collection_name,
+            batch_size=1000,
+            output_fields=scalar_fields + [vector_field],
+        )
+        vectors = []
+        fields = {"id": [], **{field: [] for field in scalar_fields}}
+        try:
+            while True:
+                records = iterator.next()
+                if not records:
+                    break
+                for record in records:
+                    vectors.append(record[vector_field])
+                    fields["id"].append(record[primary_field])
+                    for field in scalar_fields:
+                        fields[field].append(record.get(field))
+        finally:
+            iterator.close()
+        dim = len(vectors[0]) if vectors else self.MILVUS_VECTOR_DIM
+        return self.write_collection(
+            transaction_id,
+            collection_name,
+            np.asarray(vectors, dtype=np.float32).reshape(len(vectors), dim),
+            fields,
+            reload=reload,
+        )
+
+    def sync_from_schema_file(
+        self,
+        transaction_id: str,
+        schema_path: str = None,
+        reload: bool = True,
+        collections: List[str] = None,
+    ) -> Dict[str, int]:
+        """
+        Builds the table and column collections from the schema catalog JSON
+        ({table: {"tableDescription", "tableCluster", "columns": {column: {...}}}}),
+        embedding the descriptions with the EMBEDDING_PROVIDER model.
+
+        Args:
+            transaction_id (str): The transaction ID
+            schema_path (str, optional): Defaults to SCHEMA_CATALOG_PATH.
+            reload (bool): Swap the in-memory collections for the new files.
+            collections (List[str], optional): Only write these collections.
+
+        Returns:
+            Dict[str, int]: The number of records written per collection.
+        """
+        from src.utils import get_embedding_manager
+
+        with open(schema_path or self.SCHEMA_CATALOG_PATH, "r", encoding="utf-8") as f:
+            catalog = json.load(f)
+        tables = {
+            field: []
+            for field in ("id", "tableName", "tableDescription", "tableCluster")
+        }
+        columns = {
+            field: []
+            for field in (
+                "id",
+                "tableName",
+                "columnName",
+                "columnDescription",
+                "columnDataType",
+                "columnSampleValue",
+            )
+        }
+        for table_name, table_info in catalog.items():
+            # Same record ids as the Milvus collections (src.ingestion)
+            tables["id"].append(table_name)
+            tables["tableName"].append(table_name)
+            tables["tableDescription"].append(table_info.get("tableDescription", ""))
+            tables["tableCluster"].append(table_info.get("tableCluster", ""))
+            for column_name, column_info in table_info.get("columns", {}).items():
+                if not isinstance(column_info, dict):
+                    continue
+                columns["id"].append(f"{table_name}.{column_name}")
+                columns["tableName"].append(table_name)
+                columns["columnName"].append(column_name)
+                columns["columnDescription"].append(
+                    column_info.get("columnDescription", "")
+                )
+                columns["columnDataType"].append(column_info.get("type", ""))
+                columns["columnSampleValue"].append(
+                    str(column_info.get("sampleValues", ""))
+                )
+
+        embedding_manager = get_embedding_manager()
+        written = {}
+        for collection_name, fields, text_field in (
+            (self.MILVUS_TABLE_COLLECTION_NAME, tables, "tableDescription"),
+            (self.MILVUS_COLUMN_COLLECTION_NAME, columns, "columnDescription"),
+        ):
+            if not collection_name or (
+                collections is not None and collection_name not in collections
+            ):
+                continue
+            _, embedding_response = embedding_manager.create_embeddings(
+                texts=fields[text_field], transaction_id=transaction_id
+            )
+            written[collection_name] = self.write_collection(
+                transaction_id,
+                collection_name,
+                embedding_response.embeddings,
+                fields,
+                reload=reload,
+            )
+        return written
+
+    @staticmethod
+    def _parse_filter_expr(filter_expr: str) -> List[Tuple[str, List[Any]]]:
+        """
+        Parses `field in [...]` / `field == value` terms joined by `and` (which are also
+        Python expressions) into (field, allowed values) filters.
+        """
+        if not filter_expr.strip():
+            return []
+        expression = ast.parse(filter_expr.strip(), mode="eval").body
+        terms = (
+            expression.values
+            if isinstance(expression, ast.BoolOp) and isinstance(expression.op, ast.And)
+            else [expression]
+        )
+        filters = []
+        for term in terms:
+            if not (
+                isinstance(term, ast.Compare)
+                and isinstance(term.left, ast.Name)
+                and len(term.ops) == 1
+                and isinstance(term.ops[0], (ast.In, ast.Eq))
+            ):
+                raise ValueError(f"Unsupported filter expression: {ast.unparse(term)}")
+            value = ast.literal_eval(term.comparators[0])
+            filters.append(
+                (
+                    term.left.id,
+                    list(value) if isinstance(term.ops[0], ast.In) else [value],
+                )
+            )
+        return filters
+
+    @measure_time
+    def warm_up(self, transaction_id: str = "root") -> List[str]:
+        """
+        Loads (syncing when needed) the table and column collections.
+
+        Returns:
+            List[str]: The names of the collections that were loaded.
+        """
+        collection_names = [
+            collection_name
+            for collection_name in [
+                self.MILVUS_TABLE_COLLECTION_NAME,
+                self.MILVUS_COLUMN_COLLECTION_NAME,
+            ]
+            if collection_name
+        ]
+        for collection_name in collection_names:
+            self.get_collection(transaction_id, collection_name)
+        return collection_names
+
+    @measure_time
+    def search_index(
+        self,
+        transaction_id: str,
+        collection_name: str,
+        text_embedding: Union[List[float], np.ndarray],
+        return_fields: List[str],
+        filter_expr: str = "",
+        top_k: int = 5,
+        search_params: Dict[str, Any] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Searches for similar items in a local collection, like MilvusManager.search_index.
+
+        Args:
+            transaction_id (str): A unique identifier for the transaction.
+            collection_name (str): The name of the collection to search in.
+            text_embedding (Union[List[float], np.ndarray]): The query vector.
+            return_fields (List[str]): A list of fields to include in the search results.
+            filter_expr (str, optional): `field in [...]` / `field == value` terms joined by `and`.
+            top_k (int, optional): The number of top similar items to retrieve. Defaults to 5.
+            search_params (Dict[str, Any], optional): Ignored, the search is exact.
+
+        Returns:
+            List[List[Dict[str, Any]]]: [[{"id", "distance", "entity"}]], distance being
+                the cosine similarity, best first.
+        """
+        try:
+            collection = self.get_collection(transaction_id, collection_name)
+            results = collection.search(
+                text_embedding=text_embedding,
+                return_fields=return_fields,
+                filters=self._parse_filter_expr(filter_expr or ""),
+                top_k=top_k,
+            )
+            logger.info(
+                f"[LocalVectorManager][search_index] [{transaction_id}] - Data retrieved successfully from collection {collection_name}"
+            )
+            return [results]
+        except Exception as exc:
+            logger.exception(
+                f"[LocalVectorManager][search_index] [{transaction_id}] - Failed to retrieve data from collection {collection_name}: {exc}"
+            )
+            raise CustomException(error=self.local_vector_error, message=str(exc))
+
+
+local_vector_manager = LazyManager(LocalVectorManager)
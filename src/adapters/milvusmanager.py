@@ -1,12 +1,28 @@
-from pymilvus import (
-    MilvusClient,
-)
-from pymilvus.exceptions import MilvusException
-from config import MilvusConfig
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from config import MilvusConfig, get_milvus_config
 from src.custom_exception import CustomException
 from src.adapters.loggingmanager import logger
+from src.adapters.lazymanager import LazyManager
 from src.decorators import measure_time
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple, Union
+import numpy as np
+
+# Build parameters of each index type, read from MILVUS_INDEX_PARAMS
+INDEX_PARAM_NAMES = {
+    "HNSW": ("M", "efConstruction"),
+    "IVF_FLAT": ("nlist",),
+    "IVF_SQ8": ("nlist",),
+    "IVF_PQ": ("nlist", "m", "nbits"),
+}
+# Search parameters of each index type, read from MILVUS_SEARCH_PARAMS
+SEARCH_PARAM_NAMES = {
+    "HNSW": ("ef",),
+    "IVF_FLAT": ("nprobe",),
+    "IVF_SQ8": ("nprobe",),
+    "IVF_PQ": ("nprobe",),
+}
 
 
 class MilvusManager(MilvusConfig):
@@ -14,8 +30,19 @@ class MilvusManager(MilvusConfig):
         """
         Contains all the methods to manage the Milvus server
         """
+        from pymilvus import MilvusClient
+        from pymilvus.exceptions import MilvusException
+
         super().__init__()
         self.milvus_error = "Milvus Server Failed"
+        # collection name -> time.monotonic() until which it is known to exist
+        self._collection_cache: Dict[str, float] = {}
+        self._collection_cache_lock = threading.Lock()
+        # Bounded pool running the searches of search_many concurrently
+        self._search_executor = ThreadPoolExecutor(
+            max_workers=self.MILVUS_SEARCH_MAX_WORKERS,
+            thread_name_prefix="milvus-search",
+        )
         try:
             self.milvus_client = MilvusClient(
                 uri=f"tcp://{self.MILVUS_HOST}:{self.MILVUS_PORT}",
@@ -36,23 +63,44 @@ class MilvusManager(MilvusConfig):
     def check_collection_exists(
         self,
         transaction_id: str,
-        collection_name: str = MilvusConfig().MILVUS_COLLECTION_NAME,
+        collection_name: str = get_milvus_config().MILVUS_COLLECTION_NAME,
+        use_cache: bool = True,
     ) -> bool:
         """
         Check if the collection exists in the Milvus server
 
+        A collection found to exist is cached for MILVUS_COLLECTION_CACHE_TTL seconds, so
+        searches and inserts do not pay a has_collection round-trip each. Missing
+        collections are never cached.
+
         Args:
             transaction_id (str): The transaction ID
             collection_name (str): The name of the collection to check
+            use_cache (bool): Answer from the cache when the collection was verified
+                within the TTL.
 
         Returns:
             bool: True if the collection exists, False otherwise
         """
+        from pymilvus.exceptions import MilvusException
+
+        if (
+            use_cache
+            and self._collection_cache.get(collection_name, 0) > time.monotonic()
+        ):
+            return True
         try:
             status = self.milvus_client.has_collection(collection_name)
             logger.info(
                 f"[MilvusManager][check_collection_exists] [{transaction_id}] - Collection {collection_name} exists: {status}"
             )
+            with self._collection_cache_lock:
+                if status and self.MILVUS_COLLECTION_CACHE_TTL > 0:
+                    self._collection_cache[collection_name] = (
+                        time.monotonic() + self.MILVUS_COLLECTION_CACHE_TTL
+                    )
+                else:
+                    self._collection_cache.pop(collection_name, None)
             return status
         except MilvusException as milvus_exc:
             logger.exception(
@@ -65,15 +113,331 @@ class MilvusManager(MilvusConfig):
             )
             raise CustomException(error=self.milvus_error, message=str(exc))
 
+    def invalidate_collection_cache(self, collection_name: str = None) -> None:
+        """
+        Forgets that a collection (or every collection) exists, so the next operation
+        verifies it again with has_collection.
+        """
+        with self._collection_cache_lock:
+            if collection_name is None:
+                self._collection_cache.clear()
+            else:
+                self._collection_cache.pop(collection_name, None)
+
+    def ensure_collection(
+        self,
+        transaction_id: str,
+        collection_name: str,
+        text_fields: List[str],
+        vector_field: str,
+        dim: int = None,
+        recreate: bool = False,
+        auto_id: bool = False,
+        partition_key_field: str = None,
+        num_partitions: int = None,
+    ) -> bool:
+        """
+        Creates a collection with a VARCHAR primary key "id", VARCHAR text fields and a
+        FLOAT_VECTOR field, unless it already exists. An existing collection must have
+        that layout (checked by _check_schema), so that inserts of the records do not
+        fail half way through a load.
+
+        Args:
+            transaction_id (str): The transaction ID
+            collection_name (str): The name of the collection
+            text_fields (List[str]): The scalar fields, stored as VARCHAR.
+            vector_field (str): The vector field.
+            dim (int, optional): Vector dimension. Defaults to MILVUS_VECTOR_DIM.
+            recreate (bool): Drop the collection first if it exists.
+            auto_id (bool): Use an auto generated INT64 primary key instead.
+            partition_key_field (str, optional): Text field used as partition key, so
+                filters on it only scan the matching partitions.
+            num_partitions (int, optional): Partitions of the partition key.
+
+        Returns:
+            bool: True if the collection was created.
+
+        Raises:
+            CustomException: If the collection can not be created, or exists with
+                another layout.
+        """
+        from pymilvus import DataType
+
+        try:
+            if self.check_collection_exists(
+                transaction_id, collection_name, use_cache=False
+            ):
+                if not recreate:
+                    self._check_schema(
+                        collection_name,
+                        text_fields,
+                        vector_field,
+                        dim or self.MILVUS_VECTOR_DIM,
+                        auto_id,
+                    )
+                    return False
+                self.milvus_client.drop_collection(collection_name=collection_name)
+                self.invalidate_collection_cache(collection_name)
+            schema = self.milvus_client.create_schema(
+                auto_id=False, enable_dynamic_field=False
+            )
+            if auto_id:
+                schema.add_field(
+                    field_name="id",
+                    datatype=DataType.INT64,
+                    is_primary=True,
+                    auto_id=True,
+                )
+            else:
+                schema.add_field(
+                    field_name="id",
+                    datatype=DataType.VARCHAR,
+                    max_length=512,
+                    is_primary=True,
+                )
+            for field_name in text_fields:
+                schema.add_field(
+                    field_name=field_name,
+                    datatype=DataType.VARCHAR,
+                    max_length=512 if field_name == partition_key_field else 65535,
+                    is_partition_key=field_name == partition_key_field,
+                )
+            schema.add_field(
+                field_name=vector_field,
+                datatype=DataType.FLOAT_VECTOR,
+                dim=dim or self.MILVUS_VECTOR_DIM,
+            )
+            self.milvus_client.create_collection(
+                collection_name=collection_name,
+                schema=schema,
+                **(
+                    {"num_partitions": num_partitions}
+                    if partition_key_field and num_partitions
+                    else {}
+                ),
+            )
+            logger.info(
+                f"[MilvusManager][ensure_collection] [{transaction_id}] - Collection {collection_name} created"
+            )
+            return True
+        except CustomException:
+            raise
+        except Exception as exc:
+            logger.exception(
+                f"[MilvusManager][ensure_collection] [{transaction_id}] - Failed to create collection {collection_name}: {exc}"
+            )
+            raise CustomException(error=self.milvus_error, message=str(exc))
+
+    def _check_schema(
+        self,
+        collection_name: str,
+        text_fields: List[str],
+        vector_field: str,
+        dim: int,
+        auto_id: bool,
+    ) -> None:
+        """
+        Compares an existing collection with the layout ensure_collection creates.
+
+        Raises:
+            CustomException: Naming every difference, e.g. an INT64 / auto id primary
+                key where the records carry string ids, and how to rebuild it.
+        """
+        from pymilvus import DataType
+
+        schema = self.milvus_client.describe_collection(collection_name=collection_name)
+        fields = {field["name"]: field for field in schema["fields"]}
+        problems = []
+        primary = next(
+            (field for field in schema["fields"] if field.get("is_primary")), None
+        )
+        expected_type = DataType.INT64 if auto_id else DataType.VARCHAR
+        if (
+            primary is None
+            or primary["name"] != "id"
+            or primary["type"] != expected_type
+            or bool(primary.get("auto_id")) != auto_id
+        ):
+            problems.append(
+                f"primary key {primary and primary['name']!r} of type "
+                f"{primary and primary['type']!r} (auto_id={primary and primary.get('auto_id')}), "
+                f"expected 'id' {expected_type!r} (auto_id={auto_id})"
+            )
+        vector = fields.get(vector_field)
+        if vector is None:
+            problems.append(f"no vector field {vector_field!r}")
+        elif int(vector.get("params", {}).get("dim", dim)) != dim:
+            problems.append(
+                f"{vector_field!r} has dimension {vector['params']['dim']}, expected {dim}"
+            )
+        scalar_fields = set(fields) - {"id", vector_field}
+        if primary is not None:
+            scalar_fields.discard(primary["name"])
+        if scalar_fields != set(text_fields):
+            problems.append(
+                f"fields missing {sorted(set(text_fields) - scalar_fields)}, "
+                f"unexpected {sorted(scalar_fields - set(text_fields))}"
+            )
+        if problems:
+            raise CustomException(
+                error=self.milvus_error,
+                message=f"Collection {collection_name} does not match the records to load: "
+                + "; ".join(problems)
+                + ". Rebuild it (python -m src.ingestion load --recreate) or migrate it first.",
+            )
+
+    @measure_time
+    def create_index(
+        self,
+        transaction_id: str,
+        collection_name: str,
+        field_name: str,
+        index_type: str = None,
+    ) -> bool:
+        """
+        Builds the vector index of a collection with MILVUS_DISTANCE_METRIC and the
+        MILVUS_INDEX_PARAMS of the index type, then loads it.
+
+        Args:
+            transaction_id (str): The transaction ID
+            collection_name (str): The name of the collection
+            field_name (str): The vector field to index.
+            index_type (str, optional): Defaults to MILVUS_INDEX_TYPE.
+
+        Returns:
+            bool: True once the index is built and the collection loaded.
+
+        Raises:
+            CustomException: If the index can not be built.
+        """
+        index_type = (index_type or self.MILVUS_INDEX_TYPE).upper()
+        try:
+            index_params = self.milvus_client.prepare_index_params()
+            index_params.add_index(
+                field_name=field_name,
+                index_type=index_type,
+                metric_type=self.MILVUS_DISTANCE_METRIC,
+                params={
+                    key: int(self.MILVUS_INDEX_PARAMS[key])
+                    for key in INDEX_PARAM_NAMES.get(index_type, ())
+                    if self.MILVUS_INDEX_PARAMS.get(key)
+                },
+            )
+            self.milvus_client.create_index(
+                collection_name=collection_name, index_params=index_params
+            )
+            self.milvus_client.load_collection(collection_name=collection_name)
+            logger.info(
+                f"[MilvusManager][create_index] [{transaction_id}] - {index_type} index built on {collection_name}.{field_name}"
+            )
+            return True
+        except Exception as exc:
+            logger.exception(
+                f"[MilvusManager][create_index] [{transaction_id}] - Failed to build the index of {collection_name}: {exc}"
+            )
+            raise CustomException(error=self.milvus_error, message=str(exc))
+
+    def flush(self, transaction_id: str, collection_name: str) -> None:
+        """
+        Seals the growing segments of a collection so the inserted data is persisted
+        and indexed. Bulk loads call it once at the end instead of after each insert.
+        """
+        try:
+            self.milvus_client.flush(collection_name=collection_name)
+        except Exception as exc:
+            logger.exception(
+                f"[MilvusManager][flush] [{transaction_id}] - Failed to flush collection {collection_name}: {exc}"
+            )
+            raise CustomException(error=self.milvus_error, message=str(exc))
+
+    @measure_time
+    def warm_up(self, transaction_id: str = "root") -> List[str]:
+        """
+        Loads the table, column and SQL example collections into memory so the first
+        search does not pay for the collection load.
+
+        Args:
+            transaction_id (str): The transaction ID
+
+        Returns:
+            List[str]: The names of the collections that were loaded.
+
+        Raises:
+            CustomException: If a collection does not exist or can not be loaded.
+        """
+        collection_names = [
+            collection_name
+            for collection_name in [
+                self.MILVUS_TABLE_COLLECTION_NAME,
+                self.MILVUS_COLUMN_COLLECTION_NAME,
+                self.MILVUS_SQL_EXAMPLE_COLLECTION_NAME,
+            ]
+            if collection_name
+        ]
+        for collection_name in collection_names:
+            if not self.check_collection_exists(
+                transaction_id, collection_name, use_cache=False
+            ):
+                raise CustomException(
+                    error=self.milvus_error,
+                    message=f"Collection {collection_name} does not exist",
+                )
+            try:
+                self.milvus_client.load_collection(collection_name=collection_name)
+            except Exception as exc:
+                logger.exception(
+                    f"[MilvusManager][warm_up] [{transaction_id}] - Failed to load collection {collection_name}: {exc}"
+                )
+                raise CustomException(error=self.milvus_error, message=str(exc))
+        logger.info(
+            f"[MilvusManager][warm_up] [{transaction_id}] - Collections loaded: {collection_names}"
+        )
+        return collection_names
+
+    @measure_time
+    def ping(self, transaction_id: str = "root") -> List[str]:
+        """
+        Checks that the table, column and SQL example collections exist, used by the
+        readiness check. Unlike warm_up, nothing is loaded.
+
+        Args:
+            transaction_id (str): The transaction ID
+
+        Returns:
+            List[str]: The names of the collections that were checked.
+
+        Raises:
+            CustomException: If a collection does not exist or Milvus can not be reached.
+        """
+        collection_names = [
+            collection_name
+            for collection_name in [
+                self.MILVUS_TABLE_COLLECTION_NAME,
+                self.MILVUS_COLUMN_COLLECTION_NAME,
+                self.MILVUS_SQL_EXAMPLE_COLLECTION_NAME,
+            ]
+            if collection_name
+        ]
+        for collection_name in collection_names:
+            if not self.check_collection_exists(
+                transaction_id, collection_name, use_cache=False
+            ):
+                raise CustomException(
+                    error=self.milvus_error,
+                    message=f"Collection {collection_name} does not exist",
+                )
+        return collection_names
+
     @measure_time
     def search_index(
         self,
         transaction_id: str,
         collection_name: str,
-        text_embedding: List[float],
+        text_embedding: Union[List[float], np.ndarray],
         return_fields: List[str],
         filter_expr: str = "",
         top_k: int = 5,
+        search_params: Dict[str, Any] = None,
     ) -> List[Dict[str, Any]]:
         """
         Searches for similar items in a specified Milvus collection based on a given text embedding.
@@ -81,14 +445,31 @@ class MilvusManager(MilvusConfig):
         Args:
             transaction_id (str): A unique identifier for the transaction.
             collection_name (str): The name of the Milvus collection to search in.
-            text_embedding (List[float]): The embedding vector to search for similar items.
+            text_embedding (Union[List[float], np.ndarray]): The embedding vector to search for
+                similar items; float32 arrays are sent to Milvus without a list conversion.
             return_fields (List[str]): A list of fields to include in the search results.
             filter_expr (str, optional): An optional filter expression to apply to the search. Defaults to None.
             top_k (int, optional): The number of top similar items to retrieve. Defaults to 5.
+            search_params (Dict[str, Any], optional): Index search parameters (ef,
+                nprobe). Defaults to the MILVUS_SEARCH_PARAMS of MILVUS_INDEX_TYPE.
 
         Returns:
             List[Dict[str, Any]]: A list of dictionaries containing the search results.
         """
+        from pymilvus.exceptions import MilvusException
+
+        if search_params is None:
+            search_params = {
+                key: self.MILVUS_SEARCH_PARAMS[key]
+                for key in SEARCH_PARAM_NAMES.get(
+                    (self.MILVUS_INDEX_TYPE or "").upper(), ()
+                )
+                if self.MILVUS_SEARCH_PARAMS.get(key)
+            }
+        if "ef" in search_params:
+            # HNSW needs ef >= top_k
+            search_params = {**search_params, "ef": max(search_params["ef"], top_k)}
+
         if not self.check_collection_exists(transaction_id, collection_name):
             raise CustomException(
                 error=self.milvus_error,
@@ -101,6 +482,11 @@ class MilvusManager(MilvusConfig):
                 limit=top_k,
                 output_fields=return_fields,
                 filter=filter_expr,
+                **(
+                    {"search_params": {"params": search_params}}
+                    if search_params
+                    else {}
+                ),
             )
             logger.info(
                 f"[MilvusManager][search_index] [{transaction_id}] - Data retrieved successfully from collection {collection_name}"
@@ -110,6 +496,8 @@ class MilvusManager(MilvusConfig):
             logger.exception(
                 f"[MilvusManager][search_index] [{transaction_id}] - Failed to retrieve data from collection {collection_name}: {milvus_exc}"
             )
+            # The collection may have been dropped or renamed since it was cached
+            self.invalidate_collection_cache(collection_name)
             raise CustomException(error=self.milvus_error, message=str(milvus_exc))
         except Exception as exc:
             logger.exception(
@@ -117,6 +505,43 @@ class MilvusManager(MilvusConfig):
             )
             raise CustomException(error=self.milvus_error, message=str(exc))
 
+    def search_many(
+        self, transaction_id: str, searches: List[Dict[str, Any]]
+    ) -> List[Tuple[float, List[Dict[str, Any]]]]:
+        """
+        Runs several searches concurrently on the bounded search pool
+        (MILVUS_SEARCH_MAX_WORKERS threads) and waits for all of them.
+
+        Args:
+            transaction_id (str): A unique identifier for the transaction.
+            searches (List[Dict[str, Any]]): search_index keyword arguments
+                (collection_name, text_embedding, return_fields, filter_expr, top_k,
+                search_params). Several searches may target the same collection.
+
+        Returns:
+            List[Tuple[float, List[Dict[str, Any]]]]: The time taken and the search
+                result of each search, in the order of `searches`.
+
+        Raises:
+            CustomException: The error of the first failed search, once all are done.
+        """
+        futures = [
+            self._search_executor.submit(
+                self.search_index, transaction_id=transaction_id, **search
+            )
+            for search in searches
+        ]
+        results = []
+        search_exc = None
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as exc:
+                search_exc = search_exc or exc
+        if search_exc is not None:
+            raise search_exc
+        return results
+
     @measure_time
     def insert_data(
         self,
@@ -136,6 +561,8 @@ class MilvusManager(MilvusConfig):
         Raises:
             CustomException: If the collection does not exist or if there is an error during insertion.
         """
+        from pymilvus.exceptions import MilvusException
+
         if not self.check_collection_exists(transaction_id, collection_name):
             raise CustomException(
                 error=self.milvus_error,
@@ -155,6 +582,8 @@ class MilvusManager(MilvusConfig):
             logger.exception(
                 f"[MilvusManager][insert_data] [{transaction_id}] - Failed to insert data into collection {collection_name}: {milvus_exc}"
             )
+            # The collection may have been dropped or renamed since it was cached
+            self.invalidate_collection_cache(collection_name)
             raise CustomException(error=self.milvus_error, message=str(milvus_exc))
         except Exception as exc:
             logger.exception(
@@ -162,5 +591,157 @@ class MilvusManager(MilvusConfig):
             )
             raise CustomException(error=self.milvus_error, message=str(exc))
 
+    def query_all(
+        self,
+        transaction_id: str,
+        collection_name: str,
+        output_fields: List[str],
+        batch_size: int = 1000,
+        filter: str = "",
+    ) -> List[Dict[str, Any]]:
+        """
+        Reads every record of a collection (or the ones matching `filter`) with a
+        query iterator.
+
+        Args:
+            transaction_id (str): The transaction ID
+            collection_name (str): The name of the collection
+            output_fields (List[str]): The fields to read, vector fields included.
+            batch_size (int): Records per round-trip.
+            filter (str): Optional boolean expression the records must match.
+
+        Returns:
+            List[Dict[str, Any]]: The records.
+        """
+        try:
+            self.milvus_client.load_collection(collection_name=collection_name)
+            iterator = self.milvus_client.query_iterator(
+                collection_name=collection_name,
+                batch_size=batch_size,
+                output_fields=output_fields,
+                filter=filter,
+            )
+            records = []
+            try:
+                while True:
+                    batch = iterator.next()
+                    if not batch:
+                        break
+                    records.extend(batch)
+            finally:
+                iterator.close()
+            return records
+        except Exception as exc:
+            logger.exception(
+                f"[MilvusManager][query_all] [{transaction_id}] - Failed to read collection {collection_name}: {exc}"
+            )
+            self.invalidate_collection_cache(collection_name)
+            raise CustomException(error=self.milvus_error, message=str(exc))
+
+    @measure_time
+    def upsert_data(
+        self,
+        transaction_id: str,
+        collection_name: str,
+        data: List[Dict[str, Any]],
+    ) -> Dict[str, Any]:
+        """
+        Inserts or replaces records of a collection by primary key.
+
+        Args:
+            transaction_id (str): A unique identifier for the transaction.
+            collection_name (str): The name of the Milvus collection.
+            data (List[Dict[str, Any]]): Full records, primary key included.
+
+        Raises:
+            CustomException: If the collection does not exist or the upsert fails.
+        """
+        from pymilvus.exceptions import MilvusException
+
+        if not self.check_collection_exists(transaction_id, collection_name):
+            raise CustomException(
+                error=self.milvus_error,
+                message=f"Collection {collection_name} does not exist",
+            )
+        try:
+            upsert_res = self.milvus_client.upsert(
+                collection_name=collection_name, data=data
+            )
+            logger.info(
+                f"[MilvusManager][upsert_data] [{transaction_id}] - {upsert_res['upsert_count']} records upserted into collection {collection_name}"
+            )
+            return upsert_res
+        except MilvusException as milvus_exc:
+            logger.exception(
+                f"[MilvusManager][upsert_data] [{transaction_id}] - Failed to upsert data into collection {collection_name}: {milvus_exc}"
+            )
+            self.invalidate_collection_cache(collection_name)
+            raise CustomException(error=self.milvus_error, message=str(milvus_exc))
+        except Exception as exc:
+            logger.exception(
+                f"[MilvusManager][upsert_data] [{transaction_id}] - Failed to upsert data into collection {collection_name}: {exc}"
+            )
+            raise CustomException(error=self.milvus_error, message=str(exc))
+
+    def delete_data(
+        self, transaction_id: str, collection_name: str, ids: List[Union[str, int]]
+    ) -> int:
+        """
+        Deletes records of a collection by primary key.
+
+        Returns:
+            int: The number of records deleted.
+        """
+        if not ids:
+            return 0
+        try:
+            delete_res = self.milvus_client.delete(
+                collection_name=collection_name, ids=ids
+            )
+            delete_count = (
+                delete_res.get("delete_count", len(ids))
+                if isinstance(delete_res, dict)
+                else len(ids)
+            )
+            logger.info(
+                f"[MilvusManager][delete_data] [{transaction_id}] - {delete_count} records deleted from collection {collection_name}"
+            )
+            return delete_count
+        except Exception as exc:
+            logger.exception(
+                f"[MilvusManager][delete_data] [{transaction_id}] - Failed to delete data from collection {collection_name}: {exc}"
+            )
+            self.invalidate_collection_cache(collection_name)
+            raise CustomException(error=self.milvus_error, message=str(exc))
+
+    def get_by_ids(
+        self,
+        transaction_id: str,
+        collection_name: str,
+        ids: List[Union[str, int]],
+        output_fields: List[str],
+    ) -> Dict[Union[str, int], Dict[str, Any]]:
+        """
+        Reads records of a collection by primary key.
+
+        Returns:
+            Dict[Union[str, int], Dict[str, Any]]: The records found, keyed by id.
+        """
+        if not ids:
+            return {}
+        try:
+            records = self.milvus_client.get(
+                collection_name=collection_name,
+                ids=ids,
+                output_fields=output_fields,
+            )
+            return {record["id"]: record for record in records}
+        except Exception as exc:
+            logger.exception(
+                f"[MilvusManager][get_by_ids] [{transaction_id}] - Failed to read records of collection {collection_name}: {exc}"
+            )
+            self.invalidate_collection_cache(collection_name)
+            raise CustomException(error=self.milvus_error, message=str(exc))
+
 
-milvus_manager = MilvusManager()
+milvus_manager = LazyManager(MilvusManager)
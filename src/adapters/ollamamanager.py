@@ -1,10 +1,21 @@
 import json
-from typing import List, Dict, Any
-from openai import OpenAI
+import numpy as np
+from typing import List, Dict
 from config import OllamaConfig
 from src.custom_exception import CustomException
 from src.decorators import measure_time
+from src.backend_pool import BackendPool, LLMBackend
+from src.llm_results import (
+    ChatCompletionResult,
+    EmbeddingBatchResult,
+    EmbeddingResult,
+    TokenUsage,
+    decode_embedding,
+)
+from src.token_counter import count_tokens, count_message_tokens
 from src.adapters.loggingmanager import logger
+from src.adapters.lazymanager import LazyManager
+from src.adapters.httpclientmanager import http_client_manager
 
 
 class OllamaManager(OllamaConfig):
@@ -14,24 +25,171 @@ class OllamaManager(OllamaConfig):
     Inherits from the OllamaConfig class.
 
     Methods:
-        - create_embedding(transaction_id: str, text: str) -> dict:
-            Creates an embedding for the given text using the Ollama API.
+        - create_embedding(transaction_id: str, text: str) -> EmbeddingResult:
+            Creates an embedding for the given text with OLLAMA_EMBEDDING_MODEL, in the
+            same response format as OpenaAIManager.create_embedding.
 
-        - chat_completion(transaction_id: str, messages: List[Dict[str, str]], temperature: float = 0.01, response_format={"type": "json_object"}) -> Dict[Any, Any]:
+        - create_embeddings(texts: List[str], transaction_id: str) -> EmbeddingBatchResult:
+            Embeds a list of texts in batches of OLLAMA_EMBEDDING_MAX_BATCH_SIZE.
+
+        - chat_completion(transaction_id: str, messages: List[Dict[str, str]], temperature: float = 0.01, response_format={"type": "json_object"}) -> ChatCompletionResult:
             Performs chat completion using the Ollama API.
+
+
+    Requests are spread over the OLLAMA_SERVERS hosts by a BackendPool (weighted
+    least-outstanding requests, passive health checks); a failed request is retried
+    once on each other host.
     """
 
     def __init__(self) -> None:
         """
         Initializes an instance of the OpenAIManager class.
         """
+        from openai import OpenAI
+
         super().__init__()
         self.compeltion_error = "Ollama Chat Completion Failed"
-        self.ollama_client = OpenAI(
-            base_url=self.OLLAMA_SERVER,
-            api_key=self.OLLAMA_API_KEY,
+        self.embedding_error = "Ollama Embedding Failed"
+        # With several hosts, failover is done by the backend pool instead of the SDK
+        sdk_retries = {} if len(self.OLLAMA_SERVERS) == 1 else {"max_retries": 0}
+        backends = []
+        for server in self.OLLAMA_SERVERS:
+            client_kwargs = dict(
+                base_url=server["server"],
+                api_key=server.get("api_key", self.OLLAMA_API_KEY),
+                **sdk_retries,
+            )
+            backends.append(
+                LLMBackend(
+                    name=server.get("name", server["server"]),
+                    client=OpenAI(
+                        **client_kwargs, http_client=http_client_manager.sync_client
+                    ),
+                    weight=server.get("weight", 1),
+                    models=(
+                        {self.OLLAMA_MODEL: server["model"]}
+                        if "model" in server
+                        else None
+                    ),
+                    requests_per_minute=server.get("rpm", 0),
+                    tokens_per_minute=server.get("tpm", 0),
+                )
+            )
+        self.backend_pool = BackendPool(
+            name="ollama",
+            backends=backends,
+            failure_threshold=http_client_manager.BACKEND_FAILURE_THRESHOLD,
+            cooldown=http_client_manager.BACKEND_COOLDOWN_SECONDS,
+        )
+        self.ollama_client = backends[0].client
+        logger.info(
+            f"[OllamaManager] - Ollama Client initialized ({len(backends)} backends)"
+        )
+
+    @measure_time
+    def create_embedding(self, text: str, transaction_id: str = "root"):
+        """
+        Creates an embedding for the given text using the Ollama API.
+
+        Args:
+            transaction_id (str): The ID of the transaction.
+            text (str): The input text for which the embedding needs to be generated.
+
+        Returns:
+            EmbeddingResult: The float32 embedding, token usage and time spent queued.
+
+        Raises:
+            CustomException: If there is an error while generating the embedding.
+        """
+        try:
+            response, queue_wait_time = self.backend_pool.call(
+                lambda client, deployment: client.embeddings.create(
+                    input=text,
+                    model=deployment,
+                    encoding_format="float",
+                ),
+                model=self.OLLAMA_EMBEDDING_MODEL,
+                estimated_tokens=count_tokens(text),
+                transaction_id=transaction_id,
+                retries=len(self.backend_pool.backends) - 1,
+            )
+            result = EmbeddingResult.from_response(response, queue_wait_time)
+            logger.info(
+                f"[OllamaManager][create_embedding][{transaction_id}] - Embedding generated"
+            )
+        except Exception as create_embedding_exc:
+            logger.exception(
+                f"[OllamaManager][create_embedding][{transaction_id}] Error: {str(create_embedding_exc)}"
+            )
+            raise CustomException(
+                error=self.embedding_error, message=str(create_embedding_exc)
+            )
+        return result
+
+    @measure_time
+    def create_embeddings(
+        self, texts: List[str], transaction_id: str = "root"
+    ) -> EmbeddingBatchResult:
+        """
+        Creates embeddings for a list of texts, OLLAMA_EMBEDDING_MAX_BATCH_SIZE inputs
+        per request.
+
+        Args:
+            texts (List[str]): The input texts, in order.
+            transaction_id (str): The ID of the transaction.
+
+        Returns:
+            EmbeddingBatchResult: A float32 matrix with one row per input text, in the
+                same order, the summed token usage and the time spent queued.
+
+        Raises:
+            CustomException: If a batch fails on every Ollama host.
+        """
+        embeddings = []
+        prompt_tokens, total_tokens = 0, 0
+        queue_wait_time = 0
+        batch_size = max(1, self.OLLAMA_EMBEDDING_MAX_BATCH_SIZE)
+        try:
+            for start in range(0, len(texts), batch_size):
+                batch = texts[start : start + batch_size]
+                response, batch_queue_wait_time = self.backend_pool.call(
+                    lambda client, deployment: client.embeddings.create(
+                        input=batch,
+                        model=deployment,
+                        encoding_format="float",
+                    ),
+                    model=self.OLLAMA_EMBEDDING_MODEL,
+                    estimated_tokens=sum(count_tokens(text) for text in batch),
+                    transaction_id=transaction_id,
+                    retries=len(self.backend_pool.backends) - 1,
+                )
+                queue_wait_time += batch_queue_wait_time
+                embeddings.extend(
+                    decode_embedding(item.embedding)
+                    for item in sorted(response.data, key=lambda item: item.index)
+                )
+                usage = TokenUsage.from_response(response)
+                prompt_tokens += usage.prompt_tokens
+                total_tokens += usage.total_tokens
+        except Exception as create_embeddings_exc:
+            logger.exception(
+                f"[OllamaManager][create_embeddings][{transaction_id}] Error: {str(create_embeddings_exc)}"
+            )
+            raise CustomException(
+                error=self.embedding_error, message=str(create_embeddings_exc)
+            )
+        logger.info(
+            f"[OllamaManager][create_embeddings][{transaction_id}] - {len(texts)} embeddings generated"
+        )
+        return EmbeddingBatchResult(
+            embeddings=(
+                np.vstack(embeddings)
+                if embeddings
+                else np.empty((0, 0), dtype=np.float32)
+            ),
+            usage=TokenUsage(prompt_tokens=prompt_tokens, total_tokens=total_tokens),
+            queue_wait_time=queue_wait_time,
         )
-        logger.info("[OllamaManager] - Ollama Client initialized")
 
     @measure_time
     def chat_completion(
@@ -40,7 +198,8 @@ class OllamaManager(OllamaConfig):
         transaction_id: str = "root",
         temperature: float = 0.01,
         response_format={"type": "json_object"},
-    ) -> Dict[Any, Any]:
+        model: str = None,
+    ) -> ChatCompletionResult:
         """
         Perform chat completion using Ollama API.
 
@@ -49,9 +208,10 @@ class OllamaManager(OllamaConfig):
             messages (List[Dict[str, str]]): List of messages in the conversation.
             temperature (float, optional): Controls the randomness of the output. Defaults to 0.
             max_tokens (int, optional): The maximum number of tokens in the response. Defaults to 500.
+            model (str, optional): The model to use for chat completion. Defaults to OLLAMA_MODEL.
 
         Returns:
-            Dict[Any, Any]: The response from the Ollama API.
+            ChatCompletionResult: The content, token usage, model and time spent queued.
 
         Raises:
             CustomException: If there is an error while performing chat completion.
@@ -62,16 +222,23 @@ class OllamaManager(OllamaConfig):
             Exception: If there is any other exception.
         """
         print("here1")
-        json_response = {}
         try:
-            response = self.ollama_client.chat.completions.create(
-                model=self.OLLAMA_MODEL,
-                messages=messages,
-                temperature=temperature,
-                response_format=response_format,
+            response, queue_wait_time = self.backend_pool.call(
+                lambda client, deployment: client.chat.completions.create(
+                    model=deployment,
+                    messages=messages,
+                    temperature=temperature,
+                    response_format=response_format,
+                ),
+                model=model or self.OLLAMA_MODEL,
+                estimated_tokens=count_message_tokens(messages),
+                transaction_id=transaction_id,
+                retries=len(self.backend_pool.backends) - 1,
             )
 
-            json_response = response.model_dump()
+            result = ChatCompletionResult.from_response(
+                response, queue_wait_time=queue_wait_time
+            )
             logger.info(
                 f"[OllamaManager][chat_completion][{transaction_id}] - Chat Completion Successful"
             )
@@ -79,18 +246,29 @@ class OllamaManager(OllamaConfig):
             logger.exception(
                 f"[OllamaManager][chat_completion][{transaction_id}] Error: {str(chat_completion_exc)}"
             )
-            status_code = getattr(chat_completion_exc, "status_code", 500)
-            error_message = (
-                json.loads(getattr(chat_completion_exc, "response", None).text)
-                .get("error", None)
-                .get("message", None)
-            )
-            raise CustomException(
-                error=self.compeltion_error,
-                message=error_message,
-                StatusCode=status_code,
-            )
-        return json_response
+            raise self._completion_exception(chat_completion_exc)
+        return result
+
+    def _completion_exception(self, chat_completion_exc: Exception) -> CustomException:
+        """
+        Builds the CustomException raised for a failed chat completion, carrying the
+        status code and the provider error message when the response has one.
+        """
+        status_code = getattr(chat_completion_exc, "status_code", 500)
+        error_message = str(chat_completion_exc)
+        response = getattr(chat_completion_exc, "response", None)
+        if response is not None:
+            try:
+                error_message = (
+                    json.loads(response.text).get("error", {}).get("message", None)
+                )
+            except Exception:
+                pass
+        return CustomException(
+            error=self.compeltion_error,
+            message=error_message,
+            StatusCode=status_code,
+        )
 
 
-ollama_manager = OllamaManager()
+ollama_manager = LazyManager(OllamaManager)
@@ -1,10 +1,24 @@
 import json
-from typing import List, Dict, Any
-from openai import AzureOpenAI
+import time
+import asyncio
+import numpy as np
+from typing import List, Dict, Any, Tuple, Callable, Awaitable
 from config import OpenAIConfig
 from src.custom_exception import CustomException
 from src.decorators import measure_time
+from src.token_counter import count_tokens, count_message_tokens
+from src.hedging import HedgeBudget, hedged_request
+from src.backend_pool import BackendPool, LLMBackend
+from src.llm_results import (
+    ChatCompletionResult,
+    EmbeddingBatchResult,
+    EmbeddingResult,
+    TokenUsage,
+    decode_embedding,
+)
 from src.adapters.loggingmanager import logger
+from src.adapters.lazymanager import LazyManager
+from src.adapters.httpclientmanager import http_client_manager
 
 
 class OpenaAIManager(OpenAIConfig):
@@ -14,27 +28,146 @@ class OpenaAIManager(OpenAIConfig):
     Inherits from the AzureConfig class.
 
     Methods:
-        - create_embedding(transaction_id: str, text: str) -> dict:
+        - warm_up(transaction_id: str) -> bool:
+            Opens a keep-alive connection to the OpenAI endpoint.
+
+        - create_embedding(transaction_id: str, text: str) -> EmbeddingResult:
             Creates an embedding for the given text using the OpenAI API.
 
-        - chat_completion(transaction_id: str, messages: List[Dict[str, str]], temperature: float = 0.01, response_format={"type": "json_object"}) -> Dict[Any, Any]:
+        - chat_completion(transaction_id: str, messages: List[Dict[str, str]], temperature: float = 0.01, response_format={"type": "json_object"}) -> ChatCompletionResult:
             Performs chat completion using the OpenAI API.
+
+        - create_embeddings(texts: List[str], transaction_id: str) -> EmbeddingBatchResult:
+            Embeds a list of texts in concurrent, size- and token-limited chunks.
+
+    The sync and async clients share the tuned httpx pools of http_client_manager;
+    the concurrent embedding chunks and the hedged chat completions run on the async
+    client, on the event loop of http_client_manager (http_client_manager.run).
+
+    Requests are routed through a BackendPool over the OPENAI_DEPLOYMENTS resources
+    (weighted least-outstanding requests, passive health checks, failover). Every
+    request first acquires the client-side rate limiter of its deployment (requests
+    and estimated tokens per minute). When limits or several backends are configured,
+    retries are done by the pool instead of the SDK so that a 429 pauses the whole
+    deployment for its retry-after and the retry queues behind the callers already
+    waiting. The time spent queued is returned as `queue_wait_time`.
+
+    With HEDGING_ENABLED, a chat completion that has not answered within the
+    HEDGE_LATENCY_PERCENTILE of the deployment's recent latencies is duplicated to
+    HEDGE_DEPLOYMENT (or the same deployment); the first answer wins and the other
+    request is cancelled. Hedges are capped at HEDGE_MAX_PER_MINUTE and flagged as
+    `hedged` in the response.
     """
 
     def __init__(self) -> None:
         """
         Initializes an instance of the OpenAIManager class.
         """
+        from openai import AzureOpenAI, AsyncAzureOpenAI
+
         super().__init__()
         self.embedding_error = "OpenAI Embedding Generation Failed"
         self.compeltion_error = "OpenAI Chat Completion Failed"
-        self.openai_client = AzureOpenAI(
-            api_key=self.OPENAI_API_KEY,
-            api_version=self.OPENAI_API_VERSION,
-            azure_endpoint=self.OPENAI_ENDPOINT,
-            max_retries=self.MAX_RETRIES,
+        # With rate limiting or several backends, retries and failover are done by the
+        # backend pool (through the rate limiters), not blindly by the SDK
+        manage_retries = self.RATE_LIMIT_ENABLED or len(self.OPENAI_DEPLOYMENTS) > 1
+        self.client_retries = self.MAX_RETRIES if manage_retries else 0
+        sdk_retries = 0 if manage_retries else self.MAX_RETRIES
+        backends = []
+        for deployment in self.OPENAI_DEPLOYMENTS:
+            client_kwargs = dict(
+                api_key=deployment.get("api_key", self.OPENAI_API_KEY),
+                api_version=deployment.get("api_version", self.OPENAI_API_VERSION),
+                azure_endpoint=deployment["endpoint"],
+                max_retries=sdk_retries,
+            )
+            backends.append(
+                LLMBackend(
+                    name=deployment.get("name", deployment["endpoint"]),
+                    client=AzureOpenAI(
+                        **client_kwargs, http_client=http_client_manager.sync_client
+                    ),
+                    async_client=AsyncAzureOpenAI(
+                        **client_kwargs, http_client=http_client_manager.async_client
+                    ),
+                    weight=deployment.get("weight", 1),
+                    models=deployment.get("models"),
+                    requests_per_minute=deployment.get("rpm"),
+                    tokens_per_minute=deployment.get("tpm"),
+                )
+            )
+        self.backend_pool = BackendPool(
+            name="openai",
+            backends=backends,
+            failure_threshold=http_client_manager.BACKEND_FAILURE_THRESHOLD,
+            cooldown=http_client_manager.BACKEND_COOLDOWN_SECONDS,
+            requests_per_minute=self.OPENAI_RPM_LIMIT,
+            tokens_per_minute=self.OPENAI_TPM_LIMIT,
+            latency_window=self.HEDGE_LATENCY_WINDOW,
+        )
+        self.hedge_budget = HedgeBudget(self.HEDGE_MAX_PER_MINUTE)
+        self.openai_client = backends[0].client
+        logger.info(
+            f"[OpenaAIManager] - OpenAI Client initialized ({len(backends)} backends)"
         )
-        logger.info("[OpenaAIManager] - OpenAI Client initialized")
+
+    @measure_time
+    def warm_up(self, transaction_id: str = "root") -> bool:
+        """
+        Opens keep-alive connections to every OpenAI endpoint (TLS handshake included) in
+        both the sync and async pools with a cheap models listing call, so the first
+        chat completion reuses them.
+
+        Args:
+            transaction_id (str): The ID of the transaction.
+
+        Returns:
+            bool: True if the endpoint answered.
+
+        Raises:
+            CustomException: If the endpoint can not be reached.
+        """
+        try:
+            for backend in self.backend_pool.backends:
+                backend.client.models.list()
+                http_client_manager.run(backend.async_client.models.list())
+            logger.info(
+                f"[OpenaAIManager][warm_up][{transaction_id}] - Connection warmed up"
+            )
+        except Exception as warm_up_exc:
+            logger.exception(
+                f"[OpenaAIManager][warm_up][{transaction_id}] Error: {str(warm_up_exc)}"
+            )
+            raise CustomException(error=self.compeltion_error, message=str(warm_up_exc))
+        return True
+
+    @measure_time
+    def ping(self, transaction_id: str = "root") -> int:
+        """
+        Reports the passive health of the backend pool, used by the readiness check. No
+        request is sent: the pool already tracks the outcome of every call.
+
+        Args:
+            transaction_id (str): The ID of the transaction.
+
+        Returns:
+            int: The number of backends that are not cooling down.
+
+        Raises:
+            CustomException: If every backend is cooling down.
+        """
+        now = time.monotonic()
+        healthy = [
+            backend.name
+            for backend in self.backend_pool.backends
+            if backend.unhealthy_until <= now
+        ]
+        if not healthy:
+            raise CustomException(
+                error=self.compeltion_error,
+                message="Every OpenAI backend is cooling down after failures",
+            )
+        return len(healthy)
 
     @measure_time
     def create_embedding(self, text: str, transaction_id: str = "root"):
@@ -46,19 +179,23 @@ class OpenaAIManager(OpenAIConfig):
             text (str): The input text for which the embedding needs to be generated.
 
         Returns:
-            dict: A dictionary containing the response from the OpenAI API.
+            EmbeddingResult: The float32 embedding, token usage and time spent queued.
 
         Raises:
             CustomException: If there is an error while generating the embedding.
         """
-        json_response = {}
         try:
-            response = self.openai_client.embeddings.create(
-                input=text,
+            response, queue_wait_time = self._rate_limited_call(
+                lambda client, deployment: client.embeddings.create(
+                    input=text,
+                    model=deployment,
+                    encoding_format="base64",
+                ),
                 model=self.EMBEDDING_MODEL,
-                encoding_format="float",
+                estimated_tokens=count_tokens(text),
+                transaction_id=transaction_id,
             )
-            json_response = response.model_dump()
+            result = EmbeddingResult.from_response(response, queue_wait_time)
             logger.info(
                 f"[OpenaAIManager][create_embedding][{transaction_id}] - Embedding generated"
             )
@@ -67,7 +204,7 @@ class OpenaAIManager(OpenAIConfig):
                 f"[OpenaAIManager][create_embedding][{transaction_id}] Error: {str(create_embedding_exc)}"
             )
             raise CustomException(error=self.embedding_error)
-        return json_response
+        return result
 
     @measure_time
     def chat_completion(
@@ -76,8 +213,8 @@ class OpenaAIManager(OpenAIConfig):
         transaction_id: str = "root",
         temperature: float = 0.01,
         response_format={"type": "json_object"},
-        model: str = OpenAIConfig().CHATCOMPLETION_MODEL,
-    ) -> Dict[Any, Any]:
+        model: str = None,
+    ) -> ChatCompletionResult:
         """
         Perform chat completion using OpenAI API.
 
@@ -87,10 +224,11 @@ class OpenaAIManager(OpenAIConfig):
             temperature (float, optional): Controls the randomness of the output. Defaults to 0.
             max_tokens (int, optional): The maximum number of tokens in the response. Defaults to 500.
             response_format (dict, optional): The format of the response. Defaults to {"type": "json_object"}.
-            model (str, optional): The model to use for chat completion. Defaults to OpenAIConfig().CHATCOMPLETION_MODEL.
+            model (str, optional): The model to use for chat completion. Defaults to CHATCOMPLETION_MODEL.
 
         Returns:
-            Dict[Any, Any]: The response from the OpenAI API.
+            ChatCompletionResult: The content, token usage, model, time spent queued
+                and whether the request was hedged.
 
         Raises:
             CustomException: If there is an error while performing chat completion.
@@ -100,16 +238,36 @@ class OpenaAIManager(OpenAIConfig):
             RequestException: If there is a general request exception.
             Exception: If there is any other exception.
         """
-        json_response = {}
+        model = model or self.CHATCOMPLETION_MODEL
         try:
-            response = self.openai_client.chat.completions.create(
-                model=model,
-                messages=messages,
-                temperature=temperature,
-                response_format=response_format,
-            )
+            if self.HEDGING_ENABLED:
+                response, queue_wait_time, hedged = http_client_manager.run(
+                    self._ahedged_chat_completion(
+                        messages=messages,
+                        transaction_id=transaction_id,
+                        temperature=temperature,
+                        response_format=response_format,
+                        model=model,
+                    )
+                )
+            else:
+                response, queue_wait_time = self._rate_limited_call(
+                    lambda client, deployment: client.chat.completions.create(
+                        model=deployment,
+                        messages=messages,
+                        temperature=temperature,
+                        response_format=response_format,
+                    ),
+                    model=model,
+                    estimated_tokens=count_message_tokens(messages)
+                    + self.COMPLETION_TOKENS_ESTIMATE,
+                    transaction_id=transaction_id,
+                )
+                hedged = False
 
-            json_response = response.model_dump()
+            result = ChatCompletionResult.from_response(
+                response, queue_wait_time=queue_wait_time, hedged=hedged
+            )
             logger.info(
                 f"[OpenaAIManager][chat_completion][{transaction_id}] - Chat Completion Successful"
             )
@@ -117,18 +275,245 @@ class OpenaAIManager(OpenAIConfig):
             logger.exception(
                 f"[OpenaAIManager][chat_completion][{transaction_id}] Error: {str(chat_completion_exc)}"
             )
-            status_code = getattr(chat_completion_exc, "status_code", 500)
-            error_message = (
-                json.loads(getattr(chat_completion_exc, "response", None).text)
-                .get("error", None)
-                .get("message", None)
+            raise self._completion_exception(chat_completion_exc)
+        return result
+
+    @measure_time
+    def create_embeddings(
+        self, texts: List[str], transaction_id: str = "root"
+    ) -> EmbeddingBatchResult:
+        """
+        Creates embeddings for a list of texts.
+
+        The texts are split into chunks that respect EMBEDDING_MAX_BATCH_SIZE inputs and
+        EMBEDDING_MAX_BATCH_TOKENS (estimated) tokens per request, the chunks are sent
+        concurrently (at most EMBEDDING_MAX_CONCURRENCY at a time) and a failed chunk
+        is retried on its own up to EMBEDDING_CHUNK_RETRIES times.
+
+        Args:
+            texts (List[str]): The input texts, in order.
+            transaction_id (str): The ID of the transaction.
+
+        Returns:
+            EmbeddingBatchResult: A float32 matrix with one row per input text, in the
+                same order, the summed token usage and the time spent queued.
+
+        Raises:
+            CustomException: If a chunk still fails after its retries.
+        """
+        if not texts:
+            return EmbeddingBatchResult(
+                embeddings=np.empty((0, 0), dtype=np.float32), usage=TokenUsage()
+            )
+        return http_client_manager.run(
+            self._acreate_embeddings(texts=texts, transaction_id=transaction_id)
+        )
+
+    async def _acreate_embeddings(
+        self, texts: List[str], transaction_id: str
+    ) -> EmbeddingBatchResult:
+        semaphore = asyncio.Semaphore(self.EMBEDDING_MAX_CONCURRENCY)
+
+        async def embed_chunk(start: int, chunk: List[str], chunk_tokens: int):
+            async with semaphore:
+                response, queue_wait_time = await self._arate_limited_call(
+                    lambda client, deployment: client.embeddings.create(
+                        input=chunk,
+                        model=deployment,
+                        encoding_format="base64",
+                    ),
+                    model=self.EMBEDDING_MODEL,
+                    estimated_tokens=chunk_tokens,
+                    transaction_id=transaction_id,
+                    retries=self.EMBEDDING_CHUNK_RETRIES,
+                )
+                return start, response, queue_wait_time
+
+        chunks = self._chunk_embedding_inputs(texts)
+        try:
+            results = await asyncio.gather(*[embed_chunk(*chunk) for chunk in chunks])
+        except Exception as create_embeddings_exc:
+            logger.exception(
+                f"[OpenaAIManager][create_embeddings][{transaction_id}] Error: {str(create_embeddings_exc)}"
             )
             raise CustomException(
-                error=self.compeltion_error,
-                message=error_message,
-                StatusCode=status_code,
+                error=self.embedding_error, message=str(create_embeddings_exc)
+            )
+
+        embeddings = None
+        prompt_tokens, total_tokens = 0, 0
+        queue_wait_time = 0
+        for start, response, chunk_queue_wait_time in results:
+            queue_wait_time += chunk_queue_wait_time
+            for item in response.data:
+                embedding = decode_embedding(item.embedding)
+                if embeddings is None:
+                    embeddings = np.empty((len(texts), len(embedding)), np.float32)
+                embeddings[start + item.index] = embedding
+            usage = TokenUsage.from_response(response)
+            prompt_tokens += usage.prompt_tokens
+            total_tokens += usage.total_tokens
+        logger.info(
+            f"[OpenaAIManager][create_embeddings][{transaction_id}] - {len(texts)} embeddings generated in {len(chunks)} chunks"
+        )
+        return EmbeddingBatchResult(
+            embeddings=embeddings,
+            usage=TokenUsage(prompt_tokens=prompt_tokens, total_tokens=total_tokens),
+            queue_wait_time=queue_wait_time,
+        )
+
+    def _chunk_embedding_inputs(
+        self, texts: List[str]
+    ) -> List[Tuple[int, List[str], int]]:
+        """
+        Splits texts into (start index, chunk, chunk tokens) tuples within the batch size
+        and token limits.
+        """
+        chunks = []
+        start, chunk, chunk_tokens = 0, [], 0
+        for idx, text in enumerate(texts):
+            text_tokens = count_tokens(text)
+            if chunk and (
+                len(chunk) >= self.EMBEDDING_MAX_BATCH_SIZE
+                or chunk_tokens + text_tokens > self.EMBEDDING_MAX_BATCH_TOKENS
+            ):
+                chunks.append((start, chunk, chunk_tokens))
+                start, chunk, chunk_tokens = idx, [], 0
+            chunk.append(text)
+            chunk_tokens += text_tokens
+        if chunk:
+            chunks.append((start, chunk, chunk_tokens))
+        return chunks
+
+    async def _ahedged_chat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        transaction_id: str,
+        temperature: float,
+        response_format: Dict[str, str],
+        model: str,
+    ) -> Tuple[Any, float, bool]:
+        """
+        Sends a chat completion on the async client, hedging it when HEDGING_ENABLED and
+        enough latency samples of the deployment are known.
+
+        Returns:
+            Tuple[Any, float, bool]: The API response, the seconds spent queued and
+                whether a hedge request was fired.
+        """
+        estimated_tokens = (
+            count_message_tokens(messages) + self.COMPLETION_TOKENS_ESTIMATE
+        )
+
+        def request(model: str):
+            return self._arate_limited_call(
+                lambda client, deployment: client.chat.completions.create(
+                    model=deployment,
+                    messages=messages,
+                    temperature=temperature,
+                    response_format=response_format,
+                ),
+                model=model,
+                estimated_tokens=estimated_tokens,
+                transaction_id=transaction_id,
+            )
+
+        hedge_after = None
+        if self.HEDGING_ENABLED:
+            hedge_after = self.backend_pool.latency_tracker.percentile(
+                model, self.HEDGE_LATENCY_PERCENTILE, self.HEDGE_MIN_SAMPLES
+            )
+        # HEDGE_DEPLOYMENT is an alternate of CHATCOMPLETION_MODEL; per-stage models
+        # are hedged on themselves
+        hedge_model = (
+            self.HEDGE_DEPLOYMENT
+            if self.HEDGE_DEPLOYMENT and model == self.CHATCOMPLETION_MODEL
+            else model
+        )
+        outcome = await hedged_request(
+            primary=lambda: request(model),
+            hedge=lambda: request(hedge_model),
+            hedge_after=hedge_after,
+            budget=self.hedge_budget,
+        )
+        if outcome["hedged"]:
+            logger.info(
+                f"[OpenaAIManager][chat_completion][{transaction_id}] - Hedged after {hedge_after:.2f}s, {'hedge' if outcome['hedge_won'] else 'primary'} request won"
             )
-        return json_response
+        response, queue_wait_time = outcome["result"]
+        return response, queue_wait_time, outcome["hedged"]
+
+    def _rate_limited_call(
+        self,
+        request: Callable[[Any, str], Any],
+        model: str,
+        estimated_tokens: int,
+        transaction_id: str,
+        retries: int = None,
+    ) -> Tuple[Any, float]:
+        """
+        Sends a request through the backend pool, once the rate limiter of the selected
+        deployment allows it.
+
+        Args:
+            request (Callable[[Any, str], Any]): Issues the API call given a client and
+                the deployment name on that client's endpoint.
+            model (str): The deployment the request is meant for.
+            estimated_tokens (int): Prompt + completion tokens reserved before sending.
+            transaction_id (str): The ID of the transaction.
+            retries (int, optional): Retries after the first attempt. Defaults to
+                MAX_RETRIES when the pool manages retries, 0 otherwise.
+
+        Returns:
+            Tuple[Any, float]: The API response and the seconds spent queued.
+        """
+        return self.backend_pool.call(
+            request,
+            model=model,
+            estimated_tokens=estimated_tokens,
+            transaction_id=transaction_id,
+            retries=self.client_retries if retries is None else retries,
+        )
+
+    async def _arate_limited_call(
+        self,
+        request: Callable[[Any, str], Awaitable[Any]],
+        model: str,
+        estimated_tokens: int,
+        transaction_id: str,
+        retries: int = None,
+    ) -> Tuple[Any, float]:
+        """
+        Async variant of _rate_limited_call; waits in the queue without blocking the loop.
+        """
+        return await self.backend_pool.acall(
+            request,
+            model=model,
+            estimated_tokens=estimated_tokens,
+            transaction_id=transaction_id,
+            retries=self.client_retries if retries is None else retries,
+        )
+
+    def _completion_exception(self, chat_completion_exc: Exception) -> CustomException:
+        """
+        Builds the CustomException raised for a failed chat completion, carrying the
+        status code and the provider error message when the response has one.
+        """
+        status_code = getattr(chat_completion_exc, "status_code", 500)
+        error_message = str(chat_completion_exc)
+        response = getattr(chat_completion_exc, "response", None)
+        if response is not None:
+            try:
+                error_message = (
+                    json.loads(response.text).get("error", {}).get("message", None)
+                )
+            except Exception:
+                pass
+        return CustomException(
+            error=self.compeltion_error,
+            message=error_message,
+            StatusCode=status_code,
+        )
 
 
-openai_manager = OpenaAIManager()
+openai_manager = LazyManager(OpenaAIManager)
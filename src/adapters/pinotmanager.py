@@ -1,15 +1,25 @@
 import pyodbc
-import pandas as pd
+import threading
 from sqlalchemy import text
 from config import PinotConfig
 from urllib.parse import quote_plus
 from sqlalchemy import create_engine
-from pandas.core.api import DataFrame
 from src.custom_exception import CustomException
 from src.adapters.loggingmanager import logger
-from sqlalchemy.exc import TimeoutError, ResourceClosedError, SQLAlchemyError
+from src.adapters.lazymanager import LazyManager
+from sqlalchemy.exc import (
+    TimeoutError,
+    ResourceClosedError,
+    SQLAlchemyError,
+    DatabaseError,
+    OperationalError,
+)
 from src.decorators import measure_time
-from typing import Tuple
+from src.adapters.sqlmanager import iter_result_chunks
+from typing import TYPE_CHECKING, Iterator, Tuple
+
+if TYPE_CHECKING:
+    from pandas import DataFrame
 
 # disabling pyodbc default pooling
 pyodbc.pooling = False
@@ -32,6 +42,8 @@ class PinotManager(PinotConfig):
         __init__(): Initializes the PinotManager class.
         insert_data(): Inserts data from a DataFrame into a Pinot table.
         fetch_data(): Fetches data from the database using the provided SQL query.
+        stream_data(): Fetches data in batches, up to a row and size cap.
+        warm_up(): Detects the multi-stage engine support of the broker.
     """
 
     def __init__(self):
@@ -47,6 +59,10 @@ class PinotManager(PinotConfig):
         """
         super().__init__()
         self.pinot_error = "On-prem Pinot failed"
+        self._multistage_engine = {"true": True, "false": False}.get(
+            self.PINOT_MULTISTAGE_ENGINE
+        )
+        self._capabilities_lock = threading.Lock()
         ## Pinot Connection
         try:
             connection_string = f"pinot+http://{self.PINOT_BROKER_URL}:{self.PINOT_BROKER_PORT}/query/sql?controller={self.PINOT_CONTROLLER_URL}:{self.PINOT_CONTROLLER_PORT}/"
@@ -65,7 +81,7 @@ class PinotManager(PinotConfig):
         self,
         transaction_id: str,
         table_name: str,
-        df: DataFrame,
+        df: "DataFrame",
         schema: str = "dbo",
         if_exists: str = "append",
     ) -> bool:
@@ -120,7 +136,7 @@ class PinotManager(PinotConfig):
     # @measure_time
     # def fetch_data(
     #     self, transaction_id: str, sql_query: str
-    # ) -> Tuple[float, DataFrame]:
+    # ) -> Tuple[float, "DataFrame"]:
     #     """
     #     Fetches data from the database using the provided SQL query.
 
@@ -176,12 +192,109 @@ class PinotManager(PinotConfig):
     #         if connection:
     #             connection.close()
 
+    def multistage_engine(self, transaction_id: str = "root") -> bool:
+        """
+        Whether queries are sent with the multi-stage engine option. With
+        PINOT_MULTISTAGE_ENGINE=auto the broker is probed once, on the first call,
+        and the answer is kept for the life of the process.
+
+        Args:
+            transaction_id (str): The ID of the transaction.
+
+        Returns:
+            bool: True if the broker runs queries on the multi-stage engine.
+        """
+        if self._multistage_engine is not None:
+            return self._multistage_engine
+        with self._capabilities_lock:
+            if self._multistage_engine is None:
+                connection = None
+                try:
+                    connection = self.engine.connect()
+                    # The v1 engine accepts a bare SELECT 1 but rejects joins, so
+                    # only the multi-stage engine can answer this query
+                    connection.execute(
+                        text(
+                            "SET useMultistageEngine=true; "
+                            "SELECT 1 FROM (SELECT 1 AS a) AS x "
+                            "JOIN (SELECT 1 AS a) AS y ON x.a = y.a"
+                        )
+                    ).fetchall()
+                    self._multistage_engine = True
+                except OperationalError:
+                    # Broker unreachable: probe again on the next call
+                    raise
+                except DatabaseError as probe_exc:
+                    logger.warning(
+                        f"[PinotManager][multistage_engine][{transaction_id}] - Multi-stage engine not available: {str(probe_exc)}"
+                    )
+                    self._multistage_engine = False
+                finally:
+                    if connection:
+                        connection.close()
+                logger.info(
+                    f"[PinotManager][multistage_engine][{transaction_id}] - Multi-stage engine: {self._multistage_engine}"
+                )
+        return self._multistage_engine
+
+    @measure_time
+    def warm_up(self, transaction_id: str = "root") -> bool:
+        """
+        Detects the capabilities of the broker so the first request does not pay
+        for the probe.
+
+        Args:
+            transaction_id (str): The ID of the transaction.
+
+        Returns:
+            bool: Whether the multi-stage engine is used.
+
+        Raises:
+            CustomException: If the broker can not be reached.
+        """
+        try:
+            return self.multistage_engine(transaction_id=transaction_id)
+        except Exception as warm_up_exc:
+            logger.exception(
+                f"[PinotManager][warm_up][{transaction_id}] Error: {str(warm_up_exc)}"
+            )
+            raise CustomException(error=self.pinot_error, message=str(warm_up_exc))
+
+    @measure_time
+    def ping(self, transaction_id: str = "root") -> bool:
+        """
+        Sends a trivial query to the broker, used by the readiness check.
+
+        Args:
+            transaction_id (str): The ID of the transaction.
+
+        Returns:
+            bool: True if the broker answered.
+
+        Raises:
+            CustomException: If the broker can not be reached.
+        """
+        connection = None
+        try:
+            connection = self.engine.connect()
+            connection.execute(text("SELECT 1")).fetchall()
+            return True
+        except Exception as ping_exc:
+            logger.exception(
+                f"[PinotManager][ping][{transaction_id}] Error: {str(ping_exc)}"
+            )
+            raise CustomException(error=self.pinot_error, message=str(ping_exc))
+        finally:
+            if connection:
+                connection.close()
+
     @measure_time
     def fetch_data(
         self, transaction_id: str, sql_query: str
-    ) -> Tuple[float, DataFrame]:
+    ) -> Tuple[float, "DataFrame"]:
         """
-        Fetches data from the database using the provided SQL query.
+        Fetches data from the database using the provided SQL query, as a single
+        request with the multi-stage engine option when the broker supports it.
 
         Args:
             transaction_id (str): The ID of the transaction.
@@ -193,46 +306,77 @@ class PinotManager(PinotConfig):
         Raises:
             CustomException: If there is an error while fetching the data.
         """
+        import pandas as pd
+
         connection = None
         try:
-            # Attempt with multistage engine first
+            if self.multistage_engine(transaction_id=transaction_id):
+                sql_query = f"SET useMultistageEngine=true; {sql_query}"
             connection = self.engine.connect()
-            multistage_query = f"SET useMultistageEngine=true; {sql_query}"
-            connection = connection.execution_options(
-                use_multistage_engine=True, queryOptions="useMultistageEngine=true"
-            )
-            df = pd.read_sql(
-                sql=text(multistage_query), con=connection, parse_dates=True
-            )
+            df = pd.read_sql(sql=text(sql_query), con=connection, parse_dates=True)
             logger.info(
-                f"[PinotManager][fetch_data][{transaction_id}] - Data fetched successfully with multistage"
+                f"[PinotManager][fetch_data][{transaction_id}] - Data fetched successfully"
             )
             return df
-        except Exception as multistage_exc:
-            logger.warning(
-                f"[PinotManager][fetch_data][{transaction_id}] Multistage query failed: {str(multistage_exc)}"
+        except Exception as fetch_data_exc:
+            logger.exception(
+                f"[PinotManager][fetch_data][{transaction_id}] Error: {str(fetch_data_exc)}"
+            )
+            raise CustomException(
+                error=self.pinot_error, message=str(fetch_data_exc), result=[]
             )
+        finally:
             if connection:
                 connection.close()
 
-            try:
-                # Retry without multistage
-                connection = self.engine.connect()
-                df = pd.read_sql(sql=text(sql_query), con=connection)
-                logger.info(
-                    f"[PinotManager][fetch_data][{transaction_id}] - Data fetched successfully without multistage"
-                )
-                return df
-            except Exception as fetch_data_exc:
-                logger.exception(
-                    f"[PinotManager][fetch_data][{transaction_id}] General Error: {str(fetch_data_exc)}"
-                )
-                raise CustomException(
-                    error=self.pinot_error, message=str(fetch_data_exc), result=[]
-                )
-            finally:
-                if connection:
-                    connection.close()
+    def stream_data(
+        self,
+        transaction_id: str,
+        sql_query: str,
+        fetch_size: int = 1000,
+        max_rows: int = 0,
+        max_bytes: int = 0,
+    ) -> Iterator[Tuple["DataFrame", bool]]:
+        """
+        Runs the SQL query and yields the rows in batches of `fetch_size`, up to
+        `max_rows` rows / `max_bytes` bytes. The broker answers with the whole
+        result, so only the DataFrames are bounded.
+
+        Args:
+            transaction_id (str): The ID of the transaction.
+            sql_query (str): The SQL query to execute.
+            fetch_size (int, optional): The number of rows per batch.
+            max_rows (int, optional): The row cap, 0 for none.
+            max_bytes (int, optional): The size cap, 0 for none.
+
+        Yields:
+            Tuple[DataFrame, bool]: A batch and whether the result was cut after it.
+
+        Raises:
+            CustomException: If there is an error while fetching the data.
+        """
+        connection = None
+        try:
+            if self.multistage_engine(transaction_id=transaction_id):
+                sql_query = f"SET useMultistageEngine=true; {sql_query}"
+            connection = self.engine.connect()
+            result = connection.execute(text(sql_query))
+            rows = 0
+            for chunk, truncated in iter_result_chunks(
+                result, fetch_size, max_rows=max_rows, max_bytes=max_bytes
+            ):
+                rows += len(chunk)
+                yield chunk, truncated
+            logger.info(
+                f"[PinotManager][stream_data][{transaction_id}] - {rows} rows fetched"
+            )
+        except Exception as stream_data_exc:
+            logger.exception(
+                f"[PinotManager][stream_data][{transaction_id}] Error: {str(stream_data_exc)}"
+            )
+            raise CustomException(
+                error=self.pinot_error, message=str(stream_data_exc), result=[]
+            )
         finally:
             if connection:
                 connection.close()
@@ -289,4 +433,4 @@ class PinotManager(PinotConfig):
         return False
 
 
-pinot_manager = PinotManager()
+pinot_manager = LazyManager(PinotManager)
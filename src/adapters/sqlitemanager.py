@@ -1,16 +1,22 @@
 import pyodbc
-import pandas as pd
+from typing import TYPE_CHECKING, List
 from sqlalchemy import text
 from sqlalchemy import create_engine
-from pandas.core.api import DataFrame
 from sqlalchemy.exc import TimeoutError, ResourceClosedError, SQLAlchemyError
 from config import SqlConfig
 from src.adapters.loggingmanager import logger
+from src.adapters.lazymanager import LazyManager
+from src.decorators import measure_time
 
+if TYPE_CHECKING:
+    from pandas import DataFrame
 
 # disabling pyodbc default pooling
 pyodbc.pooling = False
 
+# SQLite column type of the pandas dtype kinds added by ensure_columns
+_SQLITE_TYPES = {"i": "INTEGER", "u": "INTEGER", "b": "INTEGER", "f": "REAL"}
+
 
 class SQLiteManager(SqlConfig):
     """
@@ -28,6 +34,7 @@ class SQLiteManager(SqlConfig):
     Methods:
         __init__(): Initializes the SQLiteManager class.
         insert_data(): Inserts data from a DataFrame into a SQL table.
+        ensure_columns(): Adds the columns of a DataFrame missing from an existing table.
         fetch_data(): Fetches data from the database using the provided SQL query.
         execute_query(): Executes a SQL query.
     """
@@ -45,6 +52,9 @@ class SQLiteManager(SqlConfig):
         """
         super().__init__()
         self.sql_error = "On-prem SQL failed"
+        # Columns known to exist per table, so the schema is only read again when a
+        # DataFrame brings a column not seen yet
+        self._table_columns = {}
         ## SQL Connection
         try:
             self.engine = create_engine(f"sqlite:///{self.DB_PATH}")
@@ -60,7 +70,7 @@ class SQLiteManager(SqlConfig):
         self,
         transaction_id: str,
         table_name: str,
-        df: DataFrame,
+        df: "DataFrame",
         if_exists: str = "append",
     ) -> bool:
         """
@@ -78,6 +88,8 @@ class SQLiteManager(SqlConfig):
         connection = None
         try:
             connection = self.engine.connect()
+            if if_exists == "append":
+                self.ensure_columns(transaction_id, connection, table_name, df)
             _ = df.to_sql(
                 name=table_name,
                 con=connection,
@@ -107,7 +119,84 @@ class SQLiteManager(SqlConfig):
             if connection:
                 connection.close()
 
-    def fetch_data(self, transaction_id: str, sql_query: str) -> DataFrame:
+    def ensure_columns(
+        self, transaction_id: str, connection, table_name: str, df: "DataFrame"
+    ) -> List[str]:
+        """
+        Adds to an existing table the columns of the DataFrame it does not have yet
+        (ALTER TABLE ... ADD COLUMN), so that appending rows of a model that gained
+        fields does not fail on older databases. A missing table is left to to_sql.
+
+        Args:
+            transaction_id (str): The ID of the transaction.
+            connection: The open connection the rows are appended with.
+            table_name (str): The name of the SQL table.
+            df (DataFrame): The rows about to be appended.
+
+        Returns:
+            List[str]: The columns added.
+        """
+        known = self._table_columns.get(table_name)
+        if known is not None and set(df.columns) <= known:
+            return []
+        known = {
+            row[1]
+            for row in connection.execute(
+                text(f'PRAGMA table_info("{table_name}")')
+            ).fetchall()
+        }
+        added = []
+        for column, dtype in df.dtypes.items():
+            if not known or column in known:
+                continue
+            connection.execute(
+                text(
+                    f'ALTER TABLE "{table_name}" ADD COLUMN "{column}" '
+                    f"{_SQLITE_TYPES.get(dtype.kind, 'TEXT')}"
+                )
+            )
+            known.add(column)
+            added.append(column)
+        # Ends the transaction the statements began, so to_sql commits its own
+        connection.commit()
+        if not known:
+            return []
+        self._table_columns[table_name] = known
+        if added:
+            logger.info(
+                f"[SQLiteManager][ensure_columns][{transaction_id}] - Columns added to {table_name}: {added}"
+            )
+        return added
+
+    @measure_time
+    def warm_up(self, transaction_id: str = "root") -> bool:
+        """
+        Opens a connection and runs a trivial query to make sure the analytics database is reachable.
+
+        Args:
+            transaction_id (str): The ID of the transaction.
+
+        Returns:
+            bool: True if the database answered.
+        """
+        connection = None
+        try:
+            connection = self.engine.connect()
+            connection.execute(text("SELECT 1"))
+            logger.info(
+                f"[SQLiteManager][warm_up][{transaction_id}] - Database reachable"
+            )
+            return True
+        except Exception as warm_up_exc:
+            logger.exception(
+                f"[SQLiteManager][warm_up][{transaction_id}] Error: {str(warm_up_exc)}"
+            )
+            raise warm_up_exc
+        finally:
+            if connection:
+                connection.close()
+
+    def fetch_data(self, transaction_id: str, sql_query: str) -> "DataFrame":
         """
         Fetches data from the database using the provided SQL query.
 
@@ -121,6 +210,8 @@ class SQLiteManager(SqlConfig):
         Raises:
             Exception: If there is an error while fetching the data.
         """
+        import pandas as pd
+
         connection = None
         try:
             connection = self.engine.connect()
@@ -193,4 +284,4 @@ class SQLiteManager(SqlConfig):
                 connection.close()
 
 
-sqlite_manager = SQLiteManager()
+sqlite_manager = LazyManager(SQLiteManager)
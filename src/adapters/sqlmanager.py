@@ -1,20 +1,66 @@
 import pyodbc
-import pandas as pd
+from typing import TYPE_CHECKING, Any, Iterator, Tuple
 from sqlalchemy import text
 from config import SqlConfig
 from urllib.parse import quote_plus
 from sqlalchemy import create_engine
-from pandas.core.api import DataFrame
 from src.custom_exception import CustomException
 from src.adapters.loggingmanager import logger
+from src.adapters.lazymanager import LazyManager
 from sqlalchemy.exc import TimeoutError, ResourceClosedError, SQLAlchemyError
 import datetime
 from src.decorators import measure_time
 
+if TYPE_CHECKING:
+    from pandas import DataFrame
+
 # disabling pyodbc default pooling
 pyodbc.pooling = False
 
 
+def iter_result_chunks(
+    result: Any, fetch_size: int, max_rows: int = 0, max_bytes: int = 0
+) -> Iterator[Tuple["DataFrame", bool]]:
+    """
+    Reads a SQLAlchemy result `fetch_size` rows at a time and yields each batch as a
+    DataFrame, stopping once `max_rows` rows or `max_bytes` bytes (in memory) have
+    been read. A result without rows yields one empty DataFrame with its columns.
+
+    Args:
+        result: The SQLAlchemy result to read.
+        fetch_size (int): The number of rows per batch.
+        max_rows (int, optional): The row cap, 0 for none.
+        max_bytes (int, optional): The size cap, 0 for none. The batch that crosses
+            it is still returned.
+
+    Yields:
+        Tuple[DataFrame, bool]: A batch and whether the result was cut after it.
+    """
+    import pandas as pd
+
+    columns = list(result.keys())
+    rows_read, bytes_read = 0, 0
+    while True:
+        rows = result.fetchmany(fetch_size)
+        if not rows:
+            if rows_read == 0:
+                yield pd.DataFrame(columns=columns), False
+            return
+        truncated = bool(max_rows) and rows_read + len(rows) > max_rows
+        if truncated:
+            rows = rows[: max_rows - rows_read]
+        chunk = pd.DataFrame.from_records(rows, columns=columns)
+        rows_read += len(chunk)
+        bytes_read += int(chunk.memory_usage(deep=True).sum())
+        if (max_rows and rows_read >= max_rows) or (
+            max_bytes and bytes_read >= max_bytes
+        ):
+            # Only flag the result when rows are actually left behind
+            yield chunk, truncated or bool(result.fetchmany(1))
+            return
+        yield chunk, False
+
+
 class SQLManager(SqlConfig):
     """
     SQLManager class for managing SQL operations.
@@ -32,6 +78,7 @@ class SQLManager(SqlConfig):
         __init__(): Initializes the SQLManager class.
         insert_data(): Inserts data from a DataFrame into a SQL table.
         fetch_data(): Fetches data from the database using the provided SQL query.
+        stream_data(): Fetches data in batches through a server-side cursor.
     """
 
     def __init__(self):
@@ -51,7 +98,10 @@ class SQLManager(SqlConfig):
         try:
             connection_string = f"postgresql://{self.SQL_USERNAME}:{quote_plus(self.SQL_PASSWORD)}@{self.SQL_SERVER}:{self.SQL_PORT}/{self.SQL_DATABASE}"
             self.engine = create_engine(
-                connection_string, pool_pre_ping=True, pool_size=5, pool_recycle=1500
+                connection_string,
+                pool_pre_ping=True,
+                pool_size=self.SQL_POOL_SIZE,
+                pool_recycle=self.SQL_POOL_RECYCLE,
             )
             logger.info("[SQLManager] - SQL Client initialized")
         except (TimeoutError, ResourceClosedError, SQLAlchemyError) as exce:
@@ -65,7 +115,7 @@ class SQLManager(SqlConfig):
         self,
         transaction_id: str,
         table_name: str,
-        df: DataFrame,
+        df: "DataFrame",
         schema: str = "dbo",
         if_exists: str = "append",
     ) -> bool:
@@ -118,7 +168,69 @@ class SQLManager(SqlConfig):
                 connection.close()
 
     @measure_time
-    def fetch_data(self, transaction_id: str, sql_query: str) -> DataFrame:
+    def warm_up(self, transaction_id: str = "root") -> int:
+        """
+        Fills the connection pool by checking out `SQL_POOL_SIZE` connections at once
+        and running a trivial query on each, so the first requests find warm connections.
+
+        Args:
+            transaction_id (str): The ID of the transaction.
+
+        Returns:
+            int: The number of connections opened.
+
+        Raises:
+            CustomException: If a connection can not be opened.
+        """
+        connections = []
+        try:
+            for _ in range(self.SQL_POOL_SIZE):
+                connection = self.engine.connect()
+                connections.append(connection)
+                connection.execute(text("SELECT 1"))
+            logger.info(
+                f"[SQLManager][warm_up][{transaction_id}] - {len(connections)} connections warmed up"
+            )
+            return len(connections)
+        except Exception as warm_up_exc:
+            logger.exception(
+                f"[SQLManager][warm_up][{transaction_id}] Error: {str(warm_up_exc)}"
+            )
+            raise CustomException(error=self.sql_error, message=str(warm_up_exc))
+        finally:
+            for connection in connections:
+                connection.close()
+
+    @measure_time
+    def ping(self, transaction_id: str = "root") -> bool:
+        """
+        Runs a trivial query on a single pooled connection, used by the readiness check.
+
+        Args:
+            transaction_id (str): The ID of the transaction.
+
+        Returns:
+            bool: True if the database answered.
+
+        Raises:
+            CustomException: If the database can not be reached.
+        """
+        connection = None
+        try:
+            connection = self.engine.connect()
+            connection.execute(text("SELECT 1"))
+            return True
+        except Exception as ping_exc:
+            logger.exception(
+                f"[SQLManager][ping][{transaction_id}] Error: {str(ping_exc)}"
+            )
+            raise CustomException(error=self.sql_error, message=str(ping_exc))
+        finally:
+            if connection:
+                connection.close()
+
+    @measure_time
+    def fetch_data(self, transaction_id: str, sql_query: str) -> "DataFrame":
         """
         Fetches data from the database using the provided SQL query.
 
@@ -132,47 +244,75 @@ class SQLManager(SqlConfig):
         Raises:
             CustomException: If there is an error while fetching the data.
         """
+        import pandas as pd
+
         connection = None
         try:
-            # Attempt with multistage engine first
             connection = self.engine.connect()
-            multistage_query = f"SET useMultistageEngine=true; {sql_query}"
-            connection = connection.execution_options(
-                use_multistage_engine=True,
-                queryOptions="useMultistageEngine=true",
-            )
-            df = pd.read_sql(
-                sql=text(multistage_query), con=connection, parse_dates=True
-            )
+            df = pd.read_sql(sql=text(sql_query), con=connection, parse_dates=True)
             logger.info(
-                f"[SQLManager][fetch_data][{transaction_id}] - Data fetched successfully with multistage"
+                f"[SQLManager][fetch_data][{transaction_id}] - Data fetched successfully"
             )
             return df
-        except Exception as multistage_exc:
-            logger.warning(
-                f"[SQLManager][fetch_data][{transaction_id}] Multistage query failed: {str(multistage_exc)}"
+        except Exception as fetch_data_exc:
+            logger.exception(
+                f"[SQLManager][fetch_data][{transaction_id}] Error: {str(fetch_data_exc)}"
+            )
+            raise CustomException(
+                error=self.sql_error, message=str(fetch_data_exc), result=[]
             )
+        finally:
             if connection:
                 connection.close()
 
-            try:
-                # Retry without multistage
-                connection = self.engine.connect()
-                df = pd.read_sql(sql=text(sql_query), con=connection)
-                logger.info(
-                    f"[SQLManager][fetch_data][{transaction_id}] - Data fetched successfully without multistage"
-                )
-                return df
-            except Exception as fetch_data_exc:
-                logger.exception(
-                    f"[SQLManager][fetch_data][{transaction_id}] General Error: {str(fetch_data_exc)}"
-                )
-                raise CustomException(
-                    error=self.sql_error, message=str(fetch_data_exc), result=[]
-                )
-            finally:
-                if connection:
-                    connection.close()
+    def stream_data(
+        self,
+        transaction_id: str,
+        sql_query: str,
+        fetch_size: int = 1000,
+        max_rows: int = 0,
+        max_bytes: int = 0,
+    ) -> Iterator[Tuple["DataFrame", bool]]:
+        """
+        Runs the SQL query on a server-side cursor and yields the rows in batches of
+        `fetch_size`, so the first rows are available before the query result is
+        read and at most `max_rows` rows / `max_bytes` bytes are held.
+
+        Args:
+            transaction_id (str): The ID of the transaction.
+            sql_query (str): The SQL query to execute.
+            fetch_size (int, optional): The number of rows per batch.
+            max_rows (int, optional): The row cap, 0 for none.
+            max_bytes (int, optional): The size cap, 0 for none.
+
+        Yields:
+            Tuple[DataFrame, bool]: A batch and whether the result was cut after it.
+
+        Raises:
+            CustomException: If there is an error while fetching the data.
+        """
+        connection = None
+        try:
+            connection = self.engine.connect().execution_options(
+                stream_results=True, max_row_buffer=fetch_size
+            )
+            result = connection.execute(text(sql_query))
+            rows = 0
+            for chunk, truncated in iter_result_chunks(
+                result, fetch_size, max_rows=max_rows, max_bytes=max_bytes
+            ):
+                rows += len(chunk)
+                yield chunk, truncated
+            logger.info(
+                f"[SQLManager][stream_data][{transaction_id}] - {rows} rows fetched"
+            )
+        except Exception as stream_data_exc:
+            logger.exception(
+                f"[SQLManager][stream_data][{transaction_id}] Error: {str(stream_data_exc)}"
+            )
+            raise CustomException(
+                error=self.sql_error, message=str(stream_data_exc), result=[]
+            )
         finally:
             if connection:
                 connection.close()
@@ -229,4 +369,4 @@ class SQLManager(SqlConfig):
         return False
 
 
-sql_manager = SQLManager()
+sql_manager = LazyManager(SQLManager)
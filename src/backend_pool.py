@@ -0,0 +1,313 @@
+import time
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from src.hedging import LatencyTracker
+from src.rate_limiter import DeploymentRateLimiter, rate_limiter_registry
+from src.adapters.loggingmanager import logger
+
+
+def retry_delay(request_exc: Exception, attempt: int) -> Optional[float]:
+    """
+    Returns the seconds to wait before retrying a failed request (the provider's
+    retry-after when present, exponential backoff otherwise), or None if the error
+    is not transient.
+    """
+    from openai import APIConnectionError
+
+    status_code = getattr(request_exc, "status_code", None)
+    if not (
+        isinstance(request_exc, APIConnectionError)
+        or status_code in (408, 409, 429)
+        or (status_code or 0) >= 500
+    ):
+        return None
+    response = getattr(request_exc, "response", None)
+    headers = response.headers if response is not None else {}
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+        if "retry-after" in headers:
+            return float(headers["retry-after"])
+    except ValueError:
+        pass
+    return 0.5 * 2**attempt
+
+
+class LLMBackend:
+    def __init__(
+        self,
+        name: str,
+        client: Any,
+        async_client: Any = None,
+        weight: float = 1,
+        models: Dict[str, str] = None,
+        requests_per_minute: int = None,
+        tokens_per_minute: int = None,
+    ) -> None:
+        """
+        One endpoint of a BackendPool (an Azure OpenAI resource or an Ollama host).
+
+        Args:
+            name (str): Unique name of the backend, used in logs and limiter keys.
+            client (Any): Sync OpenAI-compatible client bound to the endpoint.
+            async_client (Any, optional): Async OpenAI-compatible client bound to the
+                endpoint, needed by acall.
+            weight (float): Relative share of the traffic the backend should receive.
+            models (Dict[str, str], optional): Maps a logical model name to the
+                deployment name used on this endpoint. Unmapped names are sent as is.
+            requests_per_minute (int, optional): Quota of each deployment on the endpoint.
+            tokens_per_minute (int, optional): Token quota of each deployment on the endpoint.
+        """
+        self.name = name
+        self.client = client
+        self.async_client = async_client
+        self.weight = float(weight)
+        self.models = models or {}
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.outstanding = 0
+        self.consecutive_failures = 0
+        self.unhealthy_until = 0.0
+
+    def deployment(self, model: str) -> str:
+        return self.models.get(model, model)
+
+
+class BackendPool:
+    """
+    Routes requests over several LLM backends.
+
+    A request goes to the healthy backend with the fewest outstanding requests relative
+    to its weight (weighted least-outstanding-requests). Health is checked passively: a
+    backend that fails `failure_threshold` transient errors in a row is skipped for
+    `cooldown` seconds. If every backend is cooling down, the one that recovers first is
+    used anyway. Each (backend, deployment) pair has its own rate limiter, so per-backend
+    quotas are enforced by the limiters of src.rate_limiter.
+
+    Methods:
+        - call(request, model, estimated_tokens, transaction_id, retries) -> Tuple[Any, float]:
+            Sends a request through the pool, failing over to another backend on errors.
+
+        - acall(...):
+            Async variant of call.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        backends: List[LLMBackend],
+        failure_threshold: int = 3,
+        cooldown: float = 30,
+        requests_per_minute: int = 0,
+        tokens_per_minute: int = 0,
+        latency_window: int = 200,
+    ) -> None:
+        self.name = name
+        self.backends = backends
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.latency_tracker = LatencyTracker(latency_window)
+        self._lock = threading.Lock()
+
+    def select(self, exclude: Set[str] = frozenset()) -> LLMBackend:
+        """
+        Picks a backend and counts the request as outstanding on it until `release`.
+
+        Args:
+            exclude (Set[str]): Names of backends to avoid (e.g. the one that just failed),
+                ignored when no other backend is left.
+
+        Returns:
+            LLMBackend: The selected backend.
+        """
+        with self._lock:
+            now = time.monotonic()
+            candidates = [
+                backend for backend in self.backends if backend.name not in exclude
+            ] or self.backends
+            healthy = [
+                backend for backend in candidates if backend.unhealthy_until <= now
+            ]
+            if healthy:
+                backend = min(
+                    healthy,
+                    key=lambda backend: (backend.outstanding + 1) / backend.weight,
+                )
+            else:
+                backend = min(candidates, key=lambda backend: backend.unhealthy_until)
+            backend.outstanding += 1
+            return backend
+
+    def release(self, backend: LLMBackend, success: bool, failed: bool) -> None:
+        """
+        Ends an outstanding request and updates the passive health of the backend.
+
+        Args:
+            backend (LLMBackend): The backend returned by `select`.
+            success (bool): The request succeeded.
+            failed (bool): The request failed with an error that counts against the
+                backend health (connection errors, timeouts, 5xx).
+        """
+        with self._lock:
+            backend.outstanding -= 1
+            if success:
+                backend.consecutive_failures = 0
+            elif failed:
+                backend.consecutive_failures += 1
+                if backend.consecutive_failures >= self.failure_threshold:
+                    backend.unhealthy_until = time.monotonic() + self.cooldown
+                    logger.warning(
+                        f"[BackendPool][{self.name}] - Backend {backend.name} marked unhealthy for {self.cooldown}s"
+                    )
+
+    def limiter(self, backend: LLMBackend, model: str) -> DeploymentRateLimiter:
+        """
+        Returns the rate limiter of a deployment on a backend. Limiters are namespaced by
+        the pool name and, when the pool has several backends, kept per backend.
+        """
+        return rate_limiter_registry.get(
+            backend.deployment(model),
+            namespace=self.name,
+            backend=backend.name if len(self.backends) > 1 else None,
+            requests_per_minute=(
+                self.requests_per_minute
+                if backend.requests_per_minute is None
+                else backend.requests_per_minute
+            ),
+            tokens_per_minute=(
+                self.tokens_per_minute
+                if backend.tokens_per_minute is None
+                else backend.tokens_per_minute
+            ),
+        )
+
+    def _classify_failure(
+        self, request_exc: Exception, attempt: int
+    ) -> Tuple[Optional[float], bool]:
+        """
+        Returns the seconds to wait before retrying (None if the error is not transient)
+        and whether the error counts against the backend health. Throttling (429) does
+        not: it is handled by the backend's rate limiter.
+        """
+        delay = retry_delay(request_exc, attempt)
+        throttled = getattr(request_exc, "status_code", None) == 429
+        return delay, delay is not None and not throttled
+
+    def _prepare_retry(
+        self,
+        request_exc: Exception,
+        delay: float,
+        attempt: int,
+        backend: LLMBackend,
+        limiter: DeploymentRateLimiter,
+        transaction_id: str,
+    ) -> float:
+        """
+        Logs a retry and returns the seconds to sleep before it. A throttled deployment is
+        paused through its limiter; another backend can be tried right away, the same one
+        only after a backoff.
+        """
+        logger.warning(
+            f"[BackendPool][{self.name}][{transaction_id}] - Request to {backend.name} failed (attempt {attempt + 1}), retrying: {str(request_exc)}"
+        )
+        if getattr(request_exc, "status_code", None) == 429:
+            limiter.penalize(delay)
+            return 0
+        return delay if len(self.backends) == 1 else 0
+
+    def call(
+        self,
+        request: Callable[[Any, str], Any],
+        model: str,
+        estimated_tokens: int,
+        transaction_id: str,
+        retries: int = 0,
+    ) -> Tuple[Any, float]:
+        """
+        Sends a request to the selected backend once its rate limiter allows it, retrying
+        transient failures on another backend, and reconciles the limiter with the real usage.
+
+        Args:
+            request (Callable[[Any, str], Any]): Issues the API call given a sync client
+                and the deployment name.
+            model (str): The logical model (deployment) name.
+            estimated_tokens (int): Prompt + completion tokens reserved before sending.
+            transaction_id (str): The ID of the transaction.
+            retries (int): Retries after the first attempt.
+
+        Returns:
+            Tuple[Any, float]: The API response and the seconds spent queued.
+        """
+        queue_wait_time = 0
+        exclude = set()
+        for attempt in range(retries + 1):
+            backend = self.select(exclude)
+            limiter = self.limiter(backend, model)
+            success, failed, delay = False, False, 0
+            try:
+                queue_wait_time += limiter.acquire(estimated_tokens)
+                request_start = time.monotonic()
+                response = request(backend.client, backend.deployment(model))
+                self.latency_tracker.record(model, time.monotonic() - request_start)
+                success = True
+            except Exception as request_exc:
+                delay, failed = self._classify_failure(request_exc, attempt)
+                if delay is None or attempt == retries:
+                    raise
+                delay = self._prepare_retry(
+                    request_exc, delay, attempt, backend, limiter, transaction_id
+                )
+                exclude.add(backend.name)
+            finally:
+                self.release(backend, success, failed)
+            if success:
+                break
+            time.sleep(delay)
+        usage = getattr(response, "usage", None)
+        limiter.reconcile(estimated_tokens, getattr(usage, "total_tokens", 0))
+        return response, queue_wait_time
+
+    async def acall(
+        self,
+        request: Callable[[Any, str], Awaitable[Any]],
+        model: str,
+        estimated_tokens: int,
+        transaction_id: str,
+        retries: int = 0,
+    ) -> Tuple[Any, float]:
+        """
+        Async variant of call; `request` receives the async client of the backend.
+        """
+        queue_wait_time = 0
+        exclude = set()
+        for attempt in range(retries + 1):
+            backend = self.select(exclude)
+            limiter = self.limiter(backend, model)
+            success, failed, delay = False, False, 0
+            try:
+                queue_wait_time += await limiter.aacquire(estimated_tokens)
+                request_start = time.monotonic()
+                response = await request(
+                    backend.async_client, backend.deployment(model)
+                )
+                self.latency_tracker.record(model, time.monotonic() - request_start)
+                success = True
+            except Exception as request_exc:
+                delay, failed = self._classify_failure(request_exc, attempt)
+                if delay is None or attempt == retries:
+                    raise
+                delay = self._prepare_retry(
+                    request_exc, delay, attempt, backend, limiter, transaction_id
+                )
+                exclude.add(backend.name)
+            finally:
+                self.release(backend, success, failed)
+            if success:
+                break
+            await asyncio.sleep(delay)
+        usage = getattr(response, "usage", None)
+        limiter.reconcile(estimated_tokens, getattr(usage, "total_tokens", 0))
+        return response, queue_wait_time
@@ -0,0 +1,625 @@
+"""
+Offline retrieval benchmarks on the labelled questions.
+
+    python -m src.benchmark compression [--questions PATH] [--k 5 10]
+        [--variants full truncate:512 truncate:256 pca:256 int8 truncate:512+int8]
+        [--milvus-index IVF_SQ8 IVF_PQ] [--collections NAME ...] [--output PATH]
+    python -m src.benchmark sweep [--questions PATH] [--tenant ID]
+        [--tables-k 3 5 7 10] [--columns-k 3 5 10 20] [--examples-k 1 2 3]
+        [--ef 0 64 128] [--threshold 0.6 0.65 0.7 0.75] [--output PATH]
+
+compression compares smaller representations of the stored vectors against full
+precision: for every collection, the exact cosine top-k of each labelled question on
+the full-dimension float32 vectors is the reference, and each variant reports its
+recall@k against it, the recall@k of the labelled tables (for the table and column
+collections), the bytes per vector and the search time. Variants are computed in
+process (truncate:<dim>, pca:<dim>, int8 and combinations joined with "+"); each
+--milvus-index type is built on a temporary copy of the collection and searched
+through Milvus, then dropped.
+
+sweep replays the questions through the retrieval stages of get_answer (table search,
+column search on the retrieved tables with the distance threshold, SQL example
+search) for every combination of the grid, and reports per configuration the recall
+of the labelled tables (by the table search and by the selected columns), the recall
+of the labelled columns, the tokens of the text-to-SQL prompt built from the results
+(untrimmed) and the search latency. ef 0 is the Milvus default. For each ef the
+searches run once with the largest k of the grid and smaller k read a prefix of the
+results, so the latency of a configuration is the one of its largest k.
+
+The questions file is a JSON list of {"question", "sqlQuery"} (the SQL example
+format) with optional "tables" and "columns" ("<table>.<column>") lists; without
+them, the labelled tables are the known table names that appear in sqlQuery and the
+labelled columns the columns of those tables whose name appears in it.
+"""
+
+import re
+import json
+import time
+import argparse
+import itertools
+import numpy as np
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from config import get_milvus_config
+from src.adapters.loggingmanager import logger
+from src.adapters.milvusmanager import milvus_manager
+from src.adapters.localvectormanager import local_vector_manager
+from src.ingestion import iter_schema_catalog
+from src.migrations import _vector_field
+from src.sql_prompts import _texttosql_prompt
+from src.token_counter import count_message_tokens
+from src.utils import (
+    get_embedding_manager,
+    build_sql_example_filter,
+    extract_column_metadata,
+    hydrate_column_metadata,
+    format_sql_examples,
+    format_database_relationship,
+)
+from src.vector_compression import (
+    PCAReducer,
+    int8_scores,
+    normalize,
+    quantize_int8,
+    truncate,
+)
+
+DEFAULT_QUESTIONS_PATH = "data/sample_data/few_shot_sql_examples.json"
+DEFAULT_VARIANTS = [
+    "full",
+    "truncate:512",
+    "truncate:256",
+    "pca:256",
+    "int8",
+    "truncate:512+int8",
+]
+
+
+def load_questions(path: str) -> List[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [item for item in json.load(f) if item.get("question")]
+
+
+def question_labels(
+    questions: List[Dict[str, Any]], table_names: List[str]
+) -> List[set]:
+    """
+    The labelled tables of each question: its "tables" list, or the known table names
+    found as words in its sqlQuery.
+    """
+    patterns = {
+        table_name: re.compile(rf"\b{re.escape(table_name)}\b", re.IGNORECASE)
+        for table_name in set(table_names)
+        if table_name
+    }
+    labels = []
+    for question in questions:
+        if question.get("tables"):
+            labels.append(set(question["tables"]))
+        else:
+            sql_query = question.get("sqlQuery") or ""
+            labels.append(
+                {
+                    table_name
+                    for table_name, pattern in patterns.items()
+                    if pattern.search(sql_query)
+                }
+            )
+    return labels
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Row indices of the k best scores, best first.
+    """
+    k = min(k, scores.shape[0])
+    best = np.argpartition(-scores, k - 1)[:k]
+    return best[np.argsort(-scores[best])]
+
+
+def _parse_variant(
+    variant: str, corpus: np.ndarray
+) -> Tuple[Callable[[np.ndarray], np.ndarray], bool]:
+    """
+    Returns the reduction applied to the corpus and the queries of a variant and
+    whether the reduced corpus is int8 quantized.
+    """
+    reduce = normalize
+    quantized = False
+    for step in variant.split("+"):
+        name, _, value = step.partition(":")
+        if name == "full":
+            continue
+        if name == "truncate":
+            reduce = lambda vectors, dim=int(value): truncate(vectors, dim)
+        elif name == "pca":
+            reduce = PCAReducer.fit(corpus, int(value)).transform
+        elif name == "int8":
+            quantized = True
+        else:
+            raise ValueError(f"Unknown variant step {step}")
+    return reduce, quantized
+
+
+def _recalls(
+    results: List[np.ndarray],
+    reference: List[np.ndarray],
+    ks: List[int],
+    labels: List[set],
+    row_tables: Optional[np.ndarray],
+) -> Dict[str, float]:
+    metrics = {}
+    for k in ks:
+        metrics[f"recall@{k}"] = round(
+            float(
+                np.mean(
+                    [
+                        len(set(result[:k]) & set(expected[:k])) / min(k, len(expected))
+                        for result, expected in zip(results, reference)
+                    ]
+                )
+            ),
+            4,
+        )
+        if row_tables is not None and any(labels):
+            metrics[f"table_recall@{k}"] = round(
+                float(
+                    np.mean(
+                        [
+                            len(label & set(row_tables[result[:k]])) / len(label)
+                            for result, label in zip(results, labels)
+                            if label
+                        ]
+                    )
+                ),
+                4,
+            )
+    return metrics
+
+
+def _milvus_variant(
+    transaction_id: str,
+    collection_name: str,
+    vector_field: str,
+    corpus: np.ndarray,
+    queries: np.ndarray,
+    index_type: str,
+    k: int,
+) -> Tuple[List[np.ndarray], float, float]:
+    """
+    Builds an index of `index_type` on a temporary copy of the vectors and searches it.
+
+    Returns:
+        Tuple[List[np.ndarray], float, float]: The row indices found per query, the
+            index build time and the mean search time in milliseconds.
+    """
+    bench_name = f"{collection_name}_bench_{index_type.lower()}"
+    milvus_manager.ensure_collection(
+        transaction_id,
+        bench_name,
+        text_fields=[],
+        vector_field=vector_field,
+        dim=corpus.shape[1],
+        recreate=True,
+    )
+    try:
+        for start in range(0, corpus.shape[0], 1000):
+            milvus_manager.insert_data(
+                transaction_id=transaction_id,
+                collection_name=bench_name,
+                data=[
+                    {"id": str(row), vector_field: corpus[row].tolist()}
+                    for row in range(start, min(start + 1000, corpus.shape[0]))
+                ],
+            )
+        milvus_manager.flush(transaction_id, bench_name)
+        index_time, _ = milvus_manager.create_index(
+            transaction_id, bench_name, vector_field, index_type=index_type
+        )
+        milvus_config = get_milvus_config()
+        results = []
+        start_time = time.time()
+        for query in queries:
+            hits = milvus_manager.milvus_client.search(
+                collection_name=bench_name,
+                data=[query.tolist()],
+                anns_field=vector_field,
+                limit=k,
+                search_params={"metric_type": milvus_config.MILVUS_DISTANCE_METRIC},
+            )[0]
+            results.append(np.array([int(hit["id"]) for hit in hits], dtype=np.int64))
+        search_time = (time.time() - start_time) * 1000 / max(len(queries), 1)
+        return results, index_time, search_time
+    finally:
+        milvus_manager.milvus_client.drop_collection(collection_name=bench_name)
+        milvus_manager.invalidate_collection_cache(bench_name)
+
+
+def benchmark_compression(
+    questions_path: str = DEFAULT_QUESTIONS_PATH,
+    ks: List[int] = (5, 10),
+    variants: List[str] = DEFAULT_VARIANTS,
+    milvus_index_types: List[str] = (),
+    collection_names: List[str] = None,
+    transaction_id: str = "benchmark",
+) -> List[Dict[str, Any]]:
+    """
+    Measures the recall@k of reduced and quantized vectors against full precision.
+
+    Args:
+        questions_path (str): The labelled questions.
+        ks (List[int]): The cut-offs to report.
+        variants (List[str]): The in-process variants.
+        milvus_index_types (List[str]): Milvus index types to build and search.
+        collection_names (List[str], optional): Defaults to the table, column and SQL
+            example collections.
+        transaction_id (str): The ID of the transaction, used in logs.
+
+    Returns:
+        List[Dict[str, Any]]: One row per collection and variant.
+    """
+    milvus_config = get_milvus_config()
+    collection_names = collection_names or [
+        collection_name
+        for collection_name in [
+            milvus_config.MILVUS_TABLE_COLLECTION_NAME,
+            milvus_config.MILVUS_COLUMN_COLLECTION_NAME,
+            milvus_config.MILVUS_SQL_EXAMPLE_COLLECTION_NAME,
+        ]
+        if collection_name
+    ]
+    ks = sorted(ks)
+    questions = load_questions(questions_path)
+    _, embedding_response = get_embedding_manager(reduced=False).create_embeddings(
+        texts=[question["question"] for question in questions],
+        transaction_id=transaction_id,
+    )
+    full_queries = normalize(embedding_response.embeddings)
+
+    rows = []
+    for collection_name in collection_names:
+        schema = milvus_manager.milvus_client.describe_collection(
+            collection_name=collection_name
+        )
+        vector_field = _vector_field(schema)["name"]
+        has_tables = any(field["name"] == "tableName" for field in schema["fields"])
+        records = milvus_manager.query_all(
+            transaction_id,
+            collection_name,
+            output_fields=[vector_field] + (["tableName"] if has_tables else []),
+        )
+        if not records:
+            continue
+        corpus = normalize([record[vector_field] for record in records])
+        if corpus.shape[1] != full_queries.shape[1]:
+            raise ValueError(
+                f"{collection_name} holds {corpus.shape[1]}-dimension vectors, the benchmark needs the full {full_queries.shape[1]} dimensions"
+            )
+        row_tables = (
+            np.array(
+                [record.get("tableName") or "" for record in records], dtype=object
+            )
+            if has_tables
+            else None
+        )
+        labels = (
+            question_labels(questions, list(row_tables))
+            if has_tables
+            else [set() for _ in questions]
+        )
+        reference = [top_k(corpus @ query, ks[-1]) for query in full_queries]
+
+        for variant in variants:
+            reduce, quantized = _parse_variant(variant, corpus)
+            reduced_corpus = reduce(corpus)
+            queries = reduce(full_queries)
+            if quantized:
+                codes, scales = quantize_int8(reduced_corpus)
+                score = lambda query: int8_scores(codes, scales, query)
+            else:
+                score = lambda query: reduced_corpus @ query
+            start_time = time.time()
+            results = [top_k(score(query), ks[-1]) for query in queries]
+            search_time = (time.time() - start_time) * 1000 / max(len(queries), 1)
+            dim = int(reduced_corpus.shape[1])
+            rows.append(
+                {
+                    "collection": collection_name,
+                    "variant": variant,
+                    "dim": dim,
+                    "bytes_per_vector": dim + 4 if quantized else dim * 4,
+                    **_recalls(results, reference, ks, labels, row_tables),
+                    "search_ms": round(search_time, 3),
+                }
+            )
+
+        for index_type in milvus_index_types:
+            results, index_time, search_time = _milvus_variant(
+                transaction_id,
+                collection_name,
+                vector_field,
+                corpus,
+                full_queries,
+                index_type,
+                ks[-1],
+            )
+            rows.append(
+                {
+                    "collection": collection_name,
+                    "variant": f"milvus:{index_type}",
+                    "dim": int(corpus.shape[1]),
+                    **_recalls(results, reference, ks, labels, row_tables),
+                    "index_s": round(index_time, 3),
+                    "search_ms": round(search_time, 3),
+                }
+            )
+        logger.info(
+            f"[benchmark][benchmark_compression][{transaction_id}] - {collection_name}: {len(corpus)} vectors, {len(questions)} questions"
+        )
+    return rows
+
+
+def question_column_labels(
+    questions: List[Dict[str, Any]],
+    table_labels: List[set],
+    table_columns: Dict[str, List[str]],
+) -> List[set]:
+    """
+    The labelled "<table>.<column>" of each question: its "columns" list, or the
+    columns of its labelled tables whose name appears as a word in its sqlQuery.
+    """
+    labels = []
+    for question, tables in zip(questions, table_labels):
+        if question.get("columns"):
+            labels.append(set(question["columns"]))
+            continue
+        sql_query = question.get("sqlQuery") or ""
+        labels.append(
+            {
+                f"{table_name}.{column_name}"
+                for table_name in tables
+                for column_name in table_columns.get(table_name, [])
+                if re.search(rf"\b{re.escape(column_name)}\b", sql_query, re.IGNORECASE)
+            }
+        )
+    return labels
+
+
+def _recall(found: set, expected: set) -> Optional[float]:
+    return len(found & expected) / len(expected) if expected else None
+
+
+def _summary(values: List[Optional[float]], digits: int = 4) -> Optional[float]:
+    values = [value for value in values if value is not None]
+    return round(float(np.mean(values)), digits) if values else None
+
+
+def benchmark_sweep(
+    questions_path: str = DEFAULT_QUESTIONS_PATH,
+    tables_ks: List[int] = (3, 5, 7, 10),
+    columns_ks: List[int] = (3, 5, 10, 20),
+    examples_ks: List[int] = (1, 2, 3),
+    efs: List[int] = (0, 64, 128),
+    thresholds: List[float] = (0.6, 0.65, 0.7, 0.75),
+    tenant_id: str = "",
+    schema_path: str = None,
+    transaction_id: str = "benchmark",
+) -> List[Dict[str, Any]]:
+    """
+    Replays the labelled questions through the retrieval stages for every
+    combination of the parameter grid.
+
+    Args:
+        questions_path (str): The labelled questions.
+        tables_ks (List[int]): MILVUS_TOP_TABLES_K values.
+        columns_ks (List[int]): MILVUS_TOP_COLUMNS_K values.
+        examples_ks (List[int]): MILVUS_TOP_SQL_EXAMPLES_K values.
+        efs (List[int]): MILVUS_SEARCH_PARAM_EF values (0 = Milvus default).
+        thresholds (List[float]): MILVUS_COLUMN_DISTANCE_THRESHOLD values.
+        tenant_id (str): Tenant of the SQL example search and the prompt.
+        schema_path (str, optional): The catalog giving the table and column names
+            used to label the questions. Defaults to SCHEMA_CATALOG_PATH.
+        transaction_id (str): The ID of the transaction, used in logs.
+
+    Returns:
+        List[Dict[str, Any]]: One row per configuration with its mean recalls, prompt
+            tokens and search latency (mean and p95).
+    """
+    milvus_config = get_milvus_config()
+    schema_vector_manager = (
+        local_vector_manager
+        if milvus_config.RETRIEVAL_BACKEND == "local"
+        else milvus_manager
+    )
+    table_columns = {
+        table_name: [
+            column_name
+            for column_name, column_info in (table_info.get("columns") or {}).items()
+            if isinstance(column_info, dict)
+        ]
+        for table_name, table_info in iter_schema_catalog(
+            schema_path or milvus_config.SCHEMA_CATALOG_PATH
+        )
+    }
+    questions = load_questions(questions_path)
+    table_labels = question_labels(questions, list(table_columns))
+    column_labels = question_column_labels(questions, table_labels, table_columns)
+    _, embedding_response = get_embedding_manager().create_embeddings(
+        texts=[question["question"] for question in questions],
+        transaction_id=transaction_id,
+    )
+    example_filter = build_sql_example_filter(tenant_id)
+    max_tables_k, max_columns_k = max(tables_ks), max(columns_ks)
+    max_examples_k = max(examples_ks)
+
+    measures: Dict[Tuple, Dict[str, list]] = {}
+    for question, query, tables_label, columns_label in zip(
+        questions, embedding_response.embeddings, table_labels, column_labels
+    ):
+        for ef in efs:
+            search_params = {"ef": ef} if ef else {}
+            table_time, tables_data = schema_vector_manager.search_index(
+                transaction_id=transaction_id,
+                collection_name=milvus_config.MILVUS_TABLE_COLLECTION_NAME,
+                text_embedding=query,
+                return_fields=milvus_config.MILVUS_TABLE_RETURN_FIELDS,
+                top_k=max_tables_k,
+                search_params=search_params,
+            )
+            example_time, examples_data = milvus_manager.search_index(
+                transaction_id=transaction_id,
+                collection_name=milvus_config.MILVUS_SQL_EXAMPLE_COLLECTION_NAME,
+                text_embedding=query,
+                return_fields=milvus_config.MILVUS_SQL_EXAMPLE_RETURN_FIELDS,
+                top_k=max_examples_k,
+                filter_expr=example_filter,
+                search_params=search_params,
+            )
+            retrieved_tables = [
+                record["entity"]["tableName"] for record in tables_data[0]
+            ]
+            for tables_k in tables_ks:
+                tables = retrieved_tables[:tables_k]
+                column_time, columns_data = schema_vector_manager.search_index(
+                    transaction_id=transaction_id,
+                    collection_name=milvus_config.MILVUS_COLUMN_COLLECTION_NAME,
+                    text_embedding=query,
+                    return_fields=milvus_config.MILVUS_COLUMN_RETURN_FIELDS,
+                    top_k=max_columns_k,
+                    filter_expr=f"tableName in {tables}",
+                    search_params=search_params,
+                )
+                relationship_diagram = format_database_relationship(
+                    retrieved_tables=tables
+                )
+                search_ms = (table_time + column_time + example_time) * 1000
+                for columns_k, threshold, examples_k in itertools.product(
+                    columns_ks, thresholds, examples_ks
+                ):
+                    columns = hydrate_column_metadata(
+                        transaction_id,
+                        extract_column_metadata(
+                            [columns_data[0][:columns_k]], distance_threshold=threshold
+                        ),
+                    )
+                    messages = _texttosql_prompt(
+                        user_input=question["question"],
+                        tenant_id=tenant_id,
+                        columns=columns,
+                        relationship_diagram=relationship_diagram,
+                        example_sql=format_sql_examples(
+                            [examples_data[0][:examples_k]]
+                        ),
+                        token_budget=0,
+                    )
+                    measure = measures.setdefault(
+                        (tables_k, columns_k, examples_k, ef, threshold),
+                        {
+                            "table_recall": [],
+                            "column_table_recall": [],
+                            "column_recall": [],
+                            "prompt_tokens": [],
+                            "search_ms": [],
+                        },
+                    )
+                    measure["table_recall"].append(_recall(set(tables), tables_label))
+                    measure["column_table_recall"].append(
+                        _recall(
+                            {column["tableName"] for column in columns}, tables_label
+                        )
+                    )
+                    measure["column_recall"].append(
+                        _recall(
+                            {
+                                f"{column['tableName']}.{column['columnName']}"
+                                for column in columns
+                            },
+                            columns_label,
+                        )
+                    )
+                    measure["prompt_tokens"].append(count_message_tokens(messages))
+                    measure["search_ms"].append(search_ms)
+
+    rows = []
+    for (tables_k, columns_k, examples_k, ef, threshold), measure in measures.items():
+        rows.append(
+            {
+                "tables_k": tables_k,
+                "columns_k": columns_k,
+                "examples_k": examples_k,
+                "ef": ef,
+                "threshold": threshold,
+                "table_recall": _summary(measure["table_recall"]),
+                "column_table_recall": _summary(measure["column_table_recall"]),
+                "column_recall": _summary(measure["column_recall"]),
+                "prompt_tokens": _summary(measure["prompt_tokens"], 1),
+                "prompt_tokens_p95": float(np.percentile(measure["prompt_tokens"], 95)),
+                "search_ms": _summary(measure["search_ms"], 2),
+                "search_ms_p95": round(
+                    float(np.percentile(measure["search_ms"], 95)), 2
+                ),
+            }
+        )
+    logger.info(
+        f"[benchmark][benchmark_sweep][{transaction_id}] - {len(rows)} configurations over {len(questions)} questions"
+    )
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m src.benchmark")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    compression_parser = subparsers.add_parser(
+        "compression",
+        help="recall@k of reduced and quantized vectors against full precision",
+    )
+    compression_parser.add_argument("--questions", default=DEFAULT_QUESTIONS_PATH)
+    compression_parser.add_argument("--k", type=int, nargs="+", default=[5, 10])
+    compression_parser.add_argument("--variants", nargs="+", default=DEFAULT_VARIANTS)
+    compression_parser.add_argument("--milvus-index", nargs="*", default=[])
+    compression_parser.add_argument("--collections", nargs="+")
+    sweep_parser = subparsers.add_parser(
+        "sweep",
+        help="Retrieval recall, prompt tokens and latency over a parameter grid",
+    )
+    sweep_parser.add_argument("--questions", default=DEFAULT_QUESTIONS_PATH)
+    sweep_parser.add_argument("--tenant", default="")
+    sweep_parser.add_argument("--tables-k", type=int, nargs="+", default=[3, 5, 7, 10])
+    sweep_parser.add_argument(
+        "--columns-k", type=int, nargs="+", default=[3, 5, 10, 20]
+    )
+    sweep_parser.add_argument("--examples-k", type=int, nargs="+", default=[1, 2, 3])
+    sweep_parser.add_argument("--ef", type=int, nargs="+", default=[0, 64, 128])
+    sweep_parser.add_argument(
+        "--threshold", type=float, nargs="+", default=[0.6, 0.65, 0.7, 0.75]
+    )
+    for subparser in (compression_parser, sweep_parser):
+        subparser.add_argument("--output", help="Also write the rows as JSON")
+    args = parser.parse_args()
+
+    if args.command == "sweep":
+        rows = benchmark_sweep(
+            questions_path=args.questions,
+            tables_ks=args.tables_k,
+            columns_ks=args.columns_k,
+            examples_ks=args.examples_k,
+            efs=args.ef,
+            thresholds=args.threshold,
+            tenant_id=args.tenant,
+        )
+    else:
+        rows = benchmark_compression(
+            questions_path=args.questions,
+            ks=args.k,
+            variants=args.variants,
+            milvus_index_types=args.milvus_index,
+            collection_names=args.collections,
+        )
+    for row in rows:
+        print(json.dumps(row))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,14 @@
 import uuid
 import json
+import time
 from src.types import GetAnswerModel, ConversationAnalyticsModel, RetrievalLogsModel
-from config import SqlConfig, MilvusConfig, DatabaseConfig
+from config import (
+    get_sql_config,
+    get_milvus_config,
+    get_database_config,
+    get_openai_config,
+)
 
-# from src.adapters.pinotmanager import pinot_manager
-from src.adapters.sqlmanager import sql_manager
-from config import DatabaseConfig
 from src.sql_prompts import (
     _query_rephrase_prompt,
     _texttosql_prompt,
@@ -16,11 +19,17 @@ from src.sql_prompts import (
 from src.adapters.openaimanager import openai_manager
 from src.adapters.ollamamanager import ollama_manager
 from src.adapters.milvusmanager import milvus_manager
+from src.adapters.localvectormanager import local_vector_manager
 from src.adapters.loggingmanager import logger
 from src.adapters.sqlitemanager import sqlite_manager
+from src.token_counter import count_message_tokens
+from src.circuit_breaker import circuit_breakers
+from src.custom_exception import CustomException
+from src.llm_results import ChatCompletionResult
 from src.utils import (
     rephrase_gpt_response_parser,
-    extract_and_format_metadata,
+    extract_column_metadata,
+    format_column_metadata,
     format_sql_examples,
     sql_response_parser,
     answer_response_parser,
@@ -33,13 +42,59 @@ from src.utils import (
     should_generate_chart,
     format_database_relationship,
     convert_epoch_columns_to_str,
+    detect_epoch_columns,
+    get_pandas,
     cleanse_bytes,
     decode_html,
+    _clean_llm_response_for_deepseek,
+    get_embedding_manager,
+    get_sql_manager,
+    get_row_limit,
+    limit_sql_query,
+    build_sql_example_filter,
+    hydrate_column_metadata,
+)
+from typing import Dict, List, Tuple, Union, Generator
+
+return_key_dialect = list(get_database_config().DIALECT.keys())[0]
+prompt_dialect = get_database_config().DIALECT[return_key_dialect]
+milvus_config = get_milvus_config()
+openai_config = get_openai_config()
+# Table and column collections are searched in process with RETRIEVAL_BACKEND=local
+schema_vector_manager = (
+    local_vector_manager
+    if milvus_config.RETRIEVAL_BACKEND == "local"
+    else milvus_manager
 )
-from typing import Tuple, Union, Generator
 
-return_key_dialect = list(DatabaseConfig().DIALECT.keys())[0]
-prompt_dialect = DatabaseConfig().DIALECT[return_key_dialect]
+# Prefix of the ConversationAnalyticsModel fields of each chat completion stage
+STAGE_ANALYTICS_PREFIX = {
+    "rephrase": "userTextRephrased",
+    "cluster": "clusterIdentification",
+    "sql": "sqlQuery",
+    "answer": "answer",
+    "graph": "graph",
+}
+
+
+def _parse_stage_model(stage_model: str) -> Tuple[str, str]:
+    """
+    Splits a STAGE_MODELS entry ("gpt-4o-mini", "openai:gpt-4o-mini" or
+    "ollama:llama3.1:8b") into its provider and model.
+    """
+    provider, _, model = stage_model.partition(":")
+    if provider in ("openai", "ollama") and model:
+        return provider, model
+    return "openai", stage_model
+
+
+def _is_fallback_error(chat_completion_exc: CustomException) -> bool:
+    """
+    Whether a failed chat completion should be retried on the next model of the
+    chain: timeouts, throttling and server or connection errors.
+    """
+    status_code = getattr(chat_completion_exc, "StatusCode", 500) or 500
+    return status_code in (408, 429) or status_code >= 500
 
 
 class biAssistant:
@@ -60,6 +115,84 @@ class biAssistant:
         self.retrieval_logs = RetrievalLogsModel(**self.data.model_dump())
         self.retrieval_logs.conversationAnalyticsId = self.conversation_analytics.id
 
+    def _chat_completion(
+        self, stage: str, messages: List[Dict[str, str]], **kwargs
+    ) -> Tuple[float, ChatCompletionResult]:
+        """
+        Sends the chat completion of a pipeline stage along its fallback chain in
+        STAGE_MODELS and records the model used and the call in the analytics.
+
+        Models whose circuit breaker is open are skipped without a request. A model
+        failing with a transient error (408, 429, 5xx) hands over to the next one;
+        any other error is raised right away since the next model would fail alike.
+
+        Args:
+            stage (str): One of rephrase, cluster, sql, answer, graph.
+            messages (List[Dict[str, str]]): The prompt messages.
+            **kwargs: Passed on to chat_completion, e.g. response_format.
+
+        Returns:
+            Tuple[float, ChatCompletionResult]: The time taken and the chat completion result.
+
+        Raises:
+            CustomException: If every model of the chain failed or was skipped.
+        """
+        transaction_id = self.conversation_analytics.conversationID
+        last_exc = None
+        for position, stage_model in enumerate(openai_config.STAGE_MODELS[stage]):
+            provider, model = _parse_stage_model(stage_model)
+            breaker = circuit_breakers.get(f"{provider}:{model}")
+            if not breaker.allow_request():
+                logger.warning(
+                    f"[biAssistant][_chat_completion][{transaction_id}] - Skipping {provider}:{model} for {stage}, circuit open"
+                )
+                continue
+            manager = ollama_manager if provider == "ollama" else openai_manager
+            try:
+                elapsed_time, response = manager.chat_completion(
+                    transaction_id=transaction_id,
+                    messages=messages,
+                    model=model,
+                    **kwargs,
+                )
+            except CustomException as chat_completion_exc:
+                if not _is_fallback_error(chat_completion_exc):
+                    # The request itself was rejected, which says nothing about the
+                    # health of the model: free the probe slot, record nothing
+                    breaker.release()
+                    raise
+                breaker.record_failure()
+                logger.warning(
+                    f"[biAssistant][_chat_completion][{transaction_id}] - {provider}:{model} failed for {stage}, trying the next model: {chat_completion_exc.message}"
+                )
+                last_exc = chat_completion_exc
+                continue
+            except Exception:
+                breaker.record_failure()
+                raise
+            breaker.record_success(elapsed_time)
+            break
+        else:
+            raise last_exc or CustomException(
+                error="Chat Completion Failed",
+                message=f"All models of the {stage} stage are unavailable (circuit open)",
+                StatusCode=503,
+            )
+        if provider == "ollama":
+            response = response._replace(
+                content=_clean_llm_response_for_deepseek(response.content)
+            )
+        setattr(
+            self.conversation_analytics,
+            f"{STAGE_ANALYTICS_PREFIX[stage]}Model",
+            f"{provider}:{model}",
+        )
+        self.conversation_analytics.totalChatCompletionCalls += 1
+        self.conversation_analytics.fallbackChatCompletionCalls += int(position > 0)
+        self.conversation_analytics.rateLimitQueueTime += response.queue_wait_time
+        self.conversation_analytics.hedgedChatCompletionCalls += int(response.hedged)
+        return elapsed_time, response
+
     # def get_answer(self):
     #     logger.info(
     #         f"[biAssistant][get_answer][{self.conversation_analytics.conversationID}] - Start"
@@ -67,7 +200,7 @@ class biAssistant:
 
     #     question_column_name = "userText"
 
-    #     sql_query = f"""SELECT {question_column_name}, answer, error FROM {SqlConfig().CONVERSATION_ANALYTICS_TABLE} WHERE userID = '{self.conversation_analytics.userID}' and sessionID = '{self.conversation_analytics.sessionID}' ORDER BY _ts desc LIMIT 2;"""
+    #     sql_query = f"""SELECT {question_column_name}, answer, error FROM {get_sql_config().CONVERSATION_ANALYTICS_TABLE} WHERE userID = '{self.conversation_analytics.userID}' and sessionID = '{self.conversation_analytics.sessionID}' ORDER BY _ts desc LIMIT 2;"""
 
     #     fetched_df = (
     #         sqlite_manager.fetch_data(
@@ -140,10 +273,10 @@ class biAssistant:
     #     self.conversation_analytics.tableVectorSearchTime, table_retrieved_data = (
     #         milvus_manager.search_index(
     #             transaction_id=self.conversation_analytics.conversationID,
-    #             collection_name=MilvusConfig().MILVUS_TABLE_COLLECTION_NAME,
+    #             collection_name=milvus_config.MILVUS_TABLE_COLLECTION_NAME,
     #             text_embedding=query_embedding,
-    #             return_fields=MilvusConfig().MILVUS_TABLE_RETURN_FIELDS,
-    #             top_k=MilvusConfig().MILVUS_TOP_TABLES_K,
+    #             return_fields=milvus_config.MILVUS_TABLE_RETURN_FIELDS,
+    #             top_k=milvus_config.MILVUS_TOP_TABLES_K,
     #         )
     #     )
     #     for record in table_retrieved_data[0]:
@@ -157,11 +290,11 @@ class biAssistant:
     #     self.conversation_analytics.columnVectorSearchTime, columns_retrieved_data = (
     #         milvus_manager.search_index(
     #             transaction_id=self.conversation_analytics.conversationID,
-    #             collection_name=MilvusConfig().MILVUS_COLUMN_COLLECTION_NAME,
+    #             collection_name=milvus_config.MILVUS_COLUMN_COLLECTION_NAME,
     #             text_embedding=query_embedding,
-    #             return_fields=MilvusConfig().MILVUS_COLUMN_RETURN_FIELDS,
+    #             return_fields=milvus_config.MILVUS_COLUMN_RETURN_FIELDS,
     #             top_k=len(self.retrieval_logs.relevantTables)
-    #             * MilvusConfig().MILVUS_TOP_COLUMNS_K,
+    #             * milvus_config.MILVUS_TOP_COLUMNS_K,
     #             filter_expr=column_filter_expr,
     #         )
     #     )
@@ -181,10 +314,10 @@ class biAssistant:
     #     self.conversation_analytics.sqlExampleVectorSearchTime, sql_examples_data = (
     #         milvus_manager.search_index(
     #             transaction_id=self.conversation_analytics.conversationID,
-    #             collection_name=MilvusConfig().MILVUS_SQL_EXAMPLE_COLLECTION_NAME,
+    #             collection_name=milvus_config.MILVUS_SQL_EXAMPLE_COLLECTION_NAME,
     #             text_embedding=query_embedding,
-    #             return_fields=MilvusConfig().MILVUS_SQL_EXAMPLE_RETURN_FIELDS,
-    #             top_k=MilvusConfig().MILVUS_TOP_SQL_EXAMPLES_K,
+    #             return_fields=milvus_config.MILVUS_SQL_EXAMPLE_RETURN_FIELDS,
+    #             top_k=milvus_config.MILVUS_TOP_SQL_EXAMPLES_K,
     #             filter_expr=sql_example_filter_expr,
     #         )
     #     )
@@ -332,7 +465,7 @@ class biAssistant:
 
         question_column_name = "userText"
 
-        sql_query = f"""SELECT {question_column_name}, userTextRephrased, sqlQuery, error FROM {SqlConfig().CONVERSATION_ANALYTICS_TABLE} WHERE userID = '{self.conversation_analytics.userID}' and sessionID = '{self.conversation_analytics.sessionID}' ORDER BY _ts desc LIMIT 2;"""
+        sql_query = f"""SELECT {question_column_name}, userTextRephrased, sqlQuery, error FROM {get_sql_config().CONVERSATION_ANALYTICS_TABLE} WHERE userID = '{self.conversation_analytics.userID}' and sessionID = '{self.conversation_analytics.sessionID}' ORDER BY _ts desc LIMIT 2;"""
 
         fetched_df = (
             sqlite_manager.fetch_data(
@@ -362,16 +495,12 @@ class biAssistant:
             (
                 self.conversation_analytics.userTextRephrasedChatCompletionTime,
                 rephrase_response,
-            ) = openai_manager.chat_completion(
-                transaction_id=self.conversation_analytics.conversationID,
-                messages=rephrase_messages,
-            )
-            self.conversation_analytics.totalChatCompletionCalls += 1
+            ) = self._chat_completion(stage="rephrase", messages=rephrase_messages)
             self.conversation_analytics.userTextRephrasedChatCompletionInputToken = (
-                rephrase_response["usage"]["prompt_tokens"]
+                rephrase_response.usage.prompt_tokens
             )
             self.conversation_analytics.userTextRephrasedChatCompletionOutputToken = (
-                rephrase_response["usage"]["completion_tokens"]
+                rephrase_response.usage.completion_tokens
             )
             # parsing category gpt response
             self.conversation_analytics.userTextRephrased = (
@@ -402,16 +531,19 @@ class biAssistant:
         (
             self.conversation_analytics.userTextEmbeddingGenerationTime,
             embedding_response,
-        ) = openai_manager.create_embedding(
+        ) = get_embedding_manager().create_embedding(
             transaction_id=self.conversation_analytics.conversationID,
             text=getattr(self.conversation_analytics, question_column_name),
         )
         self.conversation_analytics.totalAdaCalls += 1
+        self.conversation_analytics.rateLimitQueueTime += (
+            embedding_response.queue_wait_time
+        )
         # Validation of text translation
-        self.conversation_analytics.userTextEmbeddingTokens = embedding_response[
-            "usage"
-        ]["total_tokens"]
-        query_embedding = embedding_response["data"][0]["embedding"]
+        self.conversation_analytics.userTextEmbeddingTokens = (
+            embedding_response.usage.total_tokens
+        )
+        query_embedding = embedding_response.embedding
         del embedding_response
         logger.info(
             f"[biAssistant][get_answer][{self.conversation_analytics.conversationID}] - Query embedding generated"
@@ -423,40 +555,65 @@ class biAssistant:
             user_input=getattr(self.conversation_analytics, question_column_name)
         )
         (
-            clusterIdentificationTime,
+            self.conversation_analytics.clusterIdentificationChatCompletionTime,
             cluster_chat_completion_response,
-        ) = openai_manager.chat_completion(
-            transaction_id=self.conversation_analytics.conversationID,
-            messages=cluster_messages,
+        ) = self._chat_completion(stage="cluster", messages=cluster_messages)
+        self.conversation_analytics.clusterIdentificationChatCompletionInputToken = (
+            cluster_chat_completion_response.usage.prompt_tokens
         )
-        self.conversation_analytics.totalChatCompletionCalls += 1
-        clusterIdentificationInputToken = cluster_chat_completion_response["usage"][
-            "prompt_tokens"
-        ]
-        clusterIdentificationOutputToken = cluster_chat_completion_response["usage"][
-            "completion_tokens"
+        self.conversation_analytics.clusterIdentificationChatCompletionOutputToken = (
+            cluster_chat_completion_response.usage.completion_tokens
+        )
+        relevantClusters = json.loads(cluster_chat_completion_response.content)[
+            "clusters"
         ]
-        relevantClusters = json.loads(
-            cluster_chat_completion_response["choices"][0]["message"]["content"]
-        )["clusters"]
         print(relevantClusters)
         logger.info(
             f"[biAssistant][get_answer][{self.conversation_analytics.conversationID}] - Relevant clusters identified"
         )
 
-        # STEP 2 : Table Vector search
+        # STEP 2 : Table and SQL Example Vector search, independent of each other and
+        # run concurrently
         yield f"[LOGS] - Searching relevant tables"
         table_filter_expr = f"tableCluster in {relevantClusters}"
-        self.conversation_analytics.tableVectorSearchTime, table_retrieved_data = (
-            milvus_manager.search_index(
+        table_search = dict(
+            collection_name=milvus_config.MILVUS_TABLE_COLLECTION_NAME,
+            text_embedding=query_embedding,
+            return_fields=milvus_config.MILVUS_TABLE_RETURN_FIELDS,
+            top_k=milvus_config.MILVUS_TOP_TABLES_K,
+            filter_expr=table_filter_expr,
+        )
+        sql_example_filter_expr = build_sql_example_filter(
+            self.conversation_analytics.tenantId
+        )
+        sql_example_search = dict(
+            collection_name=milvus_config.MILVUS_SQL_EXAMPLE_COLLECTION_NAME,
+            text_embedding=query_embedding,
+            return_fields=milvus_config.MILVUS_SQL_EXAMPLE_RETURN_FIELDS,
+            top_k=milvus_config.MILVUS_TOP_SQL_EXAMPLES_K,
+            filter_expr=sql_example_filter_expr,
+        )
+        if schema_vector_manager is milvus_manager:
+            table_search_result, sql_example_search_result = milvus_manager.search_many(
                 transaction_id=self.conversation_analytics.conversationID,
-                collection_name=MilvusConfig().MILVUS_TABLE_COLLECTION_NAME,
-                text_embedding=query_embedding,
-                return_fields=MilvusConfig().MILVUS_TABLE_RETURN_FIELDS,
-                top_k=MilvusConfig().MILVUS_TOP_TABLES_K,
-                filter_expr=table_filter_expr,
+                searches=[table_search, sql_example_search],
             )
+        else:
+            table_search_result = schema_vector_manager.search_index(
+                transaction_id=self.conversation_analytics.conversationID,
+                **table_search,
+            )
+            (sql_example_search_result,) = milvus_manager.search_many(
+                transaction_id=self.conversation_analytics.conversationID,
+                searches=[sql_example_search],
+            )
+        self.conversation_analytics.tableVectorSearchTime, table_retrieved_data = (
+            table_search_result
         )
+        self.conversation_analytics.sqlExampleVectorSearchTime, sql_examples_data = (
+            sql_example_search_result
+        )
+        del table_search_result, sql_example_search_result
         for record in table_retrieved_data[0]:
             self.retrieval_logs.relevantTables.append(record["entity"]["tableName"])
         del table_retrieved_data
@@ -483,42 +640,30 @@ class biAssistant:
         # STEP 3 : Column Vector search
         yield f"[LOGS] - Searching relevant columns"
         column_filter_expr = f"tableName in {self.retrieval_logs.relevantTables}"
-        top_k_columns = MilvusConfig().MILVUS_TOP_COLUMNS_K
+        top_k_columns = milvus_config.MILVUS_TOP_COLUMNS_K
         # top_k_columns = 30
         self.conversation_analytics.columnVectorSearchTime, columns_retrieved_data = (
-            milvus_manager.search_index(
+            schema_vector_manager.search_index(
                 transaction_id=self.conversation_analytics.conversationID,
-                collection_name=MilvusConfig().MILVUS_COLUMN_COLLECTION_NAME,
+                collection_name=milvus_config.MILVUS_COLUMN_COLLECTION_NAME,
                 text_embedding=query_embedding,
-                return_fields=MilvusConfig().MILVUS_COLUMN_RETURN_FIELDS,
+                return_fields=milvus_config.MILVUS_COLUMN_RETURN_FIELDS,
                 top_k=top_k_columns,
                 filter_expr=column_filter_expr,
             )
         )
 
-        self.retrieval_logs.relevantColumns = extract_and_format_metadata(
-            columns_retrieved_data
+        relevant_columns = hydrate_column_metadata(
+            self.conversation_analytics.conversationID,
+            extract_column_metadata(columns_retrieved_data),
         )
+        self.retrieval_logs.relevantColumns = format_column_metadata(relevant_columns)
         del columns_retrieved_data
         logger.info(
             f"[biAssistant][get_answer][{self.conversation_analytics.conversationID}] - Relevant columns retrieved"
         )
-        # STEP 4 : SQL Example Vector search
+        # STEP 4 : SQL Example Vector search (retrieved with the tables)
         yield f"[LOGS] - Searching relevant SQL examples"
-        # sql_example_filter_expr = (
-        #     f'tenantID == "{self.conversation_analytics.tenantId}"'
-        # )
-        sql_example_filter_expr = ""
-        self.conversation_analytics.sqlExampleVectorSearchTime, sql_examples_data = (
-            milvus_manager.search_index(
-                transaction_id=self.conversation_analytics.conversationID,
-                collection_name=MilvusConfig().MILVUS_SQL_EXAMPLE_COLLECTION_NAME,
-                text_embedding=query_embedding,
-                return_fields=MilvusConfig().MILVUS_SQL_EXAMPLE_RETURN_FIELDS,
-                top_k=MilvusConfig().MILVUS_TOP_SQL_EXAMPLES_K,
-                filter_expr=sql_example_filter_expr,
-            )
-        )
         self.retrieval_logs.relevantSqlExamples = format_sql_examples(sql_examples_data)
         del sql_examples_data
         logger.info(
@@ -534,24 +679,26 @@ class biAssistant:
         sql_query_messages = _texttosql_prompt(
             user_input=getattr(self.conversation_analytics, question_column_name),
             tenant_id=self.conversation_analytics.tenantId,
-            metadata_info=self.retrieval_logs.relevantColumns,
+            columns=relevant_columns,
             example_sql=self.retrieval_logs.relevantSqlExamples,
             relationship_diagram=database_relationship_diagram,
         )
+        self.conversation_analytics.sqlQueryPromptTokenEstimate = count_message_tokens(
+            sql_query_messages
+        )
         (
             self.conversation_analytics.sqlQueryChatCompletionTime,
             sql_chat_completion_response,
-        ) = openai_manager.chat_completion(
-            transaction_id=self.conversation_analytics.conversationID,
-            messages=sql_query_messages,
-        )
+        ) = self._chat_completion(stage="sql", messages=sql_query_messages)
 
-        self.conversation_analytics.totalChatCompletionCalls += 1
         self.conversation_analytics.sqlQueryChatCompletionInputToken = (
-            sql_chat_completion_response["usage"]["prompt_tokens"]
+            sql_chat_completion_response.usage.prompt_tokens
         )
         self.conversation_analytics.sqlQueryChatCompletionOutputToken = (
-            sql_chat_completion_response["usage"]["completion_tokens"]
+            sql_chat_completion_response.usage.completion_tokens
+        )
+        logger.info(
+            f"[biAssistant][get_answer][{self.conversation_analytics.conversationID}] - SQL prompt tokens: {self.conversation_analytics.sqlQueryPromptTokenEstimate} estimated, {self.conversation_analytics.sqlQueryChatCompletionInputToken} billed"
         )
 
         # Parsing and Validating SQL
@@ -581,13 +728,19 @@ class biAssistant:
             )
             return
         del sql_chat_completion_response
+        # The shown query carries the tenant's LIMIT; the executed one asks for one
+        # more row so that a result cut at the limit is flagged as truncated
+        self.conversation_analytics.sqlQuery, sql_query_to_run, row_limit = (
+            limit_sql_query(
+                transaction_id=self.conversation_analytics.conversationID,
+                sql_query=self.conversation_analytics.sqlQuery,
+                row_limit=get_row_limit(self.conversation_analytics.tenantId),
+            )
+        )
         logger.info(
             f"[biAssistant][get_answer][{self.conversation_analytics.conversationID}] - SQL query generated"
         )
 
-        # self.conversation_analytics.sqlQuery = (
-        #     f"SET useMultistageEngine=true; {self.conversation_analytics.sqlQuery}"
-        # )
         yield json.dumps(
             {
                 "type": "sqlQuery",
@@ -596,20 +749,67 @@ class biAssistant:
         )
         # STEP 6 : Execute SQL query
         yield f"[LOGS] - Executing SQL query"
-        self.conversation_analytics.sqlQueryExecutionTime, sql_execution_response = (
-            sql_manager.fetch_data(
-                transaction_id=self.conversation_analytics.conversationID,
-                sql_query=self.conversation_analytics.sqlQuery,
+        sql_config = get_sql_config()
+        sql_execution_start = time.time()
+        # Streamed chunks are released once sent, only the first SQL_STREAM_KEEP_ROWS
+        # rows are kept; otherwise the whole (capped) result is kept
+        sql_execution_chunks, kept_rows, total_rows = [], 0, 0
+        epoch_columns = None
+        for chunk, truncated in get_sql_manager().stream_data(
+            transaction_id=self.conversation_analytics.conversationID,
+            sql_query=sql_query_to_run,
+            fetch_size=sql_config.SQL_FETCH_SIZE,
+            max_rows=min(filter(None, [row_limit, sql_config.SQL_MAX_ROWS]), default=0),
+            max_bytes=sql_config.SQL_MAX_BYTES,
+        ):
+            # Convert epoch columns to string for better readability and decode
+            # HTML entities. The epoch columns are decided on the first chunk so
+            # every chunk is converted alike.
+            if epoch_columns is None:
+                epoch_columns = detect_epoch_columns(chunk)
+            chunk = convert_epoch_columns_to_str(
+                chunk, epoch_columns=epoch_columns
+            ).map(decode_html)
+            total_rows += len(chunk)
+            self.conversation_analytics.sqlQueryResponseTruncated = truncated
+            if not sql_config.SQL_STREAM_RESULTS:
+                sql_execution_chunks.append(chunk)
+                continue
+            if kept_rows < sql_config.SQL_STREAM_KEEP_ROWS or not sql_execution_chunks:
+                # copy() so the kept rows do not hold on to the whole chunk
+                sql_execution_chunks.append(
+                    chunk.iloc[
+                        : max(sql_config.SQL_STREAM_KEEP_ROWS - kept_rows, 0)
+                    ].copy()
+                )
+                kept_rows += len(sql_execution_chunks[-1])
+            self.conversation_analytics.sqlQueryExecutionTime += (
+                time.time() - sql_execution_start
+            )
+            yield json.dumps(
+                {
+                    "type": "sqlQueryResponseChunk",
+                    "content": json.dumps(
+                        chunk.to_dict(orient="records"),
+                        ensure_ascii=False,
+                        default=str,
+                    ),
+                }
             )
+            del chunk
+            # The time the client takes to read the frame is not query time
+            sql_execution_start = time.time()
+        self.conversation_analytics.sqlQueryExecutionTime += (
+            time.time() - sql_execution_start
+        )
+        sql_execution_response = get_pandas().concat(
+            sql_execution_chunks, ignore_index=True
         )
+        del sql_execution_chunks
         logger.info(
-            f"[biAssistant][get_answer][{self.conversation_analytics.conversationID}] - SQL query executed"
+            f"[biAssistant][get_answer][{self.conversation_analytics.conversationID}] - SQL query executed, {total_rows} rows ({len(sql_execution_response)} kept), truncated: {self.conversation_analytics.sqlQueryResponseTruncated}"
         )
 
-        # Convert epoch columns to string for better readability
-        sql_execution_response = convert_epoch_columns_to_str(sql_execution_response)
-        # decode HTML entities
-        sql_execution_response = sql_execution_response.map(decode_html)
         self.conversation_analytics.sqlQueryResponse = json.dumps(
             sql_execution_response.to_dict(orient="records"),
             ensure_ascii=False,  # UTF-8 output
@@ -617,12 +817,15 @@ class biAssistant:
         )
 
         yield f"[LOGS] - SQL query executed"
-        yield json.dumps(
-            {
-                "type": "sqlQueryResponse",
-                "content": self.conversation_analytics.sqlQueryResponse,
-            }
-        )
+        if not sql_config.SQL_STREAM_RESULTS:
+            yield json.dumps(
+                {
+                    "type": "sqlQueryResponse",
+                    "content": self.conversation_analytics.sqlQueryResponse,
+                }
+            )
+        if self.conversation_analytics.sqlQueryResponseTruncated:
+            yield json.dumps({"type": "sqlQueryResponseTruncated", "content": True})
 
         sql_result_markdown = (
             sql_execution_response.sample(n=min(10, len(sql_execution_response)))
@@ -639,18 +842,14 @@ class biAssistant:
         )
         yield f"[LOGS] - Generating answer"
         self.conversation_analytics.answerChatCompletionTime, answer_response = (
-            openai_manager.chat_completion(
-                transaction_id=self.conversation_analytics.conversationID,
-                messages=answer_messages,
-            )
+            self._chat_completion(stage="answer", messages=answer_messages)
+        )
+        self.conversation_analytics.answerChatCompletionInputToken = (
+            answer_response.usage.prompt_tokens
+        )
+        self.conversation_analytics.answerChatCompletionOutputToken = (
+            answer_response.usage.completion_tokens
         )
-        self.conversation_analytics.totalChatCompletionCalls += 1
-        self.conversation_analytics.answerChatCompletionInputToken = answer_response[
-            "usage"
-        ]["prompt_tokens"]
-        self.conversation_analytics.answerChatCompletionOutputToken = answer_response[
-            "usage"
-        ]["completion_tokens"]
         yield f"[LOGS] - Parsing answer"
         self.conversation_analytics.answer = answer_response_parser(
             transaction_id=self.conversation_analytics.conversationID,
@@ -678,20 +877,19 @@ class biAssistant:
                 data_type=data_types,
             )
             self.conversation_analytics.graphChatCompletionTime, graph_response = (
-                openai_manager.chat_completion(
-                    transaction_id=self.conversation_analytics.conversationID,
+                self._chat_completion(
+                    stage="graph",
                     messages=graph_messages,
                     response_format={"type": "text"},
                 )
             )
-            self.conversation_analytics.totalChatCompletionCalls += 1
-            self.conversation_analytics.graphChatCompletionInputToken = graph_response[
-                "usage"
-            ]["prompt_tokens"]
-            self.conversation_analytics.graphChatCompletionOutputToken = graph_response[
-                "usage"
-            ]["completion_tokens"]
-            python_plotly_code = graph_response["choices"][0]["message"]["content"]
+            self.conversation_analytics.graphChatCompletionInputToken = (
+                graph_response.usage.prompt_tokens
+            )
+            self.conversation_analytics.graphChatCompletionOutputToken = (
+                graph_response.usage.completion_tokens
+            )
+            python_plotly_code = graph_response.content
             self.conversation_analytics.graphGenerationCode = _sanitize_plotly_code(
                 _extract_python_code(python_plotly_code)
             )
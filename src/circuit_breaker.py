@@ -0,0 +1,165 @@
+import time
+import threading
+from collections import deque
+from typing import Deque, Dict, List, Tuple
+from config import get_openai_config
+from src.adapters.loggingmanager import logger
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker of one provider/model, fed with the outcome of every call.
+
+    CLOSED: calls go through; the last `window` outcomes are kept. Once at least
+    `min_requests` are known, the breaker opens when the share of failures reaches
+    `error_rate` or the share of calls slower than `slow_call_seconds` reaches
+    `slow_call_rate`.
+    OPEN: calls are rejected immediately for `open_seconds`.
+    HALF_OPEN: a single probe call is let through; its success closes the breaker,
+    its failure (or slowness) opens it again.
+
+    Methods:
+        - allow_request() -> bool:
+            Whether a call may be sent now.
+
+        - record_success(latency: float) -> None / record_failure() -> None:
+            Report the outcome of a call that was allowed.
+
+        - release() -> None:
+            Ends an allowed call whose outcome says nothing about the model health.
+
+        - is_open() -> bool:
+            Whether calls are currently rejected, without changing the state.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        window: int = 20,
+        min_requests: int = 5,
+        error_rate: float = 0.5,
+        slow_call_seconds: float = 30,
+        slow_call_rate: float = 0.5,
+        open_seconds: float = 30,
+    ) -> None:
+        self.name = name
+        self.min_requests = min_requests
+        self.error_rate = error_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self.state = self.CLOSED
+        # (failed, slow) per call
+        self._outcomes: Deque[Tuple[bool, bool]] = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.open_seconds:
+                    return False
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def is_open(self) -> bool:
+        with self._lock:
+            return (
+                self.state == self.OPEN
+                and time.monotonic() - self._opened_at < self.open_seconds
+            )
+
+    def release(self) -> None:
+        with self._lock:
+            # A half-open breaker stays half-open: the next call is the probe
+            if self.state == self.HALF_OPEN:
+                self._probe_in_flight = False
+
+    def record_success(self, latency: float) -> None:
+        self._record(failed=False, slow=latency >= self.slow_call_seconds)
+
+    def record_failure(self) -> None:
+        self._record(failed=True, slow=False)
+
+    def _record(self, failed: bool, slow: bool) -> None:
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._probe_in_flight = False
+                if failed or slow:
+                    self._open("probe call failed")
+                else:
+                    self.state = self.CLOSED
+                    self._outcomes.clear()
+                    logger.info(f"[CircuitBreaker][{self.name}] - Closed")
+                return
+            self._outcomes.append((failed, slow))
+            if self.state != self.CLOSED or len(self._outcomes) < self.min_requests:
+                return
+            failures = sum(outcome[0] for outcome in self._outcomes)
+            slow_calls = sum(outcome[1] for outcome in self._outcomes)
+            if failures / len(self._outcomes) >= self.error_rate:
+                self._open(f"error rate {failures}/{len(self._outcomes)}")
+            elif slow_calls / len(self._outcomes) >= self.slow_call_rate:
+                self._open(f"slow calls {slow_calls}/{len(self._outcomes)}")
+
+    def _open(self, reason: str) -> None:
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+        logger.warning(
+            f"[CircuitBreaker][{self.name}] - Opened for {self.open_seconds}s: {reason}"
+        )
+
+
+class CircuitBreakerRegistry:
+    def __init__(self) -> None:
+        """
+        Holds one CircuitBreaker per provider/model, configured from the
+        CIRCUIT_BREAKER_* settings and shared by the whole process.
+        """
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> CircuitBreaker:
+        breaker = self._breakers.get(name)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.get(name)
+                if breaker is None:
+                    openai_config = get_openai_config()
+                    breaker = CircuitBreaker(
+                        name=name,
+                        window=openai_config.CIRCUIT_BREAKER_WINDOW,
+                        min_requests=openai_config.CIRCUIT_BREAKER_MIN_REQUESTS,
+                        error_rate=openai_config.CIRCUIT_BREAKER_ERROR_RATE,
+                        slow_call_seconds=openai_config.CIRCUIT_BREAKER_SLOW_CALL_SECONDS,
+                        slow_call_rate=openai_config.CIRCUIT_BREAKER_SLOW_CALL_RATE,
+                        open_seconds=openai_config.CIRCUIT_BREAKER_OPEN_SECONDS,
+                    )
+                    self._breakers[name] = breaker
+        return breaker
+
+    def breakers(self, prefix: str = "") -> List[CircuitBreaker]:
+        """
+        Returns the breakers created so far whose name starts with `prefix`, e.g. "openai:".
+        """
+        with self._lock:
+            return [
+                breaker
+                for name, breaker in self._breakers.items()
+                if name.startswith(prefix)
+            ]
+
+
+circuit_breakers = CircuitBreakerRegistry()
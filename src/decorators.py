@@ -1,4 +1,5 @@
 import time
+import functools
 
 
 def measure_time(func):
@@ -22,6 +23,7 @@ def measure_time(func):
         print(f"Result: {result}")
     """
 
+    @functools.wraps(func)
     def wrapper(*args, **kwargs):
         start_time = time.time()
         result = func(*args, **kwargs)
@@ -0,0 +1,108 @@
+import time
+import asyncio
+import threading
+from collections import defaultdict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+
+class LatencyTracker:
+    def __init__(self, window: int = 200) -> None:
+        """
+        Keeps the latencies of the last `window` successful requests per deployment.
+
+        Args:
+            window (int): Number of recent samples kept per deployment.
+        """
+        self._samples: Dict[str, Deque[float]] = defaultdict(
+            lambda: deque(maxlen=window)
+        )
+        self._lock = threading.Lock()
+
+    def record(self, model: str, latency: float) -> None:
+        with self._lock:
+            self._samples[model].append(latency)
+
+    def percentile(
+        self, model: str, percentile: float, min_samples: int = 1
+    ) -> Optional[float]:
+        """
+        Returns the given percentile (0-100) of the recent latencies of a deployment,
+        or None while fewer than `min_samples` requests have been recorded.
+        """
+        with self._lock:
+            samples = sorted(self._samples[model])
+        if not samples or len(samples) < min_samples:
+            return None
+        rank = min(len(samples) - 1, int(round(percentile / 100 * (len(samples) - 1))))
+        return samples[rank]
+
+
+class HedgeBudget:
+    def __init__(self, max_per_minute: int) -> None:
+        """
+        Sliding one-minute budget bounding how many hedged requests may be fired.
+
+        Args:
+            max_per_minute (int): Maximum hedges in any 60 second window.
+        """
+        self.max_per_minute = max_per_minute
+        self._fired: Deque[float] = deque()
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            while self._fired and now - self._fired[0] > 60:
+                self._fired.popleft()
+            if len(self._fired) >= self.max_per_minute:
+                return False
+            self._fired.append(now)
+            return True
+
+
+async def hedged_request(
+    primary: Callable[[], Awaitable[Any]],
+    hedge: Callable[[], Awaitable[Any]],
+    hedge_after: Optional[float],
+    budget: HedgeBudget,
+) -> Dict[str, Any]:
+    """
+    Runs `primary`; if it has not finished after `hedge_after` seconds and the budget
+    allows it, also runs `hedge` and returns whichever succeeds first, cancelling the other.
+
+    Args:
+        primary (Callable): Starts the original request.
+        hedge (Callable): Starts the duplicate request.
+        hedge_after (float, optional): Seconds to wait before hedging, None to never hedge.
+        budget (HedgeBudget): Bounds the number of hedges per minute.
+
+    Returns:
+        dict: {"result": Any, "hedged": bool, "hedge_won": bool}
+
+    Raises:
+        Exception: The primary request's error if every request failed.
+    """
+    primary_task = asyncio.ensure_future(primary())
+    tasks = {primary_task}
+    try:
+        if hedge_after is not None:
+            done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+            if not done and budget.try_acquire():
+                tasks.add(asyncio.ensure_future(hedge()))
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                if task.exception() is None:
+                    return {
+                        "result": task.result(),
+                        "hedged": len(tasks) > 1,
+                        "hedge_won": task is not primary_task,
+                    }
+        raise primary_task.exception()
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
@@ -0,0 +1,625 @@
+"""
+Loads the schema catalog into the table and column collections.
+
+    python -m src.ingestion load [--schema-path PATH] [--embedding-batch-size 256]
+        [--insert-batch-size 1000] [--recreate]
+    python -m src.ingestion reindex [--old PATH] [--new PATH]
+        [--embedding-batch-size 256] [--insert-batch-size 1000]
+
+The catalog JSON ({table: {"tableDescription", "tableCluster", "columns": {column:
+{"type", "sampleValues", "columnDescription"}}}}, or a list of {"table_name", "ddl"}
+entries) is streamed table by table (with ijson when installed). Record ids are the
+table name and "<table>.<column>". List snapshots carry neither the cluster nor the
+columns; reindex keeps the stored values of the fields a snapshot does not have.
+
+load embeds every description in batches, inserts the records in chunks without
+flushing, flushes each collection once at the end and then builds its vector index.
+
+reindex compares two dated snapshots (SCHEMA_SNAPSHOT_DIR/<date>/SCHEMA_SNAPSHOT_FILE,
+by default the two latest) record by record with a content hash: new and changed
+records are upserted, records gone from the new snapshot are deleted. Only records
+whose description changed are re-embedded, the others keep their stored vector.
+"""
+
+import os
+import json
+import time
+import hashlib
+import argparse
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from config import get_milvus_config
+from src.types import TablesVectorRecord, ColumnsVectorRecord
+from src.adapters.loggingmanager import logger
+from src.adapters.milvusmanager import milvus_manager
+from src.adapters.columnstoremanager import column_store_manager
+from src.utils import get_embedding_manager
+
+TABLE_TEXT_FIELDS = [
+    "tableName",
+    "tableDescription",
+    "tableDDL",
+    "tableCluster",
+    "tableSampleValues",
+]
+COLUMN_TEXT_FIELDS = [
+    "tableName",
+    "columnName",
+    "columnDescription",
+    "columnDataType",
+    "columnSampleValue",
+]
+RECORD_FIELDS = {"table": TABLE_TEXT_FIELDS, "column": COLUMN_TEXT_FIELDS}
+
+
+def _collections() -> List[Tuple[str, str, type, List[str], str, List[str]]]:
+    """
+    (kind, collection name, record model, text fields, vector field, side store
+    fields) of the table and column collections. With COLUMN_SIDE_STORE the heavy
+    column fields go to the side store instead of Milvus.
+    """
+    milvus_config = get_milvus_config()
+    side_store_fields = (
+        milvus_config.COLUMN_SIDE_STORE_FIELDS
+        if milvus_config.COLUMN_SIDE_STORE
+        else []
+    )
+    return [
+        (
+            "table",
+            milvus_config.MILVUS_TABLE_COLLECTION_NAME,
+            TablesVectorRecord,
+            TABLE_TEXT_FIELDS,
+            "tableDescriptionEmbeddings",
+            [],
+        ),
+        (
+            "column",
+            milvus_config.MILVUS_COLUMN_COLLECTION_NAME,
+            ColumnsVectorRecord,
+            [field for field in COLUMN_TEXT_FIELDS if field not in side_store_fields],
+            "columnDescriptionEmbeddings",
+            side_store_fields,
+        ),
+    ]
+
+
+def iter_schema_catalog(schema_path: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Yields (table name, table info) from the catalog, parsing it incrementally with
+    ijson when available so large catalogs are never fully held in memory. List
+    snapshots ([{"table_name", "ddl", "example"}]) are mapped to table infos holding
+    only the fields the entry has (never tableCluster nor columns).
+    """
+    try:
+        import ijson
+    except ImportError:
+        ijson = None
+    with open(schema_path, "rb") as f:
+        is_list = f.read(64).lstrip().startswith(b"[")
+        f.seek(0)
+        if ijson is None:
+            catalog = json.load(f)
+            entries = catalog if is_list else catalog.items()
+        elif is_list:
+            entries = ijson.items(f, "item", use_float=True)
+        else:
+            entries = ijson.kvitems(f, "", use_float=True)
+        if not is_list:
+            yield from entries
+            return
+        for entry in entries:
+            if entry.get("table_name"):
+                yield entry["table_name"], {
+                    table_field: entry[entry_field]
+                    for entry_field, table_field in [
+                        ("description", "tableDescription"),
+                        ("ddl", "tableDDL"),
+                        ("example", "tableSampleValues"),
+                    ]
+                    if entry_field in entry
+                }
+
+
+def iter_schema_records(
+    schema_path: str,
+    keep_missing: bool = False,
+) -> Iterator[Tuple[str, Dict[str, str], Optional[str]]]:
+    """
+    Yields ("table" | "column", record fields without the embedding, text to embed)
+    for every table and column of the catalog.
+
+    With keep_missing, the table fields the catalog does not have are left out of the
+    record instead of defaulting to "" (the text is None when the description is
+    missing), so that reindex can keep the stored values.
+    """
+    for table_name, table_info in iter_schema_catalog(schema_path):
+        table_fields = {
+            "tableDescription": table_info.get("tableDescription", "") or "",
+            "tableDDL": table_info.get("tableDDL", "") or "",
+            "tableCluster": table_info.get("tableCluster", "") or "",
+            "tableSampleValues": str(table_info.get("tableSampleValues", "") or ""),
+        }
+        record = {
+            "id": table_name,
+            "tableName": table_name,
+            **{
+                field: value
+                for field, value in table_fields.items()
+                if not keep_missing or field in table_info
+            },
+        }
+        yield "table", record, record.get("tableDescription")
+        for column_name, column_info in (table_info.get("columns") or {}).items():
+            # Stray keys next to the columns (e.g. a misplaced tableDescription)
+            if not isinstance(column_info, dict):
+                continue
+            column_description = column_info.get("columnDescription", "") or ""
+            yield "column", {
+                "id": f"{table_name}.{column_name}",
+                "tableName": table_name,
+                "columnName": column_name,
+                "columnDescription": column_description,
+                "columnDataType": column_info.get("type", "") or "",
+                "columnSampleValue": str(column_info.get("sampleValues", "") or ""),
+            }, column_description
+
+
+def _hash(value: Any) -> str:
+    return hashlib.sha256(
+        json.dumps(value, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    ).hexdigest()
+
+
+def snapshot_hashes(
+    schema_path: Optional[str],
+) -> Dict[str, Dict[str, Tuple[str, str]]]:
+    """
+    Hashes every record of a snapshot.
+
+    Returns:
+        Dict[str, Dict[str, Tuple[str, str]]]: Per kind ("table" | "column"), the
+            (hash of the embedded text, hash of all the fields) of each record id.
+            Empty when there is no snapshot.
+    """
+    hashes = {"table": {}, "column": {}}
+    if not schema_path:
+        return hashes
+    for kind, record, text in iter_schema_records(schema_path, keep_missing=True):
+        hashes[kind][record["id"]] = (_hash(text), _hash(record))
+    return hashes
+
+
+def list_snapshots(snapshot_dir: str = None) -> List[str]:
+    """
+    Returns the snapshot files of SCHEMA_SNAPSHOT_DIR, oldest first (the dated folder
+    names sort chronologically).
+    """
+    milvus_config = get_milvus_config()
+    snapshot_dir = snapshot_dir or milvus_config.SCHEMA_SNAPSHOT_DIR
+    if not os.path.isdir(snapshot_dir):
+        return []
+    return [
+        os.path.join(snapshot_dir, name, milvus_config.SCHEMA_SNAPSHOT_FILE)
+        for name in sorted(os.listdir(snapshot_dir))
+        if os.path.isfile(
+            os.path.join(snapshot_dir, name, milvus_config.SCHEMA_SNAPSHOT_FILE)
+        )
+    ]
+
+
+def _snapshot_path(path: Optional[str]) -> Optional[str]:
+    if path and os.path.isdir(path):
+        return os.path.join(path, get_milvus_config().SCHEMA_SNAPSHOT_FILE)
+    return path
+
+
+class _CollectionLoader:
+    """
+    Buffers the records written to one collection: embeds them batch by batch and
+    inserts (or upserts) them in chunks, without flushing. Side store fields are
+    written to the column side store instead.
+    """
+
+    def __init__(
+        self,
+        collection_name: str,
+        record_model: type,
+        vector_field: str,
+        embedding_batch_size: int,
+        insert_batch_size: int,
+        transaction_id: str,
+        upsert: bool = False,
+        side_store_fields: List[str] = (),
+    ) -> None:
+        self.collection_name = collection_name
+        self.record_model = record_model
+        self.vector_field = vector_field
+        self.embedding_batch_size = embedding_batch_size
+        self.insert_batch_size = insert_batch_size
+        self.transaction_id = transaction_id
+        self.upsert = upsert
+        self.side_store_fields = list(side_store_fields)
+        self.side_records: List[Dict[str, Any]] = []
+        self.embedding_manager = get_embedding_manager()
+        self.pending: List[Tuple[Dict[str, str], str]] = []
+        self.to_insert: List[Dict[str, Any]] = []
+        self.records = 0
+        self.embedded = 0
+        self.embedding_time = 0.0
+        self.insert_time = 0.0
+        self.embedding_tokens = 0
+
+    def add(self, record: Dict[str, str], text: str) -> None:
+        self.pending.append((record, text))
+        if len(self.pending) >= self.embedding_batch_size:
+            self._embed()
+
+    def add_embedded(self, record: Dict[str, str], embedding: List[float]) -> None:
+        data = self.record_model(
+            **record, **{self.vector_field: embedding}
+        ).model_dump()
+        if self.side_store_fields:
+            self.side_records.append(
+                {
+                    "id": data["id"],
+                    **{field: data.pop(field) for field in self.side_store_fields},
+                }
+            )
+        self.to_insert.append(data)
+        if len(self.to_insert) >= self.insert_batch_size:
+            self._insert()
+
+    def _embed(self) -> None:
+        if not self.pending:
+            return
+        embedding_time, embedding_response = self.embedding_manager.create_embeddings(
+            texts=[text or record["id"] for record, text in self.pending],
+            transaction_id=self.transaction_id,
+        )
+        self.embedding_time += embedding_time
+        self.embedding_tokens += embedding_response.usage.total_tokens
+        self.embedded += len(self.pending)
+        pending, self.pending = self.pending, []
+        for (record, _), embedding in zip(
+            pending, embedding_response.embeddings.tolist()
+        ):
+            self.add_embedded(record, embedding)
+
+    def _insert(self) -> None:
+        if self.side_records:
+            column_store_manager.upsert(self.transaction_id, self.side_records)
+            self.side_records = []
+        write = (
+            milvus_manager.upsert_data if self.upsert else milvus_manager.insert_data
+        )
+        while self.to_insert:
+            chunk = self.to_insert[: self.insert_batch_size]
+            self.to_insert = self.to_insert[self.insert_batch_size :]
+            insert_time, _ = write(
+                transaction_id=self.transaction_id,
+                collection_name=self.collection_name,
+                data=chunk,
+            )
+            self.insert_time += insert_time
+            self.records += len(chunk)
+
+    def finish(self) -> None:
+        self._embed()
+        self._insert()
+
+
+def ingest_schema(
+    schema_path: str = None,
+    embedding_batch_size: int = 256,
+    insert_batch_size: int = 1000,
+    recreate: bool = False,
+    transaction_id: str = "ingestion",
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Loads the schema catalog into the table and column collections.
+
+    Args:
+        schema_path (str, optional): The catalog JSON. Defaults to SCHEMA_CATALOG_PATH.
+        embedding_batch_size (int): Descriptions per embedding request.
+        insert_batch_size (int): Records per Milvus insert.
+        recreate (bool): Drop and recreate the collections first.
+        transaction_id (str): The ID of the transaction, used in logs.
+
+    Returns:
+        Dict[str, Dict[str, Any]]: Per collection, the records loaded, the time spent
+            embedding, inserting, flushing and indexing, and the records per second
+            of that time (the collections are loaded interleaved, so each rate only
+            counts the work done for its own collection).
+    """
+    loaders = {}
+    for (
+        kind,
+        collection_name,
+        record_model,
+        text_fields,
+        vector_field,
+        side_store_fields,
+    ) in _collections():
+        milvus_manager.ensure_collection(
+            transaction_id,
+            collection_name,
+            text_fields=text_fields,
+            vector_field=vector_field,
+            recreate=recreate,
+        )
+        loaders[kind] = _CollectionLoader(
+            collection_name=collection_name,
+            record_model=record_model,
+            vector_field=vector_field,
+            embedding_batch_size=embedding_batch_size,
+            insert_batch_size=insert_batch_size,
+            transaction_id=transaction_id,
+            side_store_fields=side_store_fields,
+        )
+
+    for kind, record, text in iter_schema_records(
+        schema_path or get_milvus_config().SCHEMA_CATALOG_PATH
+    ):
+        loaders[kind].add(record, text)
+
+    report = {}
+    for loader in loaders.values():
+        loader.finish()
+        flush_start = time.time()
+        milvus_manager.flush(transaction_id, loader.collection_name)
+        flush_time = time.time() - flush_start
+        index_time, _ = milvus_manager.create_index(
+            transaction_id, loader.collection_name, loader.vector_field
+        )
+        total_time = (
+            loader.embedding_time + loader.insert_time + flush_time + index_time
+        )
+        report[loader.collection_name] = {
+            "records": loader.records,
+            "embedding_tokens": loader.embedding_tokens,
+            "embedding_time": round(loader.embedding_time, 3),
+            "insert_time": round(loader.insert_time, 3),
+            "flush_time": round(flush_time, 3),
+            "index_time": round(index_time, 3),
+            "records_per_second": round(loader.records / (total_time or 1), 1),
+        }
+        logger.info(
+            f"[ingestion][ingest_schema][{transaction_id}] - {loader.collection_name}: {report[loader.collection_name]}"
+        )
+    return report
+
+
+def _add_partial_records(
+    loader: "_CollectionLoader",
+    fields: List[str],
+    records: List[Tuple[Dict[str, str], Optional[str]]],
+    stored_vectors: Dict[str, Any],
+    transaction_id: str,
+) -> None:
+    """
+    Adds records the snapshot does not fully describe (list snapshots have no
+    tableCluster): the missing fields are read from the stored records, and so is
+    the vector when the description is missing or unchanged, so the upsert does not
+    overwrite them. Records not stored yet get empty fields and are embedded.
+    """
+    missing_fields = sorted(
+        {field for record, _ in records for field in fields if field not in record}
+    )
+    stored = milvus_manager.get_by_ids(
+        transaction_id,
+        loader.collection_name,
+        [record["id"] for record, _ in records],
+        output_fields=missing_fields + [loader.vector_field],
+    )
+    for record, text in records:
+        stored_record = stored.get(record["id"], {})
+        for field in fields:
+            if field not in record:
+                record[field] = stored_record.get(field, "") or ""
+        if stored_record and (text is None or record["id"] in stored_vectors):
+            loader.add_embedded(record, stored_record[loader.vector_field])
+        else:
+            loader.add(record, text or "")
+
+
+def reindex_schema(
+    old_schema_path: Optional[str],
+    new_schema_path: str,
+    embedding_batch_size: int = 256,
+    insert_batch_size: int = 1000,
+    transaction_id: str = "ingestion",
+) -> Dict[str, Dict[str, int]]:
+    """
+    Applies the difference between two schema snapshots to the table and column
+    collections: upserts the new and changed records, deletes the removed ones.
+
+    Args:
+        old_schema_path (str, optional): The snapshot the collections were built from.
+            None upserts every record of the new snapshot.
+        new_schema_path (str): The snapshot to bring the collections to.
+        embedding_batch_size (int): Descriptions per embedding request.
+        insert_batch_size (int): Records per Milvus upsert.
+        transaction_id (str): The ID of the transaction, used in logs.
+
+    Returns:
+        Dict[str, Dict[str, int]]: Per collection, the records upserted, re-embedded,
+            deleted and unchanged.
+    """
+    old_hashes = snapshot_hashes(old_schema_path)
+    new_hashes = snapshot_hashes(new_schema_path)
+    loaders = {}
+    reused_ids = {}
+    for (
+        kind,
+        collection_name,
+        record_model,
+        text_fields,
+        vector_field,
+        side_store_fields,
+    ) in _collections():
+        milvus_manager.ensure_collection(
+            transaction_id,
+            collection_name,
+            text_fields=text_fields,
+            vector_field=vector_field,
+        )
+        loaders[kind] = _CollectionLoader(
+            collection_name=collection_name,
+            record_model=record_model,
+            vector_field=vector_field,
+            embedding_batch_size=embedding_batch_size,
+            insert_batch_size=insert_batch_size,
+            transaction_id=transaction_id,
+            upsert=True,
+            side_store_fields=side_store_fields,
+        )
+        # Records whose fields changed but not their embedded text keep their vector
+        reused_ids[kind] = [
+            record_id
+            for record_id, (text_hash, record_hash) in new_hashes[kind].items()
+            if record_id in old_hashes[kind]
+            and old_hashes[kind][record_id][0] == text_hash
+            and old_hashes[kind][record_id][1] != record_hash
+        ]
+
+    stored_vectors = {}
+    for kind, loader in loaders.items():
+        stored_vectors[kind] = {}
+        for start in range(0, len(reused_ids[kind]), insert_batch_size):
+            records = milvus_manager.get_by_ids(
+                transaction_id,
+                loader.collection_name,
+                reused_ids[kind][start : start + insert_batch_size],
+                output_fields=[loader.vector_field],
+            )
+            for record_id, record in records.items():
+                stored_vectors[kind][record_id] = record[loader.vector_field]
+
+    partial_records = {kind: [] for kind in loaders}
+    for kind, record, text in iter_schema_records(new_schema_path, keep_missing=True):
+        if old_hashes[kind].get(record["id"]) == new_hashes[kind][record["id"]]:
+            continue
+        if any(field not in record for field in RECORD_FIELDS[kind]):
+            partial_records[kind].append((record, text))
+            if len(partial_records[kind]) >= insert_batch_size:
+                _add_partial_records(
+                    loaders[kind],
+                    RECORD_FIELDS[kind],
+                    partial_records[kind],
+                    stored_vectors[kind],
+                    transaction_id,
+                )
+                partial_records[kind] = []
+        elif record["id"] in stored_vectors[kind]:
+            loaders[kind].add_embedded(record, stored_vectors[kind][record["id"]])
+        else:
+            loaders[kind].add(record, text)
+    for kind, records in partial_records.items():
+        if records:
+            _add_partial_records(
+                loaders[kind],
+                RECORD_FIELDS[kind],
+                records,
+                stored_vectors[kind],
+                transaction_id,
+            )
+
+    report = {}
+    for kind, loader in loaders.items():
+        loader.finish()
+        removed_ids = [
+            record_id
+            for record_id in old_hashes[kind]
+            if record_id not in new_hashes[kind]
+        ]
+        deleted = 0
+        for start in range(0, len(removed_ids), insert_batch_size):
+            deleted += milvus_manager.delete_data(
+                transaction_id,
+                loader.collection_name,
+                removed_ids[start : start + insert_batch_size],
+            )
+        if loader.side_store_fields and removed_ids:
+            column_store_manager.delete(transaction_id, removed_ids)
+        if loader.records or deleted:
+            milvus_manager.flush(transaction_id, loader.collection_name)
+        report[loader.collection_name] = {
+            "upserted": loader.records,
+            "embedded": loader.embedded,
+            "deleted": deleted,
+            "unchanged": len(new_hashes[kind]) - loader.records,
+        }
+        logger.info(
+            f"[ingestion][reindex_schema][{transaction_id}] - {loader.collection_name}: {report[loader.collection_name]}"
+        )
+
+    milvus_config = get_milvus_config()
+    if (
+        milvus_config.RETRIEVAL_BACKEND == "local"
+        and milvus_config.LOCAL_VECTOR_SYNC_SOURCE == "milvus"
+    ):
+        from src.adapters.localvectormanager import local_vector_manager
+
+        for loader in loaders.values():
+            local_vector_manager.sync_from_milvus(
+                transaction_id, loader.collection_name
+            )
+    return report
+
+
+def main() -> None:
+    milvus_config = get_milvus_config()
+    parser = argparse.ArgumentParser(prog="python -m src.ingestion")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    load_parser = subparsers.add_parser(
+        "load", help="Bulk load the schema catalog into the vector collections"
+    )
+    load_parser.add_argument("--schema-path", default=milvus_config.SCHEMA_CATALOG_PATH)
+    load_parser.add_argument("--recreate", action="store_true")
+    reindex_parser = subparsers.add_parser(
+        "reindex", help="Apply the changes between two schema snapshots"
+    )
+    reindex_parser.add_argument(
+        "--old",
+        help="Snapshot file or dated folder the collections were built from. "
+        "Defaults to the second latest snapshot of SCHEMA_SNAPSHOT_DIR.",
+    )
+    reindex_parser.add_argument(
+        "--new",
+        help="Snapshot file or dated folder to apply. "
+        "Defaults to the latest snapshot of SCHEMA_SNAPSHOT_DIR.",
+    )
+    for subparser in (load_parser, reindex_parser):
+        subparser.add_argument("--embedding-batch-size", type=int, default=256)
+        subparser.add_argument("--insert-batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    if args.command == "load":
+        report = ingest_schema(
+            schema_path=args.schema_path,
+            embedding_batch_size=args.embedding_batch_size,
+            insert_batch_size=args.insert_batch_size,
+            recreate=args.recreate,
+        )
+    else:
+        snapshots = list_snapshots()
+        new_schema_path = _snapshot_path(args.new) or (
+            snapshots[-1] if snapshots else None
+        )
+        if not new_schema_path:
+            parser.error(f"No snapshot in {milvus_config.SCHEMA_SNAPSHOT_DIR}")
+        old_schema_path = _snapshot_path(args.old)
+        if old_schema_path is None and args.new is None and len(snapshots) > 1:
+            old_schema_path = snapshots[-2]
+        report = reindex_schema(
+            old_schema_path=old_schema_path,
+            new_schema_path=new_schema_path,
+            embedding_batch_size=args.embedding_batch_size,
+            insert_batch_size=args.insert_batch_size,
+        )
+    for collection_name, stats in report.items():
+        print(collection_name, json.dumps(stats))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import base64
+import numpy as np
+from typing import Any, NamedTuple, Union
+
+
+class TokenUsage(NamedTuple):
+    """
+    Token usage of an LLM call.
+
+    Attributes:
+        prompt_tokens (int): Tokens of the prompt / embedded inputs.
+        completion_tokens (int): Tokens generated.
+        total_tokens (int): Billed tokens.
+    """
+
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    total_tokens: int = 0
+
+    @classmethod
+    def from_response(cls, response: Any) -> "TokenUsage":
+        usage = getattr(response, "usage", None)
+        if usage is None:
+            return cls()
+        return cls(
+            prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+            completion_tokens=getattr(usage, "completion_tokens", 0) or 0,
+            total_tokens=getattr(usage, "total_tokens", 0) or 0,
+        )
+
+
+class ChatCompletionResult(NamedTuple):
+    """
+    What the pipeline reads from a chat completion.
+
+    Attributes:
+        content (str): The message content of the first choice.
+        usage (TokenUsage): Token usage of the call.
+        model (str): The model that answered.
+        queue_wait_time (float): Seconds spent queued in the client-side rate limiter.
+        hedged (bool): A hedge request was fired.
+    """
+
+    content: str
+    usage: TokenUsage
+    model: str = ""
+    queue_wait_time: float = 0
+    hedged: bool = False
+
+    @classmethod
+    def from_response(
+        cls, response: Any, queue_wait_time: float = 0, hedged: bool = False
+    ) -> "ChatCompletionResult":
+        return cls(
+            content=response.choices[0].message.content or "",
+            usage=TokenUsage.from_response(response),
+            model=getattr(response, "model", "") or "",
+            queue_wait_time=queue_wait_time,
+            hedged=hedged,
+        )
+
+
+class EmbeddingResult(NamedTuple):
+    """
+    The embedding of a single text.
+
+    Attributes:
+        embedding (np.ndarray): float32 vector; call .tolist() where a list is needed.
+        usage (TokenUsage): Token usage of the call.
+        queue_wait_time (float): Seconds spent queued in the client-side rate limiter.
+    """
+
+    embedding: np.ndarray
+    usage: TokenUsage
+    queue_wait_time: float = 0
+
+    @classmethod
+    def from_response(
+        cls, response: Any, queue_wait_time: float = 0
+    ) -> "EmbeddingResult":
+        return cls(
+            embedding=decode_embedding(response.data[0].embedding),
+            usage=TokenUsage.from_response(response),
+            queue_wait_time=queue_wait_time,
+        )
+
+
+class EmbeddingBatchResult(NamedTuple):
+    """
+    The embeddings of a list of texts.
+
+    Attributes:
+        embeddings (np.ndarray): float32 matrix with one row per input text, in order.
+        usage (TokenUsage): Token usage summed over the requests.
+        queue_wait_time (float): Seconds spent queued in the client-side rate limiter.
+    """
+
+    embeddings: np.ndarray
+    usage: TokenUsage
+    queue_wait_time: float = 0
+
+
+def decode_embedding(embedding: Union[str, list]) -> np.ndarray:
+    """
+    Converts an embedding of an API response to a float32 vector: base64 payloads
+    (encoding_format="base64") are read in place, float lists are copied once.
+    """
+    if isinstance(embedding, str):
+        return np.frombuffer(base64.b64decode(embedding), dtype=np.float32)
+    return np.asarray(embedding, dtype=np.float32)
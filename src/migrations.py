@@ -0,0 +1,655 @@
+"""
+One-off maintenance jobs on the vector store.
+
+    python -m src.migrations reembed [--provider ollama] [--collections NAME ...]
+        [--batch-size 256] [--drop-old]
+    python -m src.migrations sync-local [--source milvus|schema] [--schema-path PATH]
+    python -m src.migrations fit-pca [--dim 512] [--collections NAME ...]
+    python -m src.migrations rebuild-index --index-type IVF_SQ8 [--collections NAME ...]
+    python -m src.migrations partition-sql-examples [--drop-old] [--shared-tenants ID ...] [--share-all]
+    python -m src.migrations seed-sql-examples --path FILE [--tenant ID]
+    python -m src.migrations fill-column-store [--source milvus|schema] [--schema-path PATH]
+
+reembed recomputes the embeddings of the table, column and SQL example collections
+with the EMBEDDING_PROVIDER (or --provider) model. The records are copied into a new
+collection with the dimension of the new model, indexed, and swapped in under the
+original name; the old collection is kept as "<name>_backup_<timestamp>" unless
+--drop-old is given. Set MILVUS_VECTOR_DIM to the printed dimension afterwards.
+
+sync-local rebuilds the files of the in-process table and column index used with
+RETRIEVAL_BACKEND=local, from Milvus or by embedding the schema catalog file.
+
+fit-pca fits the EMBEDDING_REDUCTION=pca projection on the full-dimension vectors of
+the collections and saves it to EMBEDDING_PCA_PATH; reembed then stores the reduced
+vectors. rebuild-index replaces the vector index of the collections (e.g. with
+IVF_SQ8 or IVF_PQ) without re-embedding.
+
+partition-sql-examples moves the SQL example collection to a tenantID partition key
+(MILVUS_SQL_EXAMPLE_NUM_PARTITIONS partitions), keeping the stored vectors. Searches
+then only see the tenant's examples and the MILVUS_SQL_EXAMPLE_GLOBAL_TENANT ones, so
+examples without a tenantID, those of --shared-tenants, or all of them with
+--share-all (what every tenant saw before) are moved to the global tenant. It can be
+run again on a partitioned collection to share more examples.
+
+seed-sql-examples embeds and inserts a JSON list of {"question", "sqlQuery"} examples,
+for the global tenant unless --tenant is given.
+
+fill-column-store writes the description, data type and sample values of every
+column to the COLUMN_SIDE_STORE SQLite store, from the column collection (before it
+is reloaded without them) or from the schema catalog file.
+"""
+
+import json
+import time
+import argparse
+import numpy as np
+from typing import Any, Dict, List
+from config import get_milvus_config, get_openai_config
+from src.adapters.loggingmanager import logger
+from src.adapters.milvusmanager import milvus_manager
+from src.adapters.localvectormanager import local_vector_manager
+from src.adapters.columnstoremanager import column_store_manager
+from src.utils import get_embedding_manager, bulk_insert_into_vector_db
+from src.vector_compression import PCAReducer
+
+# Text field each collection's vector field is computed from
+EMBEDDED_FIELDS = {
+    "tableDescriptionEmbeddings": "tableDescription",
+    "columnDescriptionEmbeddings": "columnDescription",
+    "questionEmbeddings": "question",
+}
+
+
+def _vector_field(schema: Dict[str, Any]) -> Dict[str, Any]:
+    for field in schema["fields"]:
+        if field["name"] in EMBEDDED_FIELDS:
+            return field
+    raise ValueError(
+        f"Collection {schema.get('collection_name')} has none of the embedded fields {list(EMBEDDED_FIELDS)}"
+    )
+
+
+def _copy_schema(
+    schema: Dict[str, Any], vector_field: str, dim: int, partition_key: str = None
+):
+    """
+    Builds the schema of a migrated collection: the same fields as `schema`, with
+    the dimension of `vector_field` set to `dim` (and `partition_key` made the
+    partition key).
+    """
+    new_schema = milvus_manager.milvus_client.create_schema(
+        auto_id=schema.get("auto_id", False),
+        enable_dynamic_field=schema.get("enable_dynamic_field", False),
+    )
+    for field in schema["fields"]:
+        params = dict(field.get("params", {}))
+        if field["name"] == vector_field:
+            params["dim"] = dim
+        new_schema.add_field(
+            field_name=field["name"],
+            datatype=field["type"],
+            is_primary=field.get("is_primary", False),
+            auto_id=field.get("auto_id", False),
+            is_partition_key=field.get("is_partition_key", False)
+            or field["name"] == partition_key,
+            **params,
+        )
+    return new_schema
+
+
+def _swap_in(
+    collection_name: str,
+    new_collection_name: str,
+    vector_field: str,
+    drop_old: bool,
+    transaction_id: str,
+) -> str:
+    """
+    Flushes and indexes the migrated collection and renames it to `collection_name`.
+
+    Returns:
+        str: The name the old collection was kept under, None if it was dropped.
+    """
+    client = milvus_manager.milvus_client
+    milvus_manager.flush(transaction_id, new_collection_name)
+    milvus_manager.create_index(transaction_id, new_collection_name, vector_field)
+
+    backup_name = None
+    if drop_old:
+        client.drop_collection(collection_name=collection_name)
+    else:
+        backup_name = f"{collection_name}_backup_{int(time.time())}"
+        client.rename_collection(old_name=collection_name, new_name=backup_name)
+    client.rename_collection(old_name=new_collection_name, new_name=collection_name)
+    client.load_collection(collection_name=collection_name)
+    milvus_manager.invalidate_collection_cache(collection_name)
+    return backup_name
+
+
+def reembed_collection(
+    collection_name: str,
+    provider: str = None,
+    batch_size: int = 256,
+    drop_old: bool = False,
+    transaction_id: str = "migration",
+) -> Dict[str, Any]:
+    """
+    Re-embeds every record of a collection and swaps the result in under its name.
+
+    Args:
+        collection_name (str): The collection to migrate.
+        provider (str, optional): openai or ollama. Defaults to EMBEDDING_PROVIDER.
+        batch_size (int): Records read, embedded and inserted at a time.
+        drop_old (bool): Drop the old collection instead of keeping a backup.
+        transaction_id (str): The ID of the transaction, used in logs.
+
+    Returns:
+        Dict[str, Any]: The collection, records migrated, new dimension and backup name.
+    """
+    client = milvus_manager.milvus_client
+    embedding_manager = get_embedding_manager(provider)
+    schema = client.describe_collection(collection_name=collection_name)
+    vector_field = _vector_field(schema)["name"]
+    text_field = EMBEDDED_FIELDS[vector_field]
+    # Auto generated primary keys are assigned again by the new collection
+    skipped_fields = {
+        field["name"]
+        for field in schema["fields"]
+        if field.get("is_primary") and field.get("auto_id")
+    }
+    output_fields = [
+        field["name"]
+        for field in schema["fields"]
+        if field["name"] != vector_field and field["name"] not in skipped_fields
+    ]
+    new_collection_name = f"{collection_name}_reembed_{int(time.time())}"
+
+    client.load_collection(collection_name=collection_name)
+    iterator = client.query_iterator(
+        collection_name=collection_name,
+        batch_size=batch_size,
+        output_fields=output_fields,
+    )
+    migrated = 0
+    dim = None
+    start_time = time.time()
+    try:
+        while True:
+            records = iterator.next()
+            if not records:
+                break
+            _, embedding_response = embedding_manager.create_embeddings(
+                texts=[record[text_field] for record in records],
+                transaction_id=transaction_id,
+            )
+            embeddings = embedding_response.embeddings.tolist()
+            if dim is None:
+                dim = len(embeddings[0])
+                client.create_collection(
+                    collection_name=new_collection_name,
+                    schema=_copy_schema(schema, vector_field, dim),
+                )
+            data: List[Dict[str, Any]] = [
+                {**record, vector_field: embedding}
+                for record, embedding in zip(records, embeddings)
+            ]
+            for record in data:
+                for field in skipped_fields:
+                    record.pop(field, None)
+            client.insert(collection_name=new_collection_name, data=data)
+            migrated += len(data)
+            logger.info(
+                f"[migrations][reembed_collection][{transaction_id}] - {collection_name}: {migrated} records re-embedded"
+            )
+    finally:
+        iterator.close()
+    if dim is None:
+        logger.info(
+            f"[migrations][reembed_collection][{transaction_id}] - {collection_name} is empty, nothing to migrate"
+        )
+        return {"collection": collection_name, "records": 0}
+
+    backup_name = _swap_in(
+        collection_name, new_collection_name, vector_field, drop_old, transaction_id
+    )
+    logger.info(
+        f"[migrations][reembed_collection][{transaction_id}] - {collection_name}: {migrated} records re-embedded with dimension {dim} in {time.time() - start_time:.1f}s (backup: {backup_name})"
+    )
+    return {
+        "collection": collection_name,
+        "records": migrated,
+        "dim": dim,
+        "backup": backup_name,
+    }
+
+
+def _shared_examples_filter(shared_tenants: List[str], share_all: bool) -> str:
+    """
+    Returns the filter of the SQL examples to move to the global tenant: the ones
+    without a tenantID and those of `shared_tenants`, or all of them.
+    """
+    global_tenant = get_milvus_config().MILVUS_SQL_EXAMPLE_GLOBAL_TENANT
+    if share_all:
+        return f"tenantID != {json.dumps(global_tenant)}"
+    return f"tenantID in {json.dumps(['', *(shared_tenants or [])])}"
+
+
+def share_sql_examples(
+    collection_name: str,
+    shared_tenants: List[str] = None,
+    share_all: bool = False,
+    transaction_id: str = "migration",
+) -> int:
+    """
+    Moves SQL examples of a partitioned collection to the global tenant. The
+    partition key can not be updated in place, so the records are inserted again
+    with the global tenantID and the originals deleted.
+
+    Returns:
+        int: The number of examples moved.
+    """
+    milvus_config = get_milvus_config()
+    schema = milvus_manager.milvus_client.describe_collection(
+        collection_name=collection_name
+    )
+    primary = next(field for field in schema["fields"] if field.get("is_primary"))
+    records = milvus_manager.query_all(
+        transaction_id,
+        collection_name,
+        output_fields=[field["name"] for field in schema["fields"]],
+        filter=_shared_examples_filter(shared_tenants, share_all),
+    )
+    if not records:
+        return 0
+    ids = [record[primary["name"]] for record in records]
+    for record in records:
+        record["tenantID"] = milvus_config.MILVUS_SQL_EXAMPLE_GLOBAL_TENANT
+        if primary.get("auto_id"):
+            record.pop(primary["name"])
+    if primary.get("auto_id"):
+        milvus_manager.insert_data(transaction_id, collection_name, records)
+        milvus_manager.delete_data(transaction_id, collection_name, ids)
+    else:
+        # Same primary keys: delete first so the new rows are not deleted with them
+        milvus_manager.delete_data(transaction_id, collection_name, ids)
+        milvus_manager.insert_data(transaction_id, collection_name, records)
+    milvus_manager.flush(transaction_id, collection_name)
+    logger.info(
+        f"[migrations][share_sql_examples][{transaction_id}] - {len(records)} examples of {collection_name} moved to the global tenant"
+    )
+    return len(records)
+
+
+def partition_sql_examples(
+    collection_name: str = None,
+    batch_size: int = 1000,
+    drop_old: bool = False,
+    shared_tenants: List[str] = None,
+    share_all: bool = False,
+    transaction_id: str = "migration",
+) -> Dict[str, Any]:
+    """
+    Copies the SQL example collection (vectors included) into a collection with
+    tenantID as partition key, so a tenant filter only reads the matching partitions,
+    and swaps it in under its name. A missing collection is created partitioned.
+
+    Examples without a tenantID and those of `shared_tenants` (all of them with
+    `share_all`) are given the MILVUS_SQL_EXAMPLE_GLOBAL_TENANT tenant, which every
+    tenant's search reads; on an already partitioned collection they are moved there.
+
+    Returns:
+        Dict[str, Any]: The collection, records copied, examples shared and backup name.
+    """
+    milvus_config = get_milvus_config()
+    collection_name = (
+        collection_name or milvus_config.MILVUS_SQL_EXAMPLE_COLLECTION_NAME
+    )
+    global_tenant = milvus_config.MILVUS_SQL_EXAMPLE_GLOBAL_TENANT
+    shared = {"", *(shared_tenants or [])}
+    client = milvus_manager.milvus_client
+    if not milvus_manager.check_collection_exists(
+        transaction_id, collection_name, use_cache=False
+    ):
+        milvus_manager.ensure_collection(
+            transaction_id,
+            collection_name,
+            text_fields=["tenantID", "question", "sqlQuery"],
+            vector_field="questionEmbeddings",
+            auto_id=True,
+            partition_key_field="tenantID",
+            num_partitions=milvus_config.MILVUS_SQL_EXAMPLE_NUM_PARTITIONS,
+        )
+        milvus_manager.create_index(
+            transaction_id, collection_name, "questionEmbeddings"
+        )
+        return {"collection": collection_name, "records": 0, "created": True}
+
+    schema = client.describe_collection(collection_name=collection_name)
+    if any(
+        field["name"] == "tenantID" and field.get("is_partition_key")
+        for field in schema["fields"]
+    ):
+        return {
+            "collection": collection_name,
+            "records": 0,
+            "partitioned": True,
+            "shared": share_sql_examples(
+                collection_name, shared_tenants, share_all, transaction_id
+            ),
+        }
+    vector = _vector_field(schema)
+    skipped_fields = {
+        field["name"]
+        for field in schema["fields"]
+        if field.get("is_primary") and field.get("auto_id")
+    }
+    new_collection_name = f"{collection_name}_partitioned_{int(time.time())}"
+    client.create_collection(
+        collection_name=new_collection_name,
+        schema=_copy_schema(
+            schema,
+            vector["name"],
+            vector.get("params", {}).get("dim", milvus_config.MILVUS_VECTOR_DIM),
+            partition_key="tenantID",
+        ),
+        num_partitions=milvus_config.MILVUS_SQL_EXAMPLE_NUM_PARTITIONS,
+    )
+    client.load_collection(collection_name=collection_name)
+    iterator = client.query_iterator(
+        collection_name=collection_name,
+        batch_size=batch_size,
+        output_fields=[
+            field["name"]
+            for field in schema["fields"]
+            if field["name"] not in skipped_fields
+        ],
+    )
+    copied, shared_count = 0, 0
+    try:
+        while True:
+            records = iterator.next()
+            if not records:
+                break
+            for record in records:
+                for field in skipped_fields:
+                    record.pop(field, None)
+                if record.get("tenantID") != global_tenant and (
+                    share_all or (record.get("tenantID") or "") in shared
+                ):
+                    record["tenantID"] = global_tenant
+                    shared_count += 1
+            client.insert(collection_name=new_collection_name, data=records)
+            copied += len(records)
+    finally:
+        iterator.close()
+    backup_name = _swap_in(
+        collection_name, new_collection_name, vector["name"], drop_old, transaction_id
+    )
+    logger.info(
+        f"[migrations][partition_sql_examples][{transaction_id}] - {collection_name}: {copied} records copied into a tenantID partitioned collection, {shared_count} moved to the global tenant (backup: {backup_name})"
+    )
+    return {
+        "collection": collection_name,
+        "records": copied,
+        "shared": shared_count,
+        "backup": backup_name,
+    }
+
+
+def seed_sql_examples(
+    path: str, tenant_id: str = None, batch_size: int = 500
+) -> Dict[str, Any]:
+    """
+    Embeds and inserts the question / SQL examples of a JSON file (a list of
+    {"question", "sqlQuery"} items) for a tenant, the global tenant by default.
+
+    Returns:
+        Dict[str, Any]: The tenant and the number of examples inserted.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        examples = json.load(f)
+    tenant_id = tenant_id or get_milvus_config().MILVUS_SQL_EXAMPLE_GLOBAL_TENANT
+    inserted = 0
+    for start in range(0, len(examples), batch_size):
+        inserted += bulk_insert_into_vector_db(
+            transaction_id="migration",
+            tennant_id=tenant_id,
+            examples=examples[start : start + batch_size],
+        )["insert_count"]
+    return {"tenant": tenant_id, "examples": inserted}
+
+
+def fill_column_store(
+    source: str = "milvus", schema_path: str = None, transaction_id: str = "migration"
+) -> Dict[str, Any]:
+    """
+    Writes the side store fields of every column from the column collection
+    (source="milvus") or from the schema catalog (source="schema").
+
+    Returns:
+        Dict[str, Any]: The source and the number of columns written.
+    """
+    milvus_config = get_milvus_config()
+    if source == "schema":
+        from src.ingestion import iter_schema_records
+
+        records = [
+            record
+            for kind, record, _ in iter_schema_records(
+                schema_path or milvus_config.SCHEMA_CATALOG_PATH
+            )
+            if kind == "column"
+        ]
+    else:
+        records = milvus_manager.query_all(
+            transaction_id,
+            milvus_config.MILVUS_COLUMN_COLLECTION_NAME,
+            output_fields=["tableName", "columnName"]
+            + milvus_config.COLUMN_SIDE_STORE_FIELDS,
+        )
+        # The primary key of older collections is not "<table>.<column>"
+        for record in records:
+            record.pop("id", None)
+    written = 0
+    for start in range(0, len(records), 1000):
+        written += column_store_manager.upsert(
+            transaction_id, records[start : start + 1000]
+        )
+    return {"source": source, "columns": written}
+
+
+def fit_pca(
+    collection_names: List[str],
+    dim: int,
+    path: str = None,
+    transaction_id: str = "migration",
+) -> Dict[str, Any]:
+    """
+    Fits the PCA projection of EMBEDDING_REDUCTION=pca on the stored vectors of the
+    collections (which must still be at full dimension) and saves it.
+
+    Returns:
+        Dict[str, Any]: The path, the number of vectors fitted and the dimensions.
+    """
+    path = path or get_openai_config().EMBEDDING_PCA_PATH
+    vectors = []
+    for collection_name in collection_names:
+        schema = milvus_manager.milvus_client.describe_collection(
+            collection_name=collection_name
+        )
+        vector_field = _vector_field(schema)["name"]
+        vectors.extend(
+            record[vector_field]
+            for record in milvus_manager.query_all(
+                transaction_id, collection_name, output_fields=[vector_field]
+            )
+        )
+    vectors = np.asarray(vectors, dtype=np.float32)
+    reducer = PCAReducer.fit(vectors, dim)
+    reducer.save(path)
+    logger.info(
+        f"[migrations][fit_pca][{transaction_id}] - {dim} components fitted on {vectors.shape[0]} vectors, saved to {path}"
+    )
+    return {"path": path, "vectors": int(vectors.shape[0]), "dim": dim}
+
+
+def rebuild_index(
+    collection_name: str, index_type: str, transaction_id: str = "migration"
+) -> Dict[str, Any]:
+    """
+    Drops the vector index of a collection and builds an index of `index_type` with
+    the MILVUS_INDEX_PARAMS of that type.
+    """
+    client = milvus_manager.milvus_client
+    vector_field = _vector_field(
+        client.describe_collection(collection_name=collection_name)
+    )["name"]
+    client.release_collection(collection_name=collection_name)
+    for index_name in client.list_indexes(collection_name=collection_name):
+        client.drop_index(collection_name=collection_name, index_name=index_name)
+    index_time, _ = milvus_manager.create_index(
+        transaction_id, collection_name, vector_field, index_type=index_type
+    )
+    return {
+        "collection": collection_name,
+        "index_type": index_type,
+        "index_time": round(index_time, 3),
+    }
+
+
+def main() -> None:
+    milvus_config = get_milvus_config()
+    parser = argparse.ArgumentParser(prog="python -m src.migrations")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    reembed_parser = subparsers.add_parser(
+        "reembed", help="Recompute the embeddings of the vector collections"
+    )
+    reembed_parser.add_argument(
+        "--provider",
+        choices=["openai", "ollama"],
+        default=get_openai_config().EMBEDDING_PROVIDER,
+    )
+    all_collections = [
+        collection_name
+        for collection_name in [
+            milvus_config.MILVUS_TABLE_COLLECTION_NAME,
+            milvus_config.MILVUS_COLUMN_COLLECTION_NAME,
+            milvus_config.MILVUS_SQL_EXAMPLE_COLLECTION_NAME,
+        ]
+        if collection_name
+    ]
+    reembed_parser.add_argument("--collections", nargs="+", default=all_collections)
+    reembed_parser.add_argument("--batch-size", type=int, default=256)
+    reembed_parser.add_argument("--drop-old", action="store_true")
+    sync_parser = subparsers.add_parser(
+        "sync-local",
+        help="Rebuild the local table and column index (RETRIEVAL_BACKEND=local)",
+    )
+    sync_parser.add_argument(
+        "--source",
+        choices=["milvus", "schema"],
+        default=milvus_config.LOCAL_VECTOR_SYNC_SOURCE,
+    )
+    sync_parser.add_argument("--schema-path", default=milvus_config.SCHEMA_CATALOG_PATH)
+    pca_parser = subparsers.add_parser(
+        "fit-pca", help="Fit the EMBEDDING_REDUCTION=pca projection"
+    )
+    pca_parser.add_argument(
+        "--dim", type=int, default=get_openai_config().EMBEDDING_REDUCED_DIM
+    )
+    pca_parser.add_argument("--path", default=get_openai_config().EMBEDDING_PCA_PATH)
+    pca_parser.add_argument("--collections", nargs="+", default=all_collections)
+    index_parser = subparsers.add_parser(
+        "rebuild-index", help="Replace the vector index of the collections"
+    )
+    index_parser.add_argument("--index-type", default=milvus_config.MILVUS_INDEX_TYPE)
+    index_parser.add_argument("--collections", nargs="+", default=all_collections)
+    partition_parser = subparsers.add_parser(
+        "partition-sql-examples",
+        help="Partition the SQL example collection by tenantID",
+    )
+    partition_parser.add_argument("--drop-old", action="store_true")
+    partition_parser.add_argument(
+        "--shared-tenants",
+        nargs="*",
+        default=[],
+        help="Tenants whose examples are moved to the global tenant",
+    )
+    partition_parser.add_argument(
+        "--share-all",
+        action="store_true",
+        help="Move every example to the global tenant",
+    )
+    seed_parser = subparsers.add_parser(
+        "seed-sql-examples",
+        help="Insert the SQL examples of a JSON file, for the global tenant by default",
+    )
+    seed_parser.add_argument("--path", required=True)
+    seed_parser.add_argument("--tenant", default=None)
+    column_store_parser = subparsers.add_parser(
+        "fill-column-store",
+        help="Write the heavy column fields to the COLUMN_SIDE_STORE store",
+    )
+    column_store_parser.add_argument(
+        "--source", choices=["milvus", "schema"], default="milvus"
+    )
+    column_store_parser.add_argument(
+        "--schema-path", default=milvus_config.SCHEMA_CATALOG_PATH
+    )
+    args = parser.parse_args()
+
+    if args.command == "fill-column-store":
+        print(fill_column_store(source=args.source, schema_path=args.schema_path))
+        return
+    if args.command == "partition-sql-examples":
+        print(
+            partition_sql_examples(
+                drop_old=args.drop_old,
+                shared_tenants=args.shared_tenants,
+                share_all=args.share_all,
+            )
+        )
+        return
+    if args.command == "seed-sql-examples":
+        print(seed_sql_examples(args.path, tenant_id=args.tenant))
+        return
+    if args.command == "fit-pca":
+        print(fit_pca(args.collections, dim=args.dim, path=args.path))
+        return
+    if args.command == "rebuild-index":
+        for collection_name in args.collections:
+            print(rebuild_index(collection_name, index_type=args.index_type))
+        return
+    if args.command == "sync-local":
+        if args.source == "schema":
+            print(
+                local_vector_manager.sync_from_schema_file(
+                    "migration", schema_path=args.schema_path
+                )
+            )
+        else:
+            for collection_name in [
+                milvus_config.MILVUS_TABLE_COLLECTION_NAME,
+                milvus_config.MILVUS_COLUMN_COLLECTION_NAME,
+            ]:
+                if collection_name:
+                    print(
+                        collection_name,
+                        local_vector_manager.sync_from_milvus(
+                            "migration", collection_name
+                        ),
+                    )
+        return
+
+    for collection_name in args.collections:
+        result = reembed_collection(
+            collection_name=collection_name,
+            provider=args.provider,
+            batch_size=args.batch_size,
+            drop_old=args.drop_old,
+        )
+        print(result)
+
+
+if __name__ == "__main__":
+    main()
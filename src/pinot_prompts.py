@@ -1,4 +1,4 @@
-from config import DatabaseConfig
+from config import get_database_config
 from typing import List, Dict
 from datetime import datetime, timezone
 
@@ -11,8 +11,9 @@ def _texttosql_prompt(
     example_sql=None,
 ) -> List[Dict[str, str]]:
     tenant_info = f"tenantId='{tenant_id}'"
-    return_key_dialect = list(DatabaseConfig().DIALECT.keys())[0]
-    prompt_dialect = DatabaseConfig().DIALECT[return_key_dialect]
+    database_config = get_database_config()
+    return_key_dialect = list(database_config.DIALECT.keys())[0]
+    prompt_dialect = database_config.DIALECT[return_key_dialect]
     current_datetime = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")
     current_timestamp = datetime.now(timezone.utc).timestamp()
 
@@ -157,7 +158,7 @@ REMEMBER: Your role is to write an executable {dialect} query based on the user
                 tenant_info=tenant_info,
                 database_info=database_info,
                 relationship_diagram=relationship_diagram,
-                custom_guidelines=DatabaseConfig().TEXT_TO_SQL_PROMPT_TEMPLATE,
+                custom_guidelines=database_config.TEXT_TO_SQL_PROMPT_TEMPLATE,
                 return_key_dialect=return_key_dialect,
                 EXAMPLES=example_string.strip(),
             ),
@@ -199,8 +200,9 @@ def _texttosql_deepseak_prompt(
     example_sql=None,
 ) -> List[Dict[str, str]]:
     tenant_info = f"tenantId='{tenant_id}'"
-    return_key_dialect = list(DatabaseConfig().DIALECT.keys())[0]
-    prompt_dialect = DatabaseConfig().DIALECT[return_key_dialect]
+    database_config = get_database_config()
+    return_key_dialect = list(database_config.DIALECT.keys())[0]
+    prompt_dialect = database_config.DIALECT[return_key_dialect]
     current_datetime = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")
     current_timestamp = datetime.now(timezone.utc).timestamp()
 
@@ -292,7 +294,7 @@ NOTE:
                 tenant_info=tenant_info,
                 database_info=database_info,
                 relationship_diagram=relationship_diagram,
-                custom_guidelines=DatabaseConfig().TEXT_TO_SQL_PROMPT_TEMPLATE,
+                custom_guidelines=database_config.TEXT_TO_SQL_PROMPT_TEMPLATE,
                 return_key_dialect=return_key_dialect,
                 EXAMPLES=example_string,
             ),
@@ -0,0 +1,265 @@
+import time
+import json
+import asyncio
+import threading
+from collections import deque
+from typing import Dict, Optional
+from config import get_openai_config
+from src.adapters.loggingmanager import logger
+
+
+class TokenBucket:
+    def __init__(self, capacity_per_minute: int) -> None:
+        """
+        A bucket holding up to `capacity_per_minute` units, refilled continuously.
+
+        Args:
+            capacity_per_minute (int): Bucket size and refill amount per minute.
+        """
+        self.capacity = float(capacity_per_minute)
+        self.tokens = float(capacity_per_minute)
+        self.refill_rate = self.capacity / 60
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated_at) * self.refill_rate
+        )
+        self.updated_at = now
+
+    def time_until_available(self, amount: float, now: float) -> float:
+        """
+        Seconds until `amount` units can be consumed (0 if they are available now).
+        Requests larger than the bucket are clamped to its capacity.
+        """
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0
+        return (amount - self.tokens) / self.refill_rate
+
+    def consume(self, amount: float) -> None:
+        self.tokens -= min(amount, self.capacity)
+
+
+class DeploymentRateLimiter:
+    """
+    Client-side limiter of the requests per minute and tokens per minute of one deployment.
+
+    Callers are served strictly in arrival order (FIFO tickets), so under pressure they
+    queue fairly instead of spinning in retries. A limit of 0 disables that bucket.
+
+    Methods:
+        - acquire(tokens: int) -> float:
+            Blocks until the request may be sent, returns the time spent queued.
+
+        - aacquire(tokens: int) -> float:
+            Async variant of acquire.
+
+        - reconcile(estimated_tokens: int, actual_tokens: int) -> None:
+            Corrects the token bucket once the real usage is known.
+
+        - penalize(retry_after: float) -> None:
+            Pauses the deployment after the provider answered 429.
+    """
+
+    QUEUE_POLL_INTERVAL = 0.05
+
+    def __init__(
+        self, name: str, requests_per_minute: int, tokens_per_minute: int
+    ) -> None:
+        self.name = name
+        self.request_bucket = (
+            TokenBucket(requests_per_minute) if requests_per_minute else None
+        )
+        self.token_bucket = (
+            TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        )
+        self._condition = threading.Condition()
+        self._queue = deque()
+        self._blocked_until = 0.0
+
+    def _try_consume(self, ticket: object, tokens: int) -> Optional[float]:
+        """
+        Must be called with the condition held. Returns None once the request is granted,
+        otherwise the number of seconds to wait before trying again.
+        """
+        if self._queue[0] is not ticket:
+            return self.QUEUE_POLL_INTERVAL
+        now = time.monotonic()
+        delay = max(self._blocked_until - now, 0)
+        if self.request_bucket:
+            delay = max(delay, self.request_bucket.time_until_available(1, now))
+        if self.token_bucket:
+            delay = max(delay, self.token_bucket.time_until_available(tokens, now))
+        if delay > 0:
+            return delay
+        if self.request_bucket:
+            self.request_bucket.consume(1)
+        if self.token_bucket:
+            self.token_bucket.consume(tokens)
+        self._queue.popleft()
+        self._condition.notify_all()
+        return None
+
+    def _leave_queue(self, ticket: object) -> None:
+        with self._condition:
+            if ticket in self._queue:
+                self._queue.remove(ticket)
+                self._condition.notify_all()
+
+    def acquire(self, tokens: int) -> float:
+        """
+        Blocks until one request of `tokens` estimated tokens may be sent.
+
+        Args:
+            tokens (int): Estimated prompt + completion tokens of the request.
+
+        Returns:
+            float: Seconds spent waiting in the queue.
+        """
+        if not (self.request_bucket or self.token_bucket):
+            return 0
+        ticket = object()
+        start_time = time.monotonic()
+        granted = False
+        try:
+            with self._condition:
+                self._queue.append(ticket)
+                while True:
+                    delay = self._try_consume(ticket, tokens)
+                    if delay is None:
+                        granted = True
+                        return time.monotonic() - start_time
+                    self._condition.wait(delay)
+        finally:
+            if not granted:
+                self._leave_queue(ticket)
+
+    async def aacquire(self, tokens: int) -> float:
+        """
+        Async variant of acquire; waits with asyncio.sleep instead of blocking a thread.
+
+        Args:
+            tokens (int): Estimated prompt + completion tokens of the request.
+
+        Returns:
+            float: Seconds spent waiting in the queue.
+        """
+        if not (self.request_bucket or self.token_bucket):
+            return 0
+        ticket = object()
+        start_time = time.monotonic()
+        granted = False
+        with self._condition:
+            self._queue.append(ticket)
+        try:
+            while True:
+                with self._condition:
+                    delay = self._try_consume(ticket, tokens)
+                if delay is None:
+                    granted = True
+                    return time.monotonic() - start_time
+                await asyncio.sleep(delay)
+        finally:
+            if not granted:
+                self._leave_queue(ticket)
+
+    def reconcile(self, estimated_tokens: int, actual_tokens: int) -> None:
+        """
+        Refunds (or charges) the difference between the estimated and the real token usage.
+        """
+        if not self.token_bucket or not actual_tokens:
+            return
+        with self._condition:
+            self.token_bucket.consume(actual_tokens - estimated_tokens)
+            self.token_bucket.tokens = min(
+                self.token_bucket.tokens, self.token_bucket.capacity
+            )
+            self._condition.notify_all()
+
+    def penalize(self, retry_after: float) -> None:
+        """
+        Stops granting requests for `retry_after` seconds (provider returned 429).
+        """
+        with self._condition:
+            self._blocked_until = max(
+                self._blocked_until, time.monotonic() + retry_after
+            )
+        logger.warning(
+            f"[DeploymentRateLimiter][{self.name}] - Throttled by provider, pausing {retry_after}s"
+        )
+
+
+class RateLimiterRegistry:
+    def __init__(self) -> None:
+        """
+        Holds one DeploymentRateLimiter per deployment, shared by the whole process.
+        Limiters are keyed by "<namespace>:<deployment>", or "<namespace>:<backend>/<deployment>"
+        when the pool has several backends, so an Ollama model and an OpenAI deployment
+        with the same name do not share a limiter.
+
+        Limits come from OPENAI_RPM_LIMIT / OPENAI_TPM_LIMIT, overridden per OpenAI
+        deployment name by OPENAI_DEPLOYMENT_RATE_LIMITS, e.g. {"gpt-4o": {"rpm": 300,
+        "tpm": 50000}}. The override applies to the deployment on every backend, each
+        backend having its own limiter.
+        """
+        self._limiters: Dict[str, DeploymentRateLimiter] = {}
+        self._lock = threading.Lock()
+
+    def get(
+        self,
+        deployment: str,
+        requests_per_minute: int = None,
+        tokens_per_minute: int = None,
+        namespace: str = "openai",
+        backend: str = None,
+    ) -> DeploymentRateLimiter:
+        """
+        Returns the limiter of a deployment, creating it on first use.
+
+        Args:
+            deployment (str): The deployment name.
+            requests_per_minute (int, optional): Limit used when OPENAI_DEPLOYMENT_RATE_LIMITS
+                has no entry for the key. Defaults to OPENAI_RPM_LIMIT.
+            tokens_per_minute (int, optional): Same for tokens. Defaults to OPENAI_TPM_LIMIT.
+            namespace (str, optional): The provider the deployment belongs to. Only the
+                "openai" namespace reads OPENAI_DEPLOYMENT_RATE_LIMITS. Defaults to "openai".
+            backend (str, optional): The backend serving the deployment, when the pool
+                has several; each backend gets its own limiter.
+
+        Returns:
+            DeploymentRateLimiter: The shared limiter of the deployment.
+        """
+        key = (
+            f"{namespace}:{backend}/{deployment}"
+            if backend
+            else f"{namespace}:{deployment}"
+        )
+        limiter = self._limiters.get(key)
+        if limiter is None:
+            with self._lock:
+                limiter = self._limiters.get(key)
+                if limiter is None:
+                    openai_config = get_openai_config()
+                    limits = (
+                        json.loads(openai_config.OPENAI_DEPLOYMENT_RATE_LIMITS).get(
+                            deployment, {}
+                        )
+                        if namespace == "openai"
+                        else {}
+                    )
+                    if requests_per_minute is None:
+                        requests_per_minute = openai_config.OPENAI_RPM_LIMIT
+                    if tokens_per_minute is None:
+                        tokens_per_minute = openai_config.OPENAI_TPM_LIMIT
+                    limiter = DeploymentRateLimiter(
+                        name=key,
+                        requests_per_minute=limits.get("rpm", requests_per_minute),
+                        tokens_per_minute=limits.get("tpm", tokens_per_minute),
+                    )
+                    self._limiters[key] = limiter
+        return limiter
+
+
+rate_limiter_registry = RateLimiterRegistry()
@@ -1,18 +1,128 @@
-from config import DatabaseConfig
-from typing import List, Dict
+from config import get_database_config, get_openai_config
+from typing import List, Dict, Optional, Tuple
 from datetime import datetime, timezone
+from src.token_counter import count_tokens, count_message_tokens
+from src.utils import format_column, format_column_metadata, format_table_header
+from src.adapters.loggingmanager import logger
+
+# Sample values kept per column at the first trimming step of the prompt budget
+SAMPLE_VALUE_MAX_LINES = 3
+
+
+def _format_example(example: Dict[str, str], return_key_dialect: str) -> str:
+    return (
+        f"User Question: {example['question']}\n"
+        f"{return_key_dialect}_query: {example['sqlQuery']}\n\n"
+    )
+
+
+def _fit_context_to_budget(
+    base_tokens: int,
+    columns: List[Dict[str, str]],
+    examples: List[Dict[str, str]],
+    return_key_dialect: str,
+    token_budget: int,
+) -> Tuple[List[Dict[str, str]], Optional[int], List[Dict[str, str]]]:
+    """
+    Chooses how much of the retrieved context fits in the prompt token budget. Until
+    the estimate fits, it trims in this order: sample values down to
+    SAMPLE_VALUE_MAX_LINES lines, all sample values, lower-ranked SQL examples (keeping
+    the best one), lower-ranked columns (keeping the best column of each table), and
+    finally the last example.
+
+    Args:
+        base_tokens (int): Tokens of the prompt without columns and examples.
+        columns (List[Dict[str, str]]): Relevant columns, best match first.
+        examples (List[Dict[str, str]]): SQL examples, best match last.
+        return_key_dialect (str): Dialect key used in the example format.
+        token_budget (int): Maximum prompt tokens.
+
+    Returns:
+        Tuple: The columns to keep, the sample value lines to keep (None for all) and
+            the examples to keep.
+    """
+    column_tokens = {
+        sample_value_lines: [
+            count_tokens(format_column(column, sample_value_lines))
+            for column in columns
+        ]
+        for sample_value_lines in (None, SAMPLE_VALUE_MAX_LINES, 0)
+    }
+    header_tokens = {
+        column["tableName"]: count_tokens(
+            format_table_header(len(columns), column["tableName"])
+        )
+        for column in columns
+    }
+    example_tokens = [
+        count_tokens(_format_example(example, return_key_dialect))
+        for example in examples
+    ]
+    kept_columns = list(range(len(columns)))
+    kept_examples = list(range(len(examples)))
+
+    def estimate(sample_value_lines: Optional[int]) -> int:
+        kept_tables = {columns[idx]["tableName"] for idx in kept_columns}
+        return (
+            base_tokens
+            + sum(column_tokens[sample_value_lines][idx] for idx in kept_columns)
+            + sum(header_tokens[table_name] for table_name in kept_tables)
+            + sum(example_tokens[idx] for idx in kept_examples)
+        )
+
+    for sample_value_lines in (None, SAMPLE_VALUE_MAX_LINES, 0):
+        if estimate(sample_value_lines) <= token_budget:
+            break
+    while len(kept_examples) > 1 and estimate(sample_value_lines) > token_budget:
+        kept_examples.pop(0)
+    for idx in reversed(range(len(columns))):
+        if estimate(sample_value_lines) <= token_budget:
+            break
+        table_name = columns[idx]["tableName"]
+        if any(
+            columns[kept]["tableName"] == table_name
+            for kept in kept_columns
+            if kept < idx
+        ):
+            kept_columns.remove(idx)
+    if estimate(sample_value_lines) > token_budget:
+        kept_examples = []
+    return (
+        [columns[idx] for idx in kept_columns],
+        sample_value_lines,
+        [examples[idx] for idx in kept_examples],
+    )
 
 
 def _texttosql_prompt(
     user_input: str,
     tenant_id: str,
-    metadata_info: str,
+    columns: List[Dict[str, str]],
     relationship_diagram: str,
     example_sql=None,
+    token_budget: int = None,
 ) -> List[Dict[str, str]]:
+    """
+    Builds the text-to-SQL messages. When the prompt would exceed the token budget,
+    the column sample values, then the lower-ranked examples and columns are trimmed
+    (see _fit_context_to_budget).
+
+    Args:
+        user_input (str): The user question.
+        tenant_id (str): The tenant the query is scoped to.
+        columns (List[Dict[str, str]]): Relevant columns from extract_column_metadata.
+        relationship_diagram (str): The formatted table relationships.
+        example_sql (List[Dict[str, str]], optional): Few-shot examples, best match last.
+        token_budget (int, optional): Maximum prompt tokens. Defaults to
+            PROMPT_TOKEN_BUDGET (0 disables trimming).
+
+    Returns:
+        List[Dict[str, str]]: The chat messages.
+    """
     tenant_info = f"tenantid='{tenant_id}'"
-    return_key_dialect = list(DatabaseConfig().DIALECT.keys())[0]
-    prompt_dialect = DatabaseConfig().DIALECT[return_key_dialect]
+    database_config = get_database_config()
+    return_key_dialect = list(database_config.DIALECT.keys())[0]
+    prompt_dialect = database_config.DIALECT[return_key_dialect]
     current_datetime = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")
     current_timestamp = datetime.now(timezone.utc).timestamp()
 
@@ -81,43 +191,49 @@ def _texttosql_prompt(
 3. You are restricted to use only the provided column names and table names as they are, without any modifications or assumptions.
 4. HINT: IF No operator matches the given name and argument types. You might need to add explicit type casts."""
 
-    example_string = ""
-    if example_sql:
-        for example in example_sql:
-            example_string += f"User Question: {example['question']}\n"
-            example_string += f"{return_key_dialect}_query: {example['sqlQuery']}\n\n"
-
-    messages = [
-        {
-            "role": "system",
-            "content": prompt.format(
-                dialect=prompt_dialect,
-                current_datetime=current_datetime,
-                current_timestamp=current_timestamp,
-                tenant_info=tenant_info,
-                database_info=DatabaseConfig().DATABASE_INFORMATION_PROMPT_TEMPLATE,
-                metadata_info=metadata_info,
-                relationship_diagram=relationship_diagram,
-                custom_guidelines=DatabaseConfig().TEXT_TO_SQL_PROMPT_TEMPLATE,
-                return_key_dialect=return_key_dialect,
-                example_string=example_string,
-            ),
-        },
-    ]
-    print(
-        prompt.format(
+    def build_messages(metadata_info: str, example_string: str):
+        system_prompt = prompt.format(
             dialect=prompt_dialect,
             current_datetime=current_datetime,
             current_timestamp=current_timestamp,
             tenant_info=tenant_info,
-            database_info=DatabaseConfig().DATABASE_INFORMATION_PROMPT_TEMPLATE,
+            database_info=database_config.DATABASE_INFORMATION_PROMPT_TEMPLATE,
             metadata_info=metadata_info,
             relationship_diagram=relationship_diagram,
-            custom_guidelines=DatabaseConfig().TEXT_TO_SQL_PROMPT_TEMPLATE,
+            custom_guidelines=database_config.TEXT_TO_SQL_PROMPT_TEMPLATE,
             return_key_dialect=return_key_dialect,
             example_string=example_string,
         )
+        return [
+            {
+                "role": "system",
+                "content": system_prompt,
+            },
+            {
+                "role": "user",
+                "content": f"User Query: {user_input}",
+            },
+        ]
+
+    example_sql = example_sql or []
+    sample_value_lines = None
+    if token_budget is None:
+        token_budget = get_openai_config().PROMPT_TOKEN_BUDGET
+    if token_budget:
+        columns, sample_value_lines, example_sql = _fit_context_to_budget(
+            base_tokens=count_message_tokens(build_messages("", "")),
+            columns=columns,
+            examples=example_sql,
+            return_key_dialect=return_key_dialect,
+            token_budget=token_budget,
+        )
+    messages = build_messages(
+        metadata_info=format_column_metadata(columns, sample_value_lines),
+        example_string="".join(
+            _format_example(example, return_key_dialect) for example in example_sql
+        ),
     )
+    logger.debug(messages[0]["content"])
 
     # if example_sql:
     #     for example in example_sql:
@@ -137,12 +253,6 @@ def _texttosql_prompt(
     #                 + "}",
     #             }
     #         )
-    messages.append(
-        {
-            "role": "user",
-            "content": f"User Query: {user_input}",
-        }
-    )
     # print(messages)
     return messages
 
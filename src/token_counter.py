@@ -0,0 +1,54 @@
+from functools import lru_cache
+from typing import Dict, List
+from config import get_openai_config
+from src.adapters.loggingmanager import logger
+
+
+@lru_cache(maxsize=None)
+def _get_encoding(encoding_name: str):
+    """
+    Loads the tiktoken encoding once, or returns None when tiktoken is not installed
+    (or the encoding can not be loaded) so callers fall back to the heuristic.
+    """
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding(encoding_name)
+    except Exception as encoding_exc:
+        logger.warning(
+            f"[token_counter] - tiktoken encoding {encoding_name} unavailable, using the 4 characters per token estimate: {str(encoding_exc)}"
+        )
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """
+    Counts the tokens of a text locally with the TOKENIZER_ENCODING tiktoken encoding,
+    or estimates them (about 4 characters per token) when tiktoken is not available.
+
+    Args:
+        text (str): The text to count.
+
+    Returns:
+        int: The number of tokens.
+    """
+    if not text:
+        return 0
+    encoding = _get_encoding(get_openai_config().TOKENIZER_ENCODING)
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def count_message_tokens(messages: List[Dict[str, str]]) -> int:
+    """
+    Counts the prompt tokens of a chat request, including the per-message overhead
+    added by the chat format.
+
+    Args:
+        messages (List[Dict[str, str]]): The chat messages.
+
+    Returns:
+        int: The number of prompt tokens.
+    """
+    return sum(count_tokens(message["content"]) + 4 for message in messages) + 3
@@ -1,6 +1,5 @@
 import pytz
 import json
-import pandas as pd
 from datetime import datetime
 from src.custom_exception import CustomException
 from pydantic import BaseModel, Field, PrivateAttr, field_validator
@@ -127,28 +126,41 @@ class ConversationAnalyticsModel(GetAnswerModel):
         userTextRephrasedChatCompletionInputToken (int): Number of input tokens used for generating the rephrased query.
         userTextRephrasedChatCompletionOutputToken (int): Number of output tokens generated in the rephrased query.
         userTextRephrasedChatCompletionTime (float): Time taken to generate the rephrased query.
+        userTextRephrasedModel (str): Provider and model used to rephrase the query.
         userTextEmbeddingTokens (int): Number of tokens used to generate embeddings for the query.
         userTextEmbeddingGenerationTime (float): Time taken to generate embeddings for the query.
         tableVectorSearchTime (float): Time taken to perform a table vector search on the database.
         columnVectorSearchTime (float): Time taken to perform a column vector search on the database.
         SqlExampleVectorSearchTime (float): Time taken to perform a SQL example vector search on the database.
+        clusterIdentificationModel (str): Provider and model used to identify the relevant clusters.
+        clusterIdentificationChatCompletionInputToken (int): Number of input tokens used for identifying the clusters.
+        clusterIdentificationChatCompletionOutputToken (int): Number of output tokens generated when identifying the clusters.
+        clusterIdentificationChatCompletionTime (float): Time taken to identify the relevant clusters.
         sqlQuery (str): SQL query generated based on the user's query.
+        sqlQueryPromptTokenEstimate (int): Locally counted tokens of the SQL generation prompt, before sending it.
         sqlQueryChatCompletionInputToken (int): Number of input tokens used for generating the SQL query.
         sqlQueryChatCompletionOutputToken (int): Number of output tokens generated in the SQL query.
         sqlQueryChatCompletionTime (float): Time taken to generate the SQL query.
+        sqlQueryModel (str): Provider and model used to generate the SQL query.
         sqlQueryExecutionTime (float): Time taken to execute the SQL query.
         sqlQueryResponse (List[dict]): Response from the SQL query execution.
+        sqlQueryResponseTruncated (bool): Whether rows were left out by the LIMIT policy or the row/size caps.
         answerChatCompletionInputToken (int): Number of input tokens used for generating the answer.
         answerChatCompletionOutputToken (int): Number of output tokens generated in the answer.
         answerChatCompletionTime (float): Time taken to generate the answer.
+        answerModel (str): Provider and model used to generate the answer.
         answer (str): Answer generated based on the SQL query response.
         graphChatCompletionTime (float): Time taken to generate the graph.
         graphChatCompletionInputToken (int): Number of input tokens used for generating the graph.
         graphChatCompletionOutputToken (int): Number of output tokens generated in the graph.
+        graphModel (str): Provider and model used to generate the graph code.
         graphGenerationCode (str): Code generated for graph generation based on the SQL query response.
         graphFigureJson (Dict[str, Any]): JSON representation of the graph figure generated based on the SQL query response.
         totalAdaCalls (int): Total number of requests made to the ADA model.
         totalChatCompletionCalls (int): Total number of requests made to the Chat Completion model.
+        rateLimitQueueTime (float): Total time the OpenAI requests waited in the client-side rate limiter queue.
+        hedgedChatCompletionCalls (int): Number of chat completions for which a hedge request was fired.
+        fallbackChatCompletionCalls (int): Number of chat completions served by a fallback model of the stage chain.
         error (str): Any error encountered during the transaction.
         responseTime (float): Total time taken to generate and provide an answer to the user's query.
 
@@ -183,6 +195,9 @@ class ConversationAnalyticsModel(GetAnswerModel):
         default=0,
         description="Time taken to generate query rephrased query",
     )
+    userTextRephrasedModel: str = Field(
+        default=None, description="Provider and model used to rephrase the query."
+    )
     userTextEmbeddingTokens: int = Field(
         default=0,
         description="Number of tokens used to generate embeddings for the query.",
@@ -224,6 +239,21 @@ class ConversationAnalyticsModel(GetAnswerModel):
         default=0,
         description="Time taken to perform a SQL example vector search on database.",
     )
+    clusterIdentificationModel: str = Field(
+        default=None,
+        description="Provider and model used to identify the relevant clusters.",
+    )
+    clusterIdentificationChatCompletionInputToken: int = Field(
+        default=0,
+        description="Number of input tokens used for identifying the clusters.",
+    )
+    clusterIdentificationChatCompletionOutputToken: int = Field(
+        default=0,
+        description="Number of output tokens generated when identifying the clusters.",
+    )
+    clusterIdentificationChatCompletionTime: float = Field(
+        default=0, description="Time taken to identify the relevant clusters."
+    )
     # greetingFlag: bool = Field(
     #     default=False, description="Flag to indicate if the user's query is a greeting."
     # )
@@ -234,6 +264,10 @@ class ConversationAnalyticsModel(GetAnswerModel):
         default=None,
         description="SQL query generated based on the user's query.",
     )
+    sqlQueryPromptTokenEstimate: int = Field(
+        default=0,
+        description="Locally counted tokens of the SQL generation prompt, before sending it.",
+    )
     sqlQueryChatCompletionInputToken: int = Field(
         default=0,
         description="Number of input tokens used for generating the SQL query.",
@@ -246,6 +280,9 @@ class ConversationAnalyticsModel(GetAnswerModel):
         default=0,
         description="Time taken to generate the SQL query.",
     )
+    sqlQueryModel: str = Field(
+        default=None, description="Provider and model used to generate the SQL query."
+    )
     sqlQueryExecutionTime: float = Field(
         default=0, description="Time taken to execute the SQL query."
     )
@@ -253,6 +290,10 @@ class ConversationAnalyticsModel(GetAnswerModel):
         default=None,
         description="Response from the SQL query execution.",
     )
+    sqlQueryResponseTruncated: bool = Field(
+        default=False,
+        description="Whether rows were left out by the LIMIT policy or the row/size caps.",
+    )
     answerChatCompletionInputToken: int = Field(
         default=0,
         description="Number of input tokens used for generating the answer.",
@@ -263,6 +304,9 @@ class ConversationAnalyticsModel(GetAnswerModel):
     answerChatCompletionTime: float = Field(
         default=0, description="Time taken to generate the answer."
     )
+    answerModel: str = Field(
+        default=None, description="Provider and model used to generate the answer."
+    )
     answer: str = Field(
         default=None, description="Answer generated based on the SQL query response."
     )
@@ -275,6 +319,9 @@ class ConversationAnalyticsModel(GetAnswerModel):
     graphChatCompletionOutputToken: int = Field(
         default=0, description="Number of output tokens generated in the graph."
     )
+    graphModel: str = Field(
+        default=None, description="Provider and model used to generate the graph code."
+    )
     graphGenerationCode: str = Field(
         default=None,
         description="Code generated for graph generation based on the SQL query response.",
@@ -290,6 +337,18 @@ class ConversationAnalyticsModel(GetAnswerModel):
         default=0,
         description="Total number of requests made to the Chat Completion model.",
     )
+    rateLimitQueueTime: float = Field(
+        default=0,
+        description="Total time the OpenAI requests waited in the client-side rate limiter queue.",
+    )
+    hedgedChatCompletionCalls: int = Field(
+        default=0,
+        description="Number of chat completions for which a hedge request was fired.",
+    )
+    fallbackChatCompletionCalls: int = Field(
+        default=0,
+        description="Number of chat completions served by a fallback model of the stage chain.",
+    )
     error: str = Field(
         default="", description="Any error encountered during the transaction."
     )
@@ -334,6 +393,8 @@ class ConversationAnalyticsModel(GetAnswerModel):
             NL2SQLException: If there is an error while inserting the data into the database.
 
         """
+        import pandas as pd
+
         current_time = datetime.now()
         self.responseTime = (current_time - self._start_time).total_seconds()
         try:
@@ -428,6 +489,8 @@ class RetrievalLogsModel(BaseModel):
                 If an error occurs during the insertion, the exception is raised after
                 attaching the provided conversation_analytics to it.
         """
+        import pandas as pd
+
         try:
             sqlite_manager.insert_data(
                 transaction_id=self.conversationID,
@@ -452,11 +515,55 @@ class APIResponseModel(BaseModel):
     error: str = Field(default="", description="Error occured in the API")
 
 
+class DependencyReadinessModel(BaseModel):
+    """
+    This model captures the warm-up / readiness state of one backend dependency.
+
+    Attributes:
+        ready (bool): Whether the dependency has been warmed up successfully.
+        latency (float): Time taken by the last warm-up attempt, in seconds.
+        error (str): Error raised by the last warm-up attempt, if any.
+        checkedAt (str): UTC timestamp of the last warm-up attempt.
+    """
+
+    ready: bool = Field(
+        default=False,
+        description="Whether the dependency has been warmed up successfully",
+    )
+    latency: float = Field(
+        default=0, description="Time taken by the last warm-up attempt in seconds"
+    )
+    error: str = Field(
+        default="", description="Error raised by the last warm-up attempt"
+    )
+    checkedAt: str = Field(
+        default=None, description="UTC timestamp of the last warm-up attempt"
+    )
+
+
+class ReadinessResponseModel(BaseModel):
+    """
+    This model is used to structure the readiness endpoint response.
+
+    Attributes:
+        ready (bool): True only when every dependency is ready.
+        dependencies (Dict[str, DependencyReadinessModel]): Readiness of each dependency.
+    """
+
+    ready: bool = Field(
+        default=False, description="True only when every dependency is ready"
+    )
+    dependencies: Dict[str, DependencyReadinessModel] = Field(
+        default={}, description="Readiness of each dependency"
+    )
+
+
 class TablesVectorRecord(BaseModel):
     """
     TablesVectorRecord is a data model that represents the structure of a record in the tables vector collection.
 
     Attributes:
+        id (str): Primary key of the record, the table name.
         tableName (str): Name of the table.
         tableDescription (str): Description of the table.
         tableDDL (str): DDL (Data Definition Language) statement for the table.
@@ -468,6 +575,9 @@ class TablesVectorRecord(BaseModel):
         __init__(self, **data): Initializes a new instance of the class.
     """
 
+    id: str = Field(
+        description="Primary key of the record, the table name",
+    )
     tableName: str = Field(
         description="Name of the table",
     )
@@ -496,6 +606,7 @@ class ColumnsVectorRecord(BaseModel):
     ColumnsVectorRecord is a data model that represents the structure of a record in the columns vector collection.
 
     Attributes:
+        id (str): Primary key of the record, "<tableName>.<columnName>".
         tableName (str): Name of the table.
         columnName (str): Name of the column.
         # columnIsPrimaryKey (str): Flag to indicate if the column is a primary key.
@@ -508,6 +619,9 @@ class ColumnsVectorRecord(BaseModel):
         __init__(self, **data): Initializes a new instance of the class.
     """
 
+    id: str = Field(
+        description='Primary key of the record, "<tableName>.<columnName>"',
+    )
     tableName: str = Field(
         description="Name of the table",
     )
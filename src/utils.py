@@ -1,68 +1,179 @@
 import re
 from partialjson.json_parser import JSONParser
-from typing import Tuple, Dict
+from typing import TYPE_CHECKING, Tuple, Dict, Callable, List
 from src.adapters.loggingmanager import logger
 from src.adapters.milvusmanager import milvus_manager
+from src.adapters.localvectormanager import local_vector_manager
+from src.adapters.columnstoremanager import column_store_manager
 from src.adapters.openaimanager import openai_manager
+from src.adapters.ollamamanager import ollama_manager
+from src.adapters.sqlmanager import sql_manager
+from src.adapters.pinotmanager import pinot_manager
+from src.adapters.sqlitemanager import sqlite_manager
 from src.custom_exception import CustomException
-from config import DatabaseConfig
-import pandas as pd
-import plotly
-import plotly.express as px
-import plotly.graph_objects as go
+from src.circuit_breaker import circuit_breakers
+from src.llm_results import ChatCompletionResult
+from src.vector_compression import get_embedding_reducer, ReducedEmbeddingManager
+from config import (
+    get_database_config,
+    get_sql_config,
+    get_app_config,
+    get_milvus_config,
+    get_openai_config,
+)
+from src.decorators import measure_time
 from fastapi.responses import JSONResponse
 from src.types import (
     ConversationAnalyticsModel,
     APIResponseModel,
     SqlExampleVectorRecord,
+    DependencyReadinessModel,
+    ReadinessResponseModel,
 )
 import sqlparse
-import sqlglot
 import pytz
 from datetime import datetime
 import urllib.parse
-from bs4 import BeautifulSoup
+import json
+import time
+import threading
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 
+# pandas, plotly and bs4 are imported inside the functions that use them so that
+# importing this module (and src.bi_assistant) stays cheap.
+if TYPE_CHECKING:
+    from types import ModuleType
+    import pandas as pd
+    import plotly
 
-return_key_dialect = list(DatabaseConfig().DIALECT.keys())[0]
-prompt_dialect = DatabaseConfig().DIALECT[return_key_dialect]
-tables_relationship = DatabaseConfig().TABLE_RELATIONSHIPS
-database_relationship_description = DatabaseConfig().DATABASE_RELATIONSHIPS_DESCRIPTION
 
+return_key_dialect = list(get_database_config().DIALECT.keys())[0]
+prompt_dialect = get_database_config().DIALECT[return_key_dialect]
 
-def extract_and_format_metadata(columns_retrieved_data):
-    relevant_metadata = {}
 
+def extract_column_metadata(
+    columns_retrieved_data, distance_threshold: float = None
+) -> List[Dict[str, str]]:
+    """
+    Returns the retrieved columns above the distance threshold, best match first.
+
+    Args:
+        columns_retrieved_data: Column search result ([[{"distance", "entity"}]]).
+        distance_threshold (float, optional): Minimum cosine similarity. Defaults to
+            MILVUS_COLUMN_DISTANCE_THRESHOLD.
+
+    Returns:
+        List[Dict[str, str]]: tableName, columnName, columnDescription, columnDataType
+            and columnSampleValue of each relevant column.
+    """
+    if distance_threshold is None:
+        distance_threshold = get_milvus_config().MILVUS_COLUMN_DISTANCE_THRESHOLD
+    relevant_columns = []
     for record in columns_retrieved_data[0]:
-        if record["distance"] > 0.7:
+        if record["distance"] > distance_threshold:
             entity = record["entity"]
-            table_name = entity["tableName"]
-            column_info = {
-                "columnName": entity["columnName"],
-                # "columnIsPrimaryKey": entity["columnIsPrimaryKey"],
-                "columnDescription": entity["columnDescription"],
-                "columnDataType": entity["columnDataType"],
-                "columnSampleValue": entity["columnSampleValue"],
-            }
-            relevant_metadata.setdefault(table_name, []).append(column_info)
-    # print(relevant_metadata)
+            relevant_columns.append(
+                {
+                    "tableName": entity["tableName"],
+                    "columnName": entity["columnName"],
+                    # "columnIsPrimaryKey": entity["columnIsPrimaryKey"],
+                    # Absent with COLUMN_SIDE_STORE, see hydrate_column_metadata
+                    "columnDescription": entity.get("columnDescription", ""),
+                    "columnDataType": entity.get("columnDataType", ""),
+                    "columnSampleValue": entity.get("columnSampleValue", ""),
+                }
+            )
+    return relevant_columns
+
+
+def hydrate_column_metadata(
+    transaction_id: str, relevant_columns: List[Dict[str, str]]
+) -> List[Dict[str, str]]:
+    """
+    With COLUMN_SIDE_STORE, reads the description, data type and sample values of the
+    columns kept by extract_column_metadata from the side store; otherwise returns
+    them unchanged.
+    """
+    if not relevant_columns or not get_milvus_config().COLUMN_SIDE_STORE:
+        return relevant_columns
+    return column_store_manager.hydrate(transaction_id, relevant_columns)
+
+
+def format_table_header(table_idx: int, table_name: str) -> str:
+    return f"## TABLE {table_idx}: `{table_name}`\nCOLUMNS:"
+
+
+def format_column(column: Dict[str, str], sample_value_lines: int = None) -> str:
+    """
+    Formats one column of the prompt metadata.
+
+    Args:
+        column (Dict[str, str]): A column returned by extract_column_metadata.
+        sample_value_lines (int, optional): Keep only this many lines of the sample
+            values (0 drops them). Defaults to keeping all of them.
+    """
+    column_text = (
+        f"  -`{column['columnName']}`- {column['columnDataType']}\n"
+        f"      * Description: {column['columnDescription']}\n"
+        # f"      * Data Type: {column['columnDataType']}\n"
+    )
+    if sample_value_lines == 0:
+        return column_text
+    sample_value = column["columnSampleValue"]
+    if sample_value_lines is not None:
+        sample_lines = sample_value.splitlines()
+        sample_value = "\n".join(sample_lines[:sample_value_lines])
+        if len(sample_lines) > sample_value_lines:
+            sample_value += "\n      ..."
+    return column_text + f"      * Sample Value:\n{sample_value}\n"
+
+
+def format_column_metadata(
+    relevant_columns: List[Dict[str, str]], sample_value_lines: int = None
+) -> str:
+    """
+    Formats the relevant columns grouped by table, tables in order of their best column.
+
+    Args:
+        relevant_columns (List[Dict[str, str]]): Columns returned by extract_column_metadata.
+        sample_value_lines (int, optional): See format_column.
+
+    Returns:
+        str: The metadata section of the text-to-SQL prompt.
+    """
+    relevant_metadata = {}
+    for column in relevant_columns:
+        relevant_metadata.setdefault(column["tableName"], []).append(column)
     # Generate formatted metadata string
     lines = []
     for table_idx, (table_name, columns) in enumerate(
         relevant_metadata.items(), start=1
     ):
-        lines.append(f"## TABLE {table_idx}: `{table_name}`\nCOLUMNS:")
-        for col_idx, column in enumerate(columns, start=1):
-            lines.append(
-                f"  -`{column['columnName']}`- {column['columnDataType']}\n"
-                f"      * Description: {column['columnDescription']}\n"
-                # f"      * Data Type: {column['columnDataType']}\n"
-                f"      * Sample Value:\n{column['columnSampleValue']}\n"
-            )
+        lines.append(format_table_header(table_idx, table_name))
+        for column in columns:
+            lines.append(format_column(column, sample_value_lines))
 
     return "\n".join(lines).strip()
 
 
+def extract_and_format_metadata(columns_retrieved_data):
+    return format_column_metadata(extract_column_metadata(columns_retrieved_data))
+
+
+def build_sql_example_filter(tenant_id: str) -> str:
+    """
+    Filter expression of the SQL example search: the tenant's examples and the shared
+    MILVUS_SQL_EXAMPLE_GLOBAL_TENANT ones. tenantID is the partition key of the
+    collection, so only those partitions are searched. The tenant ID is quoted and
+    escaped as a JSON string.
+    """
+    tenants = [get_milvus_config().MILVUS_SQL_EXAMPLE_GLOBAL_TENANT]
+    if tenant_id and tenant_id not in tenants:
+        tenants.insert(0, tenant_id)
+    return f"tenantID in {json.dumps(tenants, ensure_ascii=False)}"
+
+
 def format_sql_examples(retrieved_sql_example_data):
     formatted_sql_examples = []
     for record in retrieved_sql_example_data[0][::-1]:
@@ -88,13 +199,15 @@ def clean_string(string):
     return cleaned_string
 
 
-def rephrase_gpt_response_parser(transaction_id: str, gpt_response: Dict):
+def rephrase_gpt_response_parser(
+    transaction_id: str, gpt_response: ChatCompletionResult
+):
     """
     Method to parser GPT response Json and extract the rephrase query
 
     Args:
         transaction_id (str): Unique ID for the transaction
-        gpt_response (Dict): Reponse Dict from openai
+        gpt_response (ChatCompletionResult): Chat completion result from openai
 
     Returns:
         Tuple[str]: Returns 1 key values i.e. rephrased_query
@@ -102,7 +215,7 @@ def rephrase_gpt_response_parser(transaction_id: str, gpt_response: Dict):
     parser = JSONParser()
     rephrased_query = None
     try:
-        parsed_response = parser.parse(gpt_response["choices"][0]["message"]["content"])
+        parsed_response = parser.parse(gpt_response.content)
         rephrased_query = parsed_response["rephrased_query"]
         assert isinstance(rephrased_query, str), "invalid rephrased query format"
         logger.info(
@@ -148,21 +261,134 @@ def is_sql_valid(sql: str) -> bool:
     return False
 
 
-def sql_response_parser(transaction_id: str, gpt_response: Dict) -> Tuple[str]:
+# sqlglot dialect used to parse the queries of each SQL_BACKEND (None = sqlglot's
+# generic dialect; it has no Pinot one and the query text is never regenerated)
+SQLGLOT_DIALECTS = {"postgres": "postgres", "pinot": None}
+
+
+def get_row_limit(tenant_id: str = None) -> int:
+    """
+    Returns the row limit of a tenant: its SQL_TENANT_ROW_LIMITS entry, or
+    SQL_ROW_LIMIT (0 = no limit).
+    """
+    sql_config = get_sql_config()
+    return int(
+        sql_config.SQL_TENANT_ROW_LIMITS.get(tenant_id, sql_config.SQL_ROW_LIMIT)
+    )
+
+
+def limit_sql_query(
+    transaction_id: str, sql_query: str, row_limit: int, dialect: str = None
+) -> Tuple[str, str, int]:
+    """
+    Gives a SELECT an outer LIMIT of `row_limit` rows, or lowers a larger one. The
+    query is parsed with sqlglot only to find the outermost LIMIT / FETCH FIRST
+    count: that number is replaced, or " LIMIT n" inserted after the last token,
+    so the rest of the text (functions, casts, casing) is sent as written. The
+    LIMIT applies after the outer ORDER BY; CTEs and subqueries are left alone. A
+    count that is not a number (e.g. LIMIT ALL) is kept and the query wrapped in
+    a limited subquery.
+
+    Args:
+        transaction_id (str): Unique ID for the transaction
+        sql_query (str): The generated SQL query.
+        row_limit (int): The maximum number of rows, 0 for none.
+        dialect (str, optional): The sqlglot dialect. Defaults to the one of SQL_BACKEND.
+
+    Returns:
+        Tuple[str, str, int]: The query to show and store, the query to run (LIMIT
+            row_limit + 1, so that a result cut at the limit can be told apart from
+            one of exactly row_limit rows) and the limit applied, 0 when the query is
+            left as is.
+    """
+    import sqlglot
+    from sqlglot import exp
+    from sqlglot.tokens import TokenType
+
+    if not row_limit:
+        return sql_query, sql_query, 0
+    if dialect is None:
+        dialect = SQLGLOT_DIALECTS.get(get_sql_config().SQL_BACKEND, "postgres")
+    try:
+        tree = sqlglot.parse_one(sql_query, read=dialect)
+        tokens = sqlglot.Dialect.get_or_raise(dialect).tokenize(sql_query)
+    except sqlglot.errors.SqlglotError as parse_exc:
+        logger.warning(
+            f"[utils][limit_sql_query][{transaction_id}] - Query left without a limit, parsing failed: {str(parse_exc)}"
+        )
+        return sql_query, sql_query, 0
+    statement = [token for token in tokens if token.token_type != TokenType.SEMICOLON]
+    if not isinstance(tree, exp.Query) or not statement:
+        return sql_query, sql_query, 0
+    # Text after the statement (the semicolon, comments) is kept as is
+    body, tail = sql_query[: statement[-1].end + 1], sql_query[statement[-1].end + 1 :]
+
+    current = tree.args.get("limit")
+    if current is None:
+
+        def build(limit: int) -> str:
+            return f"{body} LIMIT {limit}{tail}"
+
+    else:
+        if isinstance(current, exp.Fetch):
+            count = current.args.get("count")
+        else:
+            count = current.expression
+        if count is None:
+            # FETCH FIRST ROW ONLY
+            return sql_query, sql_query, 0
+        # The number of the outermost clause is the first one after the last
+        # LIMIT / FETCH outside parentheses
+        count_token, depth, in_clause = None, 0, False
+        for token in statement:
+            if token.token_type == TokenType.L_PAREN:
+                depth += 1
+            elif token.token_type == TokenType.R_PAREN:
+                depth -= 1
+            elif depth == 0 and token.token_type in (TokenType.LIMIT, TokenType.FETCH):
+                count_token, in_clause = None, True
+            elif depth == 0 and in_clause and token.token_type == TokenType.NUMBER:
+                count_token, in_clause = token, False
+        if (
+            isinstance(count, exp.Literal)
+            and count.is_int
+            and count_token is not None
+            and count_token.text == count.name
+        ):
+            if int(count.name) <= row_limit:
+                return sql_query, sql_query, 0
+
+            def build(limit: int) -> str:
+                return (
+                    f"{sql_query[: count_token.start]}{limit}"
+                    f"{sql_query[count_token.end + 1 :]}"
+                )
+
+        else:
+
+            def build(limit: int) -> str:
+                return f"SELECT * FROM ({body}) AS limited_result LIMIT {limit}{tail}"
+
+    logger.info(
+        f"[utils][limit_sql_query][{transaction_id}] - Query limited to {row_limit} rows"
+    )
+    return build(row_limit), build(row_limit + 1), row_limit
+
+
+def sql_response_parser(
+    transaction_id: str, gpt_response: ChatCompletionResult
+) -> Tuple[str]:
     parser = JSONParser()
     sql_query = None
     flag = False
     try:
-        parsed_response = parser.parse(gpt_response["choices"][0]["message"]["content"])
+        parsed_response = parser.parse(gpt_response.content)
         print("&&")
         print(
             f"[utils][sql_response_parser][{transaction_id}] - Parsed Response: {parsed_response}"
         )
         try:
             sql_query = parsed_response[f"{return_key_dialect}_query"]
-            # parsed = sqlglot.parse_one(sql_query, dialect="postgresql")
-            # if "limit" not in sql_query.lower():
-            #     sql_query += " LIMIT 10"
             if is_sql_valid(sql_query):
                 flag = True
             if ";" not in sql_query:
@@ -195,38 +421,23 @@ def sql_response_parser(transaction_id: str, gpt_response: Dict) -> Tuple[str]:
 
 
 def sql_response_parser_for_deepseek(
-    transaction_id: str, gpt_response: Dict
+    transaction_id: str, gpt_response: ChatCompletionResult
 ) -> Tuple[str]:
     """
     Parses the SQL response from the GPT model and returns the SQL query.
 
     Args:
         transaction_id (str): Unique ID for the transaction
-        gpt_response (Dict): Response Dict from OpenAI
+        gpt_response (ChatCompletionResult): Chat completion result from OpenAI
 
     Returns:
         Tuple[str]: Returns a tuple containing the SQL query
     """
     sql_query = None
     flag = False
+    content = _clean_llm_response_for_deepseek(gpt_response.content)
     try:
-        gpt_response["choices"][0]["message"]["content"] = (
-            _clean_llm_response_for_deepseek(
-                gpt_response["choices"][0]["message"]["content"]
-            )
-        )
-        sql_query = (
-            gpt_response["choices"][0]["message"]["content"]
-            .split("```sql\n")[1]
-            .split("\n```")[0]
-            .strip()
-        )
-        # if "limit" not in sql_query.lower():
-        #     if ";" in sql_query:
-        #         sql_query = sql_query.replace(";", " LIMIT 10;")
-        #     else:
-        #         sql_query += " LIMIT 10;"
-        # parsed = sqlglot.parse_one(sql_query, dialect="presto")
+        sql_query = content.split("```sql\n")[1].split("\n```")[0].strip()
         if is_sql_valid(sql_query):
             flag = True
         else:
@@ -239,16 +450,18 @@ def sql_response_parser_for_deepseek(
         logger.exception(
             f"[utils][sql_response_parser_for_deepseek][{transaction_id}] Error: {str(response_parser_exc)}"
         )
-        print(gpt_response)
-        return flag, gpt_response["choices"][0]["message"]["content"]
+        print(content)
+        return flag, content
     return flag, sql_query
 
 
-def answer_response_parser(transaction_id: str, gpt_response: Dict) -> Tuple[str]:
+def answer_response_parser(
+    transaction_id: str, gpt_response: ChatCompletionResult
+) -> Tuple[str]:
     parser = JSONParser()
     answer = None
     try:
-        parsed_response = parser.parse(gpt_response["choices"][0]["message"]["content"])
+        parsed_response = parser.parse(gpt_response.content)
         answer = parsed_response["answer"]
 
         assert isinstance(answer, str), "invalid answer format"
@@ -293,8 +506,8 @@ def _sanitize_plotly_code(raw_plotly_code: str) -> str:
 
 
 def get_plotly_figure(
-    plotly_code: str, df: pd.DataFrame, dark_mode: bool = True
-) -> plotly.graph_objs.Figure:
+    plotly_code: str, df: "pd.DataFrame", dark_mode: bool = True
+) -> "plotly.graph_objs.Figure":
     """
     **Example:**
     ```python
@@ -313,7 +526,12 @@ def get_plotly_figure(
     Returns:
         plotly.graph_objs.Figure: The Plotly figure.
     """
-    ldict = {"df": df, "px": px, "go": go}
+    import pandas as pd
+    import plotly
+    import plotly.express as px
+    import plotly.graph_objects as go
+
+    ldict = {"df": df, "px": px, "go": go, "pd": pd, "plotly": plotly}
     try:
         exec(plotly_code, globals(), ldict)
 
@@ -449,7 +667,7 @@ def extract_sql(llm_response: str) -> str:
     return llm_response
 
 
-def should_generate_chart(df: pd.DataFrame) -> bool:
+def should_generate_chart(df: "pd.DataFrame") -> bool:
     """
     Checks if a chart should be generated for the given DataFrame. By default, it checks if the DataFrame has more than one row and has numerical columns.
     You can override this method to customize the logic for generating charts.
@@ -492,6 +710,10 @@ def should_generate_chart(df: pd.DataFrame) -> bool:
 
 
 def format_database_relationship(retrieved_tables: list) -> str:
+    tables_relationship = get_database_config().TABLE_RELATIONSHIPS
+    database_relationship_description = (
+        get_database_config().DATABASE_RELATIONSHIPS_DESCRIPTION
+    )
     idx = 1
     relationships_string = ""
     tables_set = set(retrieved_tables)
@@ -526,6 +748,30 @@ def format_database_relationship(retrieved_tables: list) -> str:
     return relationships_string.strip()
 
 
+def get_embedding_manager(provider: str = None, reduced: bool = True):
+    """
+    Returns the adapter that creates embeddings for EMBEDDING_PROVIDER (or the given
+    provider): ollama_manager for "ollama", openai_manager otherwise. Both expose
+    create_embedding and create_embeddings with the same response format.
+
+    With EMBEDDING_REDUCTION set (and reduced=True) the adapter is wrapped so the
+    returned vectors are already reduced to the dimension of the collections.
+    """
+    provider = provider or get_openai_config().EMBEDDING_PROVIDER
+    manager = ollama_manager if provider == "ollama" else openai_manager
+    reducer = get_embedding_reducer() if reduced else None
+    return manager if reducer is None else ReducedEmbeddingManager(manager, reducer)
+
+
+def get_sql_manager():
+    """
+    Returns the adapter that runs the generated queries for SQL_BACKEND:
+    pinot_manager for "pinot", sql_manager (PostgreSQL) otherwise. Both expose
+    fetch_data with the same (elapsed time, DataFrame) return value.
+    """
+    return pinot_manager if get_sql_config().SQL_BACKEND == "pinot" else sql_manager
+
+
 def insert_into_vector_db(
     transaction_id: str, tennant_id: str, user_text: str, corrected_sqlquery: str
 ) -> Dict:
@@ -534,10 +780,12 @@ def insert_into_vector_db(
         tenantID=tennant_id,
         question=user_text,
         sqlQuery=corrected_sqlquery,
-        questionEmbeddings=openai_manager.create_embedding(
+        questionEmbeddings=get_embedding_manager()
+        .create_embedding(
             text=user_text,
             transaction_id=transaction_id,
-        )[1]["data"][0]["embedding"],
+        )[1]
+        .embedding.tolist(),
     ).model_dump()
     _, inset_res = milvus_manager.insert_data(
         transaction_id=transaction_id,
@@ -549,6 +797,47 @@ def insert_into_vector_db(
     return res
 
 
+def bulk_insert_into_vector_db(
+    transaction_id: str, tennant_id: str, examples: List[Dict[str, str]]
+) -> Dict:
+    """
+    Inserts many question / SQL examples at once: the questions are embedded with a
+    single batched call and the records are inserted with one Milvus insert.
+
+    Args:
+        transaction_id (str): Unique ID for the transaction
+        tennant_id (str): Tenant the examples belong to; None for the
+            MILVUS_SQL_EXAMPLE_GLOBAL_TENANT examples every tenant searches
+        examples (List[Dict[str, str]]): Items with "question" and "sqlQuery" keys
+
+    Returns:
+        Dict: insert_count and ids of the inserted records
+    """
+    _, embedding_response = get_embedding_manager().create_embeddings(
+        texts=[example["question"] for example in examples],
+        transaction_id=transaction_id,
+    )
+    tennant_id = tennant_id or get_milvus_config().MILVUS_SQL_EXAMPLE_GLOBAL_TENANT
+    data = [
+        SqlExampleVectorRecord(
+            tenantID=tennant_id,
+            question=example["question"],
+            sqlQuery=example["sqlQuery"],
+            questionEmbeddings=embedding,
+        ).model_dump()
+        for example, embedding in zip(examples, embedding_response.embeddings.tolist())
+    ]
+    _, inset_res = milvus_manager.insert_data(
+        transaction_id=transaction_id,
+        collection_name=milvus_manager.MILVUS_SQL_EXAMPLE_COLLECTION_NAME,
+        data=data,
+        flush=True,
+    )
+
+    res = {"insert_count": inset_res["insert_count"], "ids": inset_res["ids"]}
+    return res
+
+
 def epoch_to_human_readable(epoch_time: int, tz: str = "UTC") -> str:
     try:
         timezone = pytz.timezone(tz)
@@ -558,44 +847,59 @@ def epoch_to_human_readable(epoch_time: int, tz: str = "UTC") -> str:
         return f"Error: {e}"
 
 
+def detect_epoch_columns(df: "pd.DataFrame") -> Dict[str, int]:
+    """
+    Returns the numeric columns holding epochs, judged on their first non null value,
+    with the divisor that turns them into seconds (1000 for ms, 1 for s).
+    """
+    epoch_columns = {}
+    for col in df.select_dtypes(include=["int64", "float64"]).columns:
+        values = df[col].dropna()
+        if values.empty:
+            continue
+        sample = values.iloc[0]
+        # Epoch in ms
+        if sample > 1e12:
+            epoch_columns[col] = 1000
+        # Epoch in sec
+        elif 1e9 < sample < 1e12:
+            epoch_columns[col] = 1
+    return epoch_columns
+
+
 def convert_epoch_columns_to_str(
-    df: pd.DataFrame, timezone: str = "UTC"
-) -> pd.DataFrame:
+    df: "pd.DataFrame", timezone: str = "UTC", epoch_columns: Dict[str, int] = None
+) -> "pd.DataFrame":
     """
-    Detects epoch columns and converts them to formatted datetime strings.
+    Converts epoch columns to formatted datetime strings, nulls kept.
     Format: YYYY-MM-DD HH:MM:SS TZ
+
+    The columns are detected on `df` unless `epoch_columns` (see detect_epoch_columns)
+    is given, e.g. decided once on the first chunk of a streamed result so that every
+    chunk is converted alike.
     """
+    if epoch_columns is None:
+        epoch_columns = detect_epoch_columns(df)
     df = df.copy()
     tz = pytz.timezone(timezone)
 
-    for col in df.select_dtypes(include=["int64", "float64"]).columns:
-        sample = df[col].dropna().iloc[0] if not df[col].dropna().empty else None
-
-        if sample is None:
+    for col, divisor in epoch_columns.items():
+        if col not in df.columns:
             continue
-
         try:
-            # Epoch in ms
-            if sample > 1e12:
-                df[col] = df[col].apply(
-                    lambda x: datetime.fromtimestamp(x / 1000, tz=pytz.utc)
-                    .astimezone(tz)
-                    .strftime("%Y-%m-%d %H:%M:%S %Z")
-                )
-            # Epoch in sec
-            elif 1e9 < sample < 1e12:
-                df[col] = df[col].apply(
-                    lambda x: datetime.fromtimestamp(x, tz=pytz.utc)
-                    .astimezone(tz)
-                    .strftime("%Y-%m-%d %H:%M:%S %Z")
-                )
+            df[col] = df[col].map(
+                lambda x: datetime.fromtimestamp(x / divisor, tz=pytz.utc)
+                .astimezone(tz)
+                .strftime("%Y-%m-%d %H:%M:%S %Z"),
+                na_action="ignore",
+            )
         except Exception:
             pass
 
     return df
 
 
-def cleanse_bytes(df) -> pd.DataFrame:
+def cleanse_bytes(df) -> "pd.DataFrame":
     """Decode any bytes/bytearray cells to UTF-8, replacing undecodable bytes."""
     return df.applymap(
         lambda v: (
@@ -606,12 +910,205 @@ def cleanse_bytes(df) -> pd.DataFrame:
     )
 
 
+@lru_cache(maxsize=None)
+def get_pandas() -> "ModuleType":
+    """Returns the pandas module, imported on the first call only."""
+    import pandas
+
+    return pandas
+
+
+@lru_cache(maxsize=None)
+def _beautiful_soup() -> type:
+    from bs4 import BeautifulSoup
+
+    return BeautifulSoup
+
+
 def decode_html(val):
-    if pd.isnull(val) or not isinstance(val, str):
+    # Called for every cell: nulls and numbers are never strings, so no pandas check
+    if not isinstance(val, str):
         return val
     try:
         decoded = urllib.parse.unquote(val)
-        cleaned = BeautifulSoup(decoded, "html.parser").get_text(separator=" ")
+        cleaned = _beautiful_soup()(decoded, "html.parser").get_text(separator=" ")
         return cleaned.strip()
     except Exception:
         return val
+
+
+@measure_time
+def warm_up_plotly(transaction_id: str = "root") -> bool:
+    """
+    Imports plotly express and loads the dark template used by get_plotly_figure,
+    both of which are otherwise loaded on the first chart request.
+
+    Args:
+        transaction_id (str): Unique ID for the transaction
+
+    Returns:
+        bool: True once plotly is loaded.
+    """
+    import importlib
+    import plotly.io as pio
+
+    importlib.import_module("plotly.express")
+
+    pio.templates["plotly_dark"]
+    return True
+
+
+dependency_readiness: Dict[str, DependencyReadinessModel] = {}
+_last_readiness_check = {"time": 0.0}
+_readiness_refresh_lock = threading.Lock()
+
+
+def _readiness_checks() -> Dict[str, Callable]:
+    # Adapters are resolved inside the lambdas so that building a failing adapter
+    # (e.g. Milvus unreachable) is reported as that dependency not being ready.
+    return {
+        "sql": lambda **kwargs: get_sql_manager().warm_up(**kwargs),
+        "sqlite": lambda **kwargs: sqlite_manager.warm_up(**kwargs),
+        "milvus": lambda **kwargs: milvus_manager.warm_up(**kwargs),
+        **(
+            {"local_vectors": lambda **kwargs: local_vector_manager.warm_up(**kwargs)}
+            if get_milvus_config().RETRIEVAL_BACKEND == "local"
+            else {}
+        ),
+        **(
+            {"column_store": lambda **kwargs: column_store_manager.warm_up(**kwargs)}
+            if get_milvus_config().COLUMN_SIDE_STORE
+            else {}
+        ),
+        "openai": lambda **kwargs: openai_manager.warm_up(**kwargs),
+        "plotly": warm_up_plotly,
+    }
+
+
+@measure_time
+def _ping_openai(transaction_id: str = "readiness") -> int:
+    """
+    Reports the cached health of the OpenAI backends: ready while at least one backend
+    is not cooling down and not every OpenAI model has its circuit breaker open.
+    """
+    _, healthy = openai_manager.ping(transaction_id=transaction_id)
+    breakers = circuit_breakers.breakers("openai:")
+    if breakers and all(breaker.is_open() for breaker in breakers):
+        raise CustomException(
+            error="OpenAI unavailable",
+            message="The circuit breaker of every OpenAI model is open",
+        )
+    return healthy
+
+
+def _readiness_pings() -> Dict[str, Callable]:
+    # Cheap versions of the warm-up checks, run again by check_readiness: a single
+    # connection, existence checks and the cached health of the LLM backends.
+    return {
+        **_readiness_checks(),
+        "sql": lambda **kwargs: get_sql_manager().ping(**kwargs),
+        "milvus": lambda **kwargs: milvus_manager.ping(**kwargs),
+        "openai": _ping_openai,
+    }
+
+
+def _warm_up_dependency(
+    name: str, warm_up: Callable, transaction_id: str
+) -> DependencyReadinessModel:
+    start_time = time.time()
+    try:
+        latency, _ = warm_up(transaction_id=transaction_id)
+        readiness = DependencyReadinessModel(ready=True, latency=latency)
+    except Exception as warm_up_exc:
+        logger.exception(
+            f"[utils][warm_up_dependencies][{transaction_id}] - {name} warm-up failed: {str(warm_up_exc)}"
+        )
+        readiness = DependencyReadinessModel(
+            ready=False, latency=time.time() - start_time, error=str(warm_up_exc)
+        )
+    readiness.checkedAt = (
+        datetime.now(pytz.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+    )
+    dependency_readiness[name] = readiness
+    return readiness
+
+
+def _run_readiness_checks(
+    checks: Dict[str, Callable], transaction_id: str
+) -> Dict[str, DependencyReadinessModel]:
+    with ThreadPoolExecutor(max_workers=len(checks)) as executor:
+        list(
+            executor.map(
+                lambda item: _warm_up_dependency(item[0], item[1], transaction_id),
+                checks.items(),
+            )
+        )
+    ready = {name: dependency_readiness[name].ready for name in checks}
+    logger.info(f"[utils][readiness][{transaction_id}] - Checks done: {ready}")
+    return dependency_readiness
+
+
+def warm_up_dependencies(
+    transaction_id: str = "startup",
+) -> Dict[str, DependencyReadinessModel]:
+    """
+    Warms up every backend dependency concurrently (SQL pool, Milvus collections,
+    OpenAI keep-alive connection, plotly templates) and records their readiness.
+
+    Args:
+        transaction_id (str): Unique ID for the transaction
+
+    Returns:
+        Dict[str, DependencyReadinessModel]: Readiness of each dependency.
+    """
+    _last_readiness_check["time"] = time.monotonic()
+    return _run_readiness_checks(_readiness_checks(), transaction_id)
+
+
+def _refresh_readiness(transaction_id: str) -> None:
+    try:
+        _run_readiness_checks(_readiness_pings(), transaction_id)
+    except Exception as refresh_exc:
+        logger.exception(
+            f"[utils][check_readiness][{transaction_id}] - Readiness refresh failed: {str(refresh_exc)}"
+        )
+    finally:
+        _readiness_refresh_lock.release()
+
+
+def _all_dependencies_ready() -> bool:
+    return all(
+        name in dependency_readiness and dependency_readiness[name].ready
+        for name in _readiness_checks()
+    )
+
+
+def check_readiness(transaction_id: str = "readiness") -> ReadinessResponseModel:
+    """
+    Builds the readiness report from the last recorded checks. Once every
+    READINESS_RECHECK_INTERVAL seconds, the dependencies are pinged again in a
+    background thread (one SQL connection, collection existence, the cached health
+    of the LLM backends), so the probe itself never waits on a backend: a worker
+    that started while a backend was down becomes ready once it recovers, and one
+    whose backend goes down after startup stops reporting ready.
+
+    Args:
+        transaction_id (str): Unique ID for the transaction
+
+    Returns:
+        ReadinessResponseModel: Overall and per-dependency readiness.
+    """
+    interval = get_app_config().READINESS_RECHECK_INTERVAL
+    due = time.monotonic() - _last_readiness_check["time"] >= interval
+    if due and _readiness_refresh_lock.acquire(blocking=False):
+        # Checked again under the lock: another thread may have just refreshed
+        if time.monotonic() - _last_readiness_check["time"] >= interval:
+            _last_readiness_check["time"] = time.monotonic()
+            threading.Thread(
+                target=_refresh_readiness, args=(transaction_id,), daemon=True
+            ).start()
+        else:
+            _readiness_refresh_lock.release()
+    return ReadinessResponseModel(
+        ready=_all_dependencies_ready(), dependencies=dict(dependency_readiness)
+    )
@@ -0,0 +1,145 @@
+"""
+Smaller representations of the embeddings: dimension reduction (Matryoshka-style
+truncation or PCA) applied to every embedding the pipeline creates, and int8 scalar
+quantization of stored vectors.
+
+EMBEDDING_REDUCTION=truncate keeps the first EMBEDDING_REDUCED_DIM dimensions and
+renormalizes, which is how the text-embedding-3 models are meant to be shortened.
+EMBEDDING_REDUCTION=pca projects on the principal components saved at
+EMBEDDING_PCA_PATH (python -m src.migrations fit-pca). Both change the dimension of
+the stored vectors: re-embed the collections afterwards and set MILVUS_VECTOR_DIM.
+"""
+
+import os
+import numpy as np
+from functools import lru_cache
+from typing import Any, Optional, Tuple
+from config import get_openai_config
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """
+    L2-normalizes a vector or the rows of a matrix (zero rows are left as is).
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def truncate(vectors: np.ndarray, dim: int) -> np.ndarray:
+    """
+    Keeps the first `dim` dimensions and renormalizes (Matryoshka embeddings).
+    """
+    return normalize(np.asarray(vectors, dtype=np.float32)[..., :dim])
+
+
+class PCAReducer:
+    """
+    Projection on the top principal components of a sample of embeddings.
+
+    Attributes:
+        mean (np.ndarray): The mean of the fitted embeddings.
+        components (np.ndarray): (dim, original dim) matrix of the principal axes.
+    """
+
+    def __init__(self, mean: np.ndarray, components: np.ndarray) -> None:
+        self.mean = np.asarray(mean, dtype=np.float32)
+        self.components = np.asarray(components, dtype=np.float32)
+
+    @property
+    def dim(self) -> int:
+        return int(self.components.shape[0])
+
+    @classmethod
+    def fit(cls, vectors: np.ndarray, dim: int) -> "PCAReducer":
+        vectors = normalize(vectors)
+        if dim > min(vectors.shape):
+            raise ValueError(
+                f"Can not fit {dim} components on {vectors.shape[0]} vectors of dimension {vectors.shape[1]}"
+            )
+        mean = vectors.mean(axis=0)
+        _, _, vt = np.linalg.svd(vectors - mean, full_matrices=False)
+        return cls(mean, vt[:dim])
+
+    def transform(self, vectors: np.ndarray) -> np.ndarray:
+        return normalize(
+            (np.asarray(vectors, dtype=np.float32) - self.mean) @ self.components.T
+        )
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.savez(path, mean=self.mean, components=self.components)
+
+    @classmethod
+    def load(cls, path: str) -> "PCAReducer":
+        with np.load(path) as data:
+            return cls(data["mean"], data["components"])
+
+
+def quantize_int8(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Symmetric per-vector int8 quantization.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The int8 codes and the float32 scale of each
+            row (vector ~= codes * scale).
+    """
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def int8_scores(
+    codes: np.ndarray, scales: np.ndarray, query: np.ndarray, chunk_rows: int = 65536
+) -> np.ndarray:
+    """
+    Dot products of a float32 query with int8 coded rows, dequantizing a chunk of
+    rows at a time so no full float32 copy of the matrix is made.
+    """
+    query = np.asarray(query, dtype=np.float32)
+    scores = np.empty(codes.shape[0], dtype=np.float32)
+    for start in range(0, codes.shape[0], chunk_rows):
+        end = start + chunk_rows
+        scores[start:end] = (codes[start:end].astype(np.float32) @ query) * scales[
+            start:end
+        ]
+    return scores
+
+
+@lru_cache()
+def get_embedding_reducer() -> Optional[Any]:
+    """
+    Returns the function applied to every new embedding (vector or matrix) for
+    EMBEDDING_REDUCTION, or None when embeddings are kept at full dimension.
+    """
+    openai_config = get_openai_config()
+    reduction = openai_config.EMBEDDING_REDUCTION
+    if reduction == "truncate":
+        dim = openai_config.EMBEDDING_REDUCED_DIM
+        return lambda vectors: truncate(vectors, dim)
+    if reduction == "pca":
+        return PCAReducer.load(openai_config.EMBEDDING_PCA_PATH).transform
+    return None
+
+
+class ReducedEmbeddingManager:
+    """
+    Wraps an embedding adapter so create_embedding / create_embeddings return the
+    reduced vectors, with the same (elapsed time, result) return values.
+    """
+
+    def __init__(self, manager: Any, reducer: Any) -> None:
+        self.manager = manager
+        self.reducer = reducer
+
+    def create_embedding(self, *args, **kwargs):
+        elapsed, result = self.manager.create_embedding(*args, **kwargs)
+        return elapsed, result._replace(embedding=self.reducer(result.embedding))
+
+    def create_embeddings(self, *args, **kwargs):
+        elapsed, result = self.manager.create_embeddings(*args, **kwargs)
+        if result.embeddings.size:
+            result = result._replace(embeddings=self.reducer(result.embeddings))
+        return elapsed, result
@@ -87,6 +87,20 @@ def _render_dataframe(df):
     st.dataframe(df)
 
 
+def _parse_result_chunk(chunk: str):
+    """Return the rows of a sqlQueryResponseChunk frame, None for other frames."""
+    if not chunk.startswith("{"):
+        return None
+    try:
+        parsed = json.loads(chunk)
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(parsed, dict) or parsed.get("type") != "sqlQueryResponseChunk":
+        return None
+    content = parsed.get("content", [])
+    return json.loads(content) if isinstance(content, str) else content
+
+
 def _render_plotly_graph(fig_json: dict):
     json_str = json.dumps(fig_json).replace("'", "&#x27;")
     html = f"""
@@ -156,6 +170,9 @@ def render_chunk(chunk: str):
             elif parsed.get("type") == "sqlQueryResponse":
                 _render_dataframe(parsed["content"])
                 return "dataframe"
+            elif parsed.get("type") == "sqlQueryResponseTruncated":
+                st.warning("The result was truncated at the row/size limit.")
+                return "warning"
         # # Fallback: show raw JSON for debugging
         # st.json(parsed, expanded=False)
         return "json"
@@ -236,6 +253,11 @@ def main():
         # Assistant response bubble with live status updates
         # ----------------------------------------------------------
         assistant_chunks: List[str] = []
+        # Rows of the sqlQueryResponseChunk frames, shown in one table that grows
+        # as they arrive and kept as a single sqlQueryResponse in the history
+        result_rows: List[dict] = []
+        result_index = None
+        result_placeholder = None
         with st.chat_message("assistant"):
             # The new status bar keeps the user informed while the backend streams
             # events. As soon as the first chunk arrives, the label flips to the
@@ -243,6 +265,17 @@ def main():
             with st.status("Processing…", expanded=True) as status_bar:
                 container = st.container()
                 for chunk in stream_answer(api_url, payload):
+                    rows = _parse_result_chunk(chunk)
+                    if rows is not None:
+                        result_rows.extend(rows)
+                        if result_placeholder is None:
+                            result_index = len(assistant_chunks)
+                            assistant_chunks.append("")
+                            with container:
+                                st.markdown("**SQL Query Result:**")
+                                result_placeholder = st.empty()
+                        result_placeholder.dataframe(pd.DataFrame(result_rows))
+                        continue
                     assistant_chunks.append(chunk)
 
                     # Handle log chunks by updating the status bar in‑place
@@ -255,6 +288,11 @@ def main():
                     with container:
                         render_chunk(chunk)
 
+                if result_index is not None:
+                    assistant_chunks[result_index] = json.dumps(
+                        {"type": "sqlQueryResponse", "content": result_rows}
+                    )
+
                 # Finalise the status bar once the stream is done
                 status_bar.update(label="Completed ✅", state="complete")
 